@@ -0,0 +1,143 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Any
+
+DEFAULT_ANALYSIS_STORE_PATH = "./analysis_store.db"
+DEFAULT_MAX_ENTRIES = 20_000
+
+
+def hash_text(*parts: str) -> str:
+    """Return a stable content hash for one or more text parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+class AnalysisKey(NamedTuple):
+    """Identifies one partner analysis by institution pair and everything that shaped it."""
+    target_unitid: int
+    candidate_unitid: int
+    features_hash: str
+    candidate_hash: str
+    model: str
+    prompt_version: str
+
+
+class AnalysisStore:
+    """Persistent SQLite store of partner analyses with LRU eviction.
+
+    Entries are keyed by AnalysisKey, so a changed feature set, candidate document,
+    model or prompt produces a miss instead of a stale analysis.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_ANALYSIS_STORE_PATH,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Graph nodes may run on worker threads, so one connection is shared behind a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS analyses (
+                target_unitid INTEGER NOT NULL,
+                candidate_unitid INTEGER NOT NULL,
+                features_hash TEXT NOT NULL,
+                candidate_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                analysis TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL,
+                PRIMARY KEY (
+                    target_unitid, candidate_unitid, features_hash,
+                    candidate_hash, model, prompt_version
+                )
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_analyses_last_accessed ON analyses (last_accessed)"
+        )
+        self._conn.commit()
+
+    def get(self, key: AnalysisKey) -> Optional[str]:
+        """Return the stored analysis for the key, or None on a miss."""
+        where = (
+            "target_unitid = ? AND candidate_unitid = ? AND features_hash = ? "
+            "AND candidate_hash = ? AND model = ? AND prompt_version = ?"
+        )
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT analysis FROM analyses WHERE {where}", tuple(key)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute(
+                f"UPDATE analyses SET last_accessed = ? WHERE {where}",
+                (time.time(), *key),
+            )
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: AnalysisKey, analysis: str) -> None:
+        """Store an analysis and evict the least recently used entries beyond max_entries."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (*key, analysis, now, now),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    """
+                    DELETE FROM analyses WHERE rowid IN (
+                        SELECT rowid FROM analyses ORDER BY last_accessed ASC LIMIT ?
+                    )
+                    """,
+                    (overflow,),
+                )
+                self.evictions += overflow
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """Delete every stored analysis."""
+        with self._lock:
+            self._conn.execute("DELETE FROM analyses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and the current number of stored analyses."""
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "max_entries": self.max_entries,
+        }
+
+    def close(self) -> None:
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,246 @@
+import json
+import os
+import re
+import shutil
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from db.where import WhereMaskCache
+
+DEFAULT_BM25_INDEX_DIR = "./bm25_index"
+POSTINGS_FILE = "postings.npz"
+SIDECAR_FILE = "index_meta.json"
+
+# Standard Okapi BM25 parameters
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+
+# Page size used when reading the Chroma collection during a build
+BUILD_PAGE_SIZE = 1000
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric terms."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def build_index_dir(bm25_index_dir: str, collection: str) -> str:
+    """Directory holding the index of one versioned collection build."""
+    return os.path.join(bm25_index_dir, collection)
+
+
+def open_build_index(bm25_index_dir: str, collection: Optional[str]) -> "BM25Index":
+    """Open the index of a collection build.
+
+    Indexes built before they were kept per build sit in ``bm25_index_dir`` itself and
+    are used when the build has none of its own.
+    """
+    if collection is not None and os.path.isdir(build_index_dir(bm25_index_dir, collection)):
+        return BM25Index(build_index_dir(bm25_index_dir, collection))
+    return BM25Index(bm25_index_dir)
+
+
+def drop_build_index(bm25_index_dir: str, collection: str) -> bool:
+    """Delete the index of a dropped collection build.
+
+    Returns:
+        True if the build had an index
+    """
+    directory = build_index_dir(bm25_index_dir, collection)
+    if not os.path.isdir(directory):
+        return False
+    shutil.rmtree(directory)
+    return True
+
+
+class BM25Index:
+    """Okapi BM25 keyword search over the stored college documents.
+
+    The inverted index is stored as CSR-style arrays: for each term, a slice of document
+    positions and their precomputed BM25 weights. A query only touches the postings of its
+    own terms, so literal matches such as program names, cities or "HBCU" are scored
+    without any embedding call.
+    """
+
+    def __init__(self, index_dir: str = DEFAULT_BM25_INDEX_DIR):
+        self.index_dir = index_dir
+
+        with np.load(os.path.join(index_dir, POSTINGS_FILE)) as postings:
+            self.term_offsets = postings["term_offsets"]
+            self.posting_documents = postings["posting_documents"]
+            self.posting_weights = postings["posting_weights"]
+
+        with open(os.path.join(index_dir, SIDECAR_FILE), encoding="utf-8") as f:
+            sidecar = json.load(f)
+        self.terms: Dict[str, int] = {term: index for index, term in enumerate(sidecar["terms"])}
+        self.ids: List[str] = sidecar["ids"]
+        self.metadatas: List[Dict[str, Any]] = sidecar["metadatas"]
+        self.documents: List[str] = sidecar["documents"]
+
+        # Recently used where expressions and their document masks
+        self._masks = WhereMaskCache(self.metadatas)
+
+    @classmethod
+    def build(
+        cls,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        index_dir: str = DEFAULT_BM25_INDEX_DIR,
+        k1: float = DEFAULT_K1,
+        b: float = DEFAULT_B,
+    ) -> "BM25Index":
+        """Build and persist an index over a set of documents.
+
+        Args:
+            ids: Document ids
+            documents: Document texts
+            metadatas: Document metadata, used for where filters
+            index_dir: Directory the postings and sidecar file are written to
+            k1: Term frequency saturation
+            b: Document length normalization
+
+        Returns:
+            The built index, loaded from disk
+        """
+        term_counts = [Counter(tokenize(document)) for document in documents]
+        lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+        average_length = float(lengths.mean()) if len(lengths) else 0.0
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for position, counts in enumerate(term_counts):
+            for term, frequency in counts.items():
+                postings.setdefault(term, []).append((position, frequency))
+
+        terms = sorted(postings)
+        term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        document_chunks = []
+        weight_chunks = []
+        for index, term in enumerate(terms):
+            positions, frequencies = zip(*postings[term])
+            positions = np.array(positions, dtype=np.int32)
+            frequencies = np.array(frequencies, dtype=np.float32)
+
+            document_frequency = len(positions)
+            idf = np.log(
+                1.0 + (len(documents) - document_frequency + 0.5) / (document_frequency + 0.5)
+            )
+            norms = k1 * (1.0 - b + b * lengths[positions] / (average_length or 1.0))
+            weights = idf * frequencies * (k1 + 1.0) / (frequencies + norms)
+
+            document_chunks.append(positions)
+            weight_chunks.append(weights.astype(np.float32))
+            term_offsets[index + 1] = term_offsets[index] + document_frequency
+
+        if not document_chunks:
+            raise ValueError("No documents to index")
+
+        # Written beside the index directory and swapped in whole, so the postings and
+        # sidecar file of an index are always read from the same build
+        building_dir = f"{index_dir.rstrip(os.sep)}.building"
+        shutil.rmtree(building_dir, ignore_errors=True)
+        os.makedirs(building_dir)
+        np.savez(
+            os.path.join(building_dir, POSTINGS_FILE),
+            term_offsets=term_offsets,
+            posting_documents=np.concatenate(document_chunks),
+            posting_weights=np.concatenate(weight_chunks),
+        )
+        with open(os.path.join(building_dir, SIDECAR_FILE), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "terms": terms,
+                    "ids": ids,
+                    "metadatas": metadatas,
+                    "documents": documents,
+                    "k1": k1,
+                    "b": b,
+                },
+                f,
+            )
+
+        replaced_dir = f"{index_dir.rstrip(os.sep)}.replaced"
+        shutil.rmtree(replaced_dir, ignore_errors=True)
+        if os.path.isdir(index_dir):
+            os.rename(index_dir, replaced_dir)
+        os.rename(building_dir, index_dir)
+        shutil.rmtree(replaced_dir, ignore_errors=True)
+
+        return cls(index_dir)
+
+    @classmethod
+    def from_collection(cls, collection, index_dir: str = DEFAULT_BM25_INDEX_DIR) -> "BM25Index":
+        """Build and persist an index over every document in a Chroma collection."""
+        ids: List[str] = []
+        documents: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+
+        for offset in range(0, collection.count(), BUILD_PAGE_SIZE):
+            page = collection.get(
+                include=["metadatas", "documents"],
+                limit=BUILD_PAGE_SIZE,
+                offset=offset,
+            )
+            ids.extend(page["ids"])
+            documents.extend(page["documents"])
+            metadatas.extend(page["metadatas"])
+
+        return cls.build(ids, documents, metadatas, index_dir)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def scores(self, query: str) -> np.ndarray:
+        """Compute the BM25 score of every document for a query."""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term, count in Counter(tokenize(query)).items():
+            index = self.terms.get(term)
+            if index is None:
+                continue
+            start, end = self.term_offsets[index], self.term_offsets[index + 1]
+            # A term's postings hold each document once, so fancy-index addition is safe
+            scores[self.posting_documents[start:end]] += count * self.posting_weights[start:end]
+        return scores
+
+    def query(
+        self,
+        query: str,
+        n_results: int = 5,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Find the highest scoring documents that contain at least one query term.
+
+        Args:
+            query: Query text
+            n_results: Number of results
+            where: Chroma-style metadata filter
+
+        Returns:
+            Result dicts with a "score" key, best first
+        """
+        if n_results <= 0:
+            return []
+
+        scores = self.scores(query)
+        if where:
+            scores[~self._masks.mask(where)] = 0.0
+
+        matched = np.flatnonzero(scores > 0.0)
+        if len(matched) > n_results:
+            matched = matched[np.argpartition(-scores[matched], n_results - 1)[:n_results]]
+        # Sort by score, breaking ties by position for deterministic output
+        matched = matched[np.lexsort((matched, -scores[matched]))]
+
+        return [
+            {
+                "id": self.ids[position],
+                "metadata": self.metadatas[position],
+                "document": self.documents[position],
+                "score": float(scores[position]),
+            }
+            for position in matched
+        ]
@@ -0,0 +1,204 @@
+"""Aliases pointing at versioned Chroma collections, for blue/green index rebuilds.
+
+Ingestion builds each version into a new collection name and, once it passes
+validation, atomically replaces the alias record so readers switch to it in one step.
+The record lives in ``collection_aliases.json`` in the persist directory.
+"""
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import chromadb
+
+from db.sharding import ShardedCollection, read_shard_count, shard_directory
+
+ALIAS_FILE = "collection_aliases.json"
+DEFAULT_COLLECTION_ALIAS = "ipeds_colleges"
+
+# A new build must hold at least this share of the active collection's documents
+DEFAULT_MIN_COUNT_RATIO = 0.9
+
+# Suffix of the collection holding a build's section vectors, if it has any
+SECTIONS_SUFFIX = "__sections"
+
+
+class CollectionTarget(NamedTuple):
+    """A concrete collection and the number of shards it is split over."""
+    collection: str
+    shard_count: int = 1
+
+
+def versioned_name(alias: str) -> str:
+    """Get a new collection name for a build of ``alias``."""
+    return f"{alias}_{time.strftime('%Y%m%d_%H%M%S')}"
+
+
+def section_target(target: CollectionTarget) -> CollectionTarget:
+    """Get the collection of a build's section vectors, sharded like the build."""
+    return CollectionTarget(f"{target.collection}{SECTIONS_SUFFIX}", target.shard_count)
+
+
+def _alias_path(persist_directory: str) -> str:
+    return os.path.join(persist_directory, ALIAS_FILE)
+
+
+def read_aliases(persist_directory: str) -> Dict[str, Dict[str, Any]]:
+    path = _alias_path(persist_directory)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def resolve_alias(persist_directory: str, alias: str = DEFAULT_COLLECTION_ALIAS) -> CollectionTarget:
+    """Get the collection an alias points at.
+
+    Persist directories built before aliases existed hold the collection under the
+    alias name itself.
+    """
+    record = read_aliases(persist_directory).get(alias)
+    if record is None:
+        return CollectionTarget(alias, read_shard_count(persist_directory))
+    return CollectionTarget(record["collection"], record["shard_count"])
+
+
+def activate(
+    persist_directory: str,
+    alias: str,
+    target: CollectionTarget,
+    document_count: int,
+) -> CollectionTarget:
+    """Point an alias at a new collection, atomically.
+
+    The record is written to a temporary file and moved over the old one, so readers
+    see either the old or the new target, never a partial record.
+
+    Returns:
+        The target the alias pointed at before
+    """
+    aliases = read_aliases(persist_directory)
+    previous = resolve_alias(persist_directory, alias)
+    aliases[alias] = {
+        "collection": target.collection,
+        "shard_count": target.shard_count,
+        "document_count": document_count,
+        "activated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "previous": previous._asdict(),
+    }
+
+    os.makedirs(persist_directory, exist_ok=True)
+    temporary_path = f"{_alias_path(persist_directory)}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        json.dump(aliases, f, indent=2)
+    os.replace(temporary_path, _alias_path(persist_directory))
+    return previous
+
+
+def open_target(
+    persist_directory: str,
+    target: CollectionTarget,
+    embedding_function: Optional[Callable] = None,
+    create: bool = True,
+):
+    """Open a collection, through all of its shards if it is sharded.
+
+    Raises:
+        ValueError: If ``create`` is False and the collection does not exist
+    """
+    if target.shard_count > 1:
+        return ShardedCollection.open(
+            persist_directory, target.collection, embedding_function, target.shard_count, create=create
+        )
+    client = chromadb.PersistentClient(path=persist_directory)
+    if create:
+        return client.get_or_create_collection(name=target.collection, embedding_function=embedding_function)
+    return client.get_collection(name=target.collection, embedding_function=embedding_function)
+
+
+def open_collection(
+    persist_directory: str,
+    alias: str = DEFAULT_COLLECTION_ALIAS,
+    embedding_function: Optional[Callable] = None,
+):
+    """Open the collection an alias currently points at.
+
+    Raises:
+        ValueError: If the collection does not exist
+    """
+    return open_target(persist_directory, resolve_alias(persist_directory, alias), embedding_function, create=False)
+
+
+def validate_build(
+    collection,
+    expected_count: int,
+    previous_count: int = 0,
+    min_count_ratio: float = DEFAULT_MIN_COUNT_RATIO,
+) -> List[str]:
+    """Check that a freshly built collection is complete enough to serve.
+
+    Args:
+        collection: The new collection
+        expected_count: Documents the build produced
+        previous_count: Documents in the active collection, or 0 if there is none
+        min_count_ratio: Smallest accepted share of ``previous_count``
+
+    Returns:
+        Problems found; empty if the build can be activated
+    """
+    count = collection.count()
+    if count == 0:
+        return ["the collection is empty"]
+
+    problems = []
+    if count < expected_count:
+        problems.append(f"it holds {count} of the {expected_count} documents built")
+    if count < previous_count * min_count_ratio:
+        problems.append(
+            f"it holds {count} documents, fewer than {min_count_ratio:.0%} of the active collection's {previous_count}"
+        )
+
+    # A stored vector must find at least itself
+    sample = collection.get(limit=1, include=["embeddings"])
+    embeddings = sample.get("embeddings")
+    if embeddings is None or len(embeddings) == 0:
+        problems.append("documents have no embeddings")
+    else:
+        results = collection.query(query_embeddings=[list(map(float, embeddings[0]))], n_results=1, include=["distances"])
+        if not results["ids"][0]:
+            problems.append("a query for a stored vector returned no results")
+    return problems
+
+
+def _clients(persist_directory: str):
+    """Chroma clients of the persist directory and each shard directory in it."""
+    yield chromadb.PersistentClient(path=persist_directory)
+    shard = 0
+    while os.path.isdir(shard_directory(persist_directory, shard)):
+        yield chromadb.PersistentClient(path=shard_directory(persist_directory, shard))
+        shard += 1
+
+
+def drop_stale_versions(persist_directory: str, alias: str = DEFAULT_COLLECTION_ALIAS) -> List[str]:
+    """Delete built versions of an alias other than the active and previous ones.
+
+    The previous version is kept so a reader that has not refreshed yet, or a rollback,
+    can still use it. Section collections go with their build.
+
+    Returns:
+        Names of the deleted collections
+    """
+    record = read_aliases(persist_directory).get(alias)
+    if record is None:
+        return []
+    keep = {record["collection"], (record.get("previous") or {}).get("collection")}
+
+    dropped = []
+    for client in _clients(persist_directory):
+        for name in client.list_collections():
+            build = name[:-len(SECTIONS_SUFFIX)] if name.endswith(SECTIONS_SUFFIX) else name
+            if build.startswith(f"{alias}_") and build not in keep:
+                client.delete_collection(name=name)
+                if name not in dropped:
+                    dropped.append(name)
+    return dropped
@@ -1,13 +1,112 @@
 import chromadb
 from chromadb.config import Settings
 from chromadb.utils import embedding_functions
-from typing import List, Dict, Any, Optional
+from enum import Enum
+from typing import List, Dict, Any, Optional, Tuple, Union
 from models.college import College
+from models.college_filter import CollegeFilter
+from db.numpy_index import NumpyCollegeIndex, DEFAULT_NUMPY_INDEX_DIR
+from db.index_snapshot import SnapshotIndex, DEFAULT_SNAPSHOT_PATH
+from db.name_index import InstitutionNameIndex, DEFAULT_MIN_CONFIDENCE
+from db.bm25_index import BM25Index, DEFAULT_BM25_INDEX_DIR, open_build_index
+from db.collection_alias import DEFAULT_COLLECTION_ALIAS, CollectionTarget, open_target, resolve_alias, section_target
+from db.document_sections import DOCUMENT_SECTIONS, SECTION_FIELD, parent_id
+from db.sharding import ShardedCollection
+import json
 import os
 import logging
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rank offset of reciprocal rank fusion; 60 is the value from the original RRF paper
+RRF_K = 60
+
+# Minimum number of candidates each retriever contributes to a hybrid query
+HYBRID_CANDIDATE_POOL = 50
+
+# Sections included with each college in section-level retrieval, besides its overview
+DEFAULT_MAX_SECTIONS = 3
+
+
+def _format_query_results(results: Dict[str, Any], position: int) -> List[Dict[str, Any]]:
+    """Convert one query's rows of a Chroma query response into result dicts."""
+    return [
+        {
+            "id": id,
+            "metadata": metadata,
+            "distance": distance,
+            "document": document
+        }
+        for id, metadata, distance, document in zip(
+            results["ids"][position],
+            results["metadatas"][position],
+            results["distances"][position],
+            results["documents"][position]
+        )
+    ]
+
+
+WhereFilter = Optional[Union[CollegeFilter, Dict[str, Any]]]
+
+
+def _compile_where(where: WhereFilter) -> Optional[Dict[str, Any]]:
+    """Turn a CollegeFilter or raw where expression into a Chroma where expression."""
+    if isinstance(where, CollegeFilter):
+        return where.to_where()
+    return where or None
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> Dict[str, float]:
+    """Fuse several rankings of document ids into one score per id.
+    
+    Each ranking adds 1 / (k + rank) for every id it contains, with ranks starting at 1.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, id in enumerate(ranking, start=1):
+            scores[id] = scores.get(id, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+def _embedding_distances(query: List[float], vectors: np.ndarray, space: str) -> np.ndarray:
+    """Compute distances from one query to a few vectors the way Chroma reports them."""
+    query = np.asarray(query, dtype=np.float32)
+    products = vectors @ query
+    if space == "ip":
+        return 1.0 - products
+    if space == "cosine":
+        return 1.0 - products / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    return np.maximum(np.einsum("ij,ij->i", vectors, vectors) + query @ query - 2.0 * products, 0.0)
+
+
+class SearchBackend(str, Enum):
+    """Where nearest-neighbor queries are answered."""
+    CHROMA = "chroma"
+    NUMPY = "numpy"
+    SNAPSHOT = "snapshot"
+
+
+class RetrievalMode(str, Enum):
+    """How candidate colleges are retrieved for a query."""
+    VECTOR = "vector"
+    BM25 = "bm25"
+    HYBRID = "hybrid"
+
 
 class CollegeVectorStore:
-    def __init__(self, persist_directory: str = "./chroma_db"):
+    def __init__(
+        self,
+        persist_directory: str = "./chroma_db",
+        backend: SearchBackend = SearchBackend.CHROMA,
+        numpy_index_dir: str = DEFAULT_NUMPY_INDEX_DIR,
+        retrieval_mode: RetrievalMode = RetrievalMode.VECTOR,
+        bm25_index_dir: str = DEFAULT_BM25_INDEX_DIR,
+        collection_alias: str = DEFAULT_COLLECTION_ALIAS,
+        refresh_interval: Optional[float] = None,
+        snapshot_path: str = DEFAULT_SNAPSHOT_PATH,
+    ):
         # Configure ChromaDB logging
         logging.getLogger('chromadb').setLevel(logging.ERROR)
         
@@ -17,40 +116,485 @@ class CollegeVectorStore:
             model_name="text-embedding-ada-002"
         )
         
-        # Initialize Chroma client
-        self.client = chromadb.PersistentClient(path=persist_directory)
+        self.backend = SearchBackend(backend)
+        self.persist_directory = persist_directory
+        self.collection_alias = collection_alias
+        self.refresh_interval = refresh_interval
+        self._last_refresh = time.monotonic()
+        
+        if self.backend == SearchBackend.SNAPSHOT:
+            # Everything is served from one memory-mapped file; no Chroma directory is opened
+            self.client = None
+            self.active_target: Optional[CollectionTarget] = None
+            self.collection = None
+            self.section_collection = None
+        else:
+            # Initialize Chroma client
+            self.client = chromadb.PersistentClient(path=persist_directory)
+            
+            # Get or create the collection the alias points at, with embedding function. A
+            # sharded build is queried on all shards at once, with results merged by distance.
+            # With a refresh interval the alias is re-resolved, so a rebuild is picked up
+            # without restarting
+            self.active_target = resolve_alias(persist_directory, collection_alias)
+            self.collection = open_target(persist_directory, self.active_target, self.embedding_function)
+            
+            # One vector per document section, if the build stored them
+            self.section_collection = self._open_sections(self.active_target)
+        
+        # Exact in-process search over an exported copy of the collection
+        if self.backend == SearchBackend.NUMPY:
+            self.numpy_index: Optional[NumpyCollegeIndex] = NumpyCollegeIndex(numpy_index_dir)
+        elif self.backend == SearchBackend.SNAPSHOT:
+            self.numpy_index = SnapshotIndex(snapshot_path)
+        else:
+            self.numpy_index = None
+        
+        # Keyword index persisted at ingestion time, needed by the BM25 and hybrid modes; each
+        # build has its own, switched along with the collection
+        self.retrieval_mode = RetrievalMode(retrieval_mode)
+        self.bm25_index_dir = bm25_index_dir
+        self.bm25_index: Optional[BM25Index] = (
+            open_build_index(bm25_index_dir, self.active_target.collection if self.active_target else None)
+            if self.retrieval_mode != RetrievalMode.VECTOR
+            else None
+        )
+        
+        # Built on first use from the stored metadata
+        self._name_index: Optional[InstitutionNameIndex] = None
+        
+        # Last alias target a refresh could not switch to, so it is reported once
+        self._unfollowed_target: Optional[CollectionTarget] = None
+
+    def refresh(self) -> bool:
+        """Switch to the collection the alias points at if a rebuild has moved it.
+        
+        The new collection is fully built before the alias moves, so queries never see
+        a partial index. Queries already running finish on the previous collection.
         
-        # Get or create collection with embedding function
-        self.collection = self.client.get_or_create_collection(
-            name="ipeds_colleges",
-            embedding_function=self.embedding_function
+        Only the Chroma backend follows the alias. The NumPy and snapshot backends serve
+        an export taken from one build, so they keep serving it, together with that build's
+        collection and keyword index, until the store is recreated over a new export.
+        
+        Returns:
+            True if the store switched to a new collection
+        """
+        self._last_refresh = time.monotonic()
+        target = resolve_alias(self.persist_directory, self.collection_alias)
+        if target == self.active_target:
+            return False
+        if self.numpy_index is not None:
+            if target != self._unfollowed_target:
+                logger.warning(
+                    "Alias %s now points at %s, but the %s backend keeps serving its export of %s",
+                    self.collection_alias, target.collection, self.backend.value,
+                    self.active_target.collection if self.active_target else "a snapshot",
+                )
+                self._unfollowed_target = target
+            return False
+        
+        collection = open_target(self.persist_directory, target, self.embedding_function, create=False)
+        section_collection = self._open_sections(target)
+        bm25_index = (
+            open_build_index(self.bm25_index_dir, target.collection) if self.bm25_index is not None else None
         )
+        previous = (self.collection, self.section_collection)
+        self.collection = collection
+        self.section_collection = section_collection
+        self.bm25_index = bm25_index
+        self.active_target = target
+        self._name_index = None
+        
+        # Sharded collections own a thread pool; queries already running on one finish first
+        for replaced in previous:
+            if isinstance(replaced, ShardedCollection):
+                replaced.close()
+        return True
+
+    def _open_sections(self, target: CollectionTarget):
+        try:
+            return open_target(
+                self.persist_directory, section_target(target), self.embedding_function, create=False
+            )
+        except Exception:
+            return None
+
+    def _maybe_refresh(self) -> None:
+        """Re-resolve the alias when the refresh interval has passed."""
+        if self.refresh_interval is None or self.collection is None:
+            return
+        if time.monotonic() - self._last_refresh >= self.refresh_interval:
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the current collection
+                print(f"Error refreshing collection alias: {str(e)}")
 
-    def find_similar_colleges(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
-        """Find colleges similar to the query description."""
+    @property
+    def name_index(self) -> InstitutionNameIndex:
+        """Local index of institution names, built from metadata on first access."""
+        if self._name_index is None:
+            if self.numpy_index is not None:
+                self._name_index = InstitutionNameIndex(
+                    self.numpy_index.ids, self.numpy_index.metadatas
+                )
+            else:
+                self._name_index = InstitutionNameIndex.from_collection(self.collection)
+        return self._name_index
+
+    def resolve_institution(
+        self,
+        description: str,
+        min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+    ) -> Optional[Dict[str, Any]]:
+        """Resolve the institution a name or description refers to without an embedding call.
+        
+        Args:
+            description: Institution name or free-text description
+            min_confidence: Lowest name match score accepted
+            
+        Returns:
+            The matching college with its "name_match", or None when no name matches
+            confidently enough and the caller should fall back to vector search
+        """
+        self._maybe_refresh()
+        match = self.name_index.resolve(description)
+        if match is None or match.score < min_confidence:
+            return None
+        
+        if self.numpy_index is not None:
+            position = self.numpy_index.positions[match.doc_id]
+            metadata = self.numpy_index.metadatas[position]
+            document = self.numpy_index.documents[position]
+        else:
+            result = self.collection.get(ids=[match.doc_id], include=['metadatas', 'documents'])
+            if not result["ids"]:
+                return None
+            metadata = result["metadatas"][0]
+            document = result["documents"][0]
+        
+        return {
+            "id": match.doc_id,
+            "metadata": metadata,
+            "document": document,
+            "name_match": match._asdict(),
+        }
+
+    def find_similar_colleges(
+        self,
+        query: str,
+        n_results: int = 5,
+        where: WhereFilter = None,
+    ) -> List[Dict[str, Any]]:
+        """Find colleges similar to the query description.
+        
+        Args:
+            query: Query description
+            n_results: Number of results
+            where: Typed CollegeFilter or raw Chroma where expression applied before ranking
+        """
+        return self.find_similar_colleges_batch([query], n_results=n_results, where=where)[0]
+
+    def find_similar_colleges_batch(
+        self,
+        queries: List[str],
+        n_results: Union[int, List[int]] = 5,
+        where: Union[WhereFilter, List[WhereFilter]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Find colleges similar to each of many query descriptions.
+        
+        All queries are embedded in a single embedding request. Queries that share a
+        metadata filter are sent to Chroma together in one query call. In BM25 mode no
+        embeddings are computed; in hybrid mode vector and BM25 rankings are fused with
+        reciprocal rank fusion.
+        
+        Args:
+            queries: Query descriptions
+            n_results: Number of results for every query, or one count per query
+            where: CollegeFilter or Chroma where expression for every query, or one
+                filter (or None) per query
+            
+        Returns:
+            One list of results per query, in the same order as the queries
+        """
+        if not queries:
+            return []
+        
+        self._maybe_refresh()
+        counts, filters = self._per_query(queries, n_results, where)
+        if self.retrieval_mode == RetrievalMode.BM25:
+            return self.bm25_query(queries, n_results=counts, where=filters)
+        
+        embeddings = self.embedding_function(queries)
+        if self.retrieval_mode == RetrievalMode.HYBRID:
+            return self.hybrid_query(queries, embeddings, n_results=counts, where=filters)
+        return self._vector_query(embeddings, counts, filters)
+
+    def find_similar_colleges_by_section(
+        self,
+        query: str,
+        n_results: int = 5,
+        where: WhereFilter = None,
+        max_sections: int = DEFAULT_MAX_SECTIONS,
+    ) -> List[Dict[str, Any]]:
+        """Find colleges by their best matching section and keep only their relevant sections.
+        
+        Colleges are ranked by max-sim: the distance of their nearest section to the query.
+        Each result has the shape of a find_similar_colleges result, but its "document"
+        holds only the overview and the ``max_sections`` sections nearest the query, in
+        document order, and "sections" lists them.
+        
+        Args:
+            query: Query description
+            n_results: Number of colleges
+            where: Typed CollegeFilter or raw Chroma where expression applied before ranking
+            max_sections: Sections included per college besides the overview
+            
+        Raises:
+            ValueError: If the active build has no section vectors
+        """
+        self._maybe_refresh()
+        if self.section_collection is None:
+            raise ValueError("The active collection has no section vectors; rebuild it with --sections")
+        
+        query_embedding = self.embedding_function([query])[0]
+        results = self.section_collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results * len(DOCUMENT_SECTIONS),
+            where=_compile_where(where),
+            include=['metadatas', 'distances']
+        )
+        
+        # Results come nearest first, so each college's first section is its nearest
+        nearest: Dict[str, float] = {}
+        unit_ids: Dict[str, Any] = {}
+        for id, metadata, distance in zip(results["ids"][0], results["metadatas"][0], results["distances"][0]):
+            nearest.setdefault(parent_id(id), distance)
+            unit_ids.setdefault(parent_id(id), metadata["UNITID"])
+        college_ids = list(nearest)[:n_results]
+        if not college_ids:
+            return []
+        
+        # Every section of the selected colleges, to rank them all against the query
+        sections = self.section_collection.get(
+            where={"UNITID": {"$in": [unit_ids[id] for id in college_ids]}},
+            include=['metadatas', 'documents', 'embeddings']
+        )
+        space = (self.section_collection.metadata or {}).get("hnsw:space", "l2")
+        distances = _embedding_distances(
+            query_embedding, np.asarray(sections["embeddings"], dtype=np.float32), space
+        ).tolist()
+        
+        by_college: Dict[str, Dict[str, Tuple[float, str, Dict[str, Any]]]] = {}
+        for id, metadata, document, distance in zip(
+            sections["ids"], sections["metadatas"], sections["documents"], distances
+        ):
+            by_college.setdefault(parent_id(id), {})[metadata[SECTION_FIELD]] = (distance, document, metadata)
+        
+        colleges = []
+        for id in college_ids:
+            college_sections = by_college.get(id, {})
+            if not college_sections:
+                continue
+            ranked = sorted(
+                (section for section in college_sections if section != "overview"),
+                key=lambda section: college_sections[section][0],
+            )
+            included = [
+                section for section in DOCUMENT_SECTIONS
+                if section == "overview" and section in college_sections or section in ranked[:max_sections]
+            ]
+            metadata = next(iter(college_sections.values()))[2]
+            colleges.append({
+                "id": id,
+                "metadata": {key: value for key, value in metadata.items() if key != SECTION_FIELD},
+                "distance": nearest[id],
+                "document": " ".join(college_sections[section][1] for section in included),
+                "sections": included,
+            })
+        return colleges
+
+    def bm25_query(
+        self,
+        queries: List[str],
+        n_results: Union[int, List[int]] = 5,
+        where: Union[WhereFilter, List[WhereFilter]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Find colleges whose documents best match each query's terms.
+        
+        Results carry their BM25 "score". Their "distance" is 1 minus the score relative
+        to the best match for the query, since no embedding distance is computed.
+        
+        Returns:
+            One list of results per query, in the same order as the queries
+        """
+        counts, filters = self._per_query(queries, n_results, where)
+        batch_results = []
+        for query, count, query_filter in zip(queries, counts, filters):
+            hits = self.bm25_index.query(query, n_results=count, where=query_filter)
+            top_score = hits[0]["score"] if hits else 1.0
+            batch_results.append([
+                {**hit, "distance": 1.0 - hit["score"] / top_score} for hit in hits
+            ])
+        return batch_results
+
+    def hybrid_query(
+        self,
+        queries: List[str],
+        query_embeddings: List[List[float]],
+        n_results: Union[int, List[int]] = 5,
+        where: Union[WhereFilter, List[WhereFilter]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Fuse vector and BM25 rankings of each query with reciprocal rank fusion.
+        
+        Results carry their fused "score" and their embedding "distance" to the query,
+        so downstream similarity scores keep their meaning for keyword-only matches.
+        
+        Args:
+            queries: Query descriptions
+            query_embeddings: Embeddings of the queries
+            n_results: Number of results for every query, or one count per query
+            where: Filter for every query, or one filter per query
+            
+        Returns:
+            One list of results per query, in the same order as the queries
+        """
+        counts, filters = self._per_query(queries, n_results, where)
+        pools = [max(count, HYBRID_CANDIDATE_POOL) for count in counts]
+        vector_results = self._vector_query(query_embeddings, pools, filters)
+        
+        batch_results = []
+        for query, embedding, count, pool, query_filter, vector_hits in zip(
+            queries, query_embeddings, counts, pools, filters, vector_results
+        ):
+            keyword_hits = self.bm25_index.query(query, n_results=pool, where=query_filter)
+            fused = reciprocal_rank_fusion([
+                [hit["id"] for hit in vector_hits],
+                [hit["id"] for hit in keyword_hits],
+            ])
+            ranked = sorted(fused, key=lambda id: (-fused[id], id))
+            
+            hits = {hit["id"]: hit for hit in keyword_hits}
+            hits.update({hit["id"]: hit for hit in vector_hits})
+            keyword_only = [id for id in ranked if "distance" not in hits[id]]
+            distances = {hit["id"]: hit["distance"] for hit in vector_hits}
+            distances.update(self._distances_to(embedding, keyword_only))
+            # Keyword hits the vector index does not hold have no distance; the next
+            # ranked ids take their places
+            top = [id for id in ranked if id in distances][:count]
+            
+            batch_results.append([
+                {
+                    "id": id,
+                    "metadata": hits[id]["metadata"],
+                    "distance": distances[id],
+                    "document": hits[id]["document"],
+                    "score": fused[id],
+                }
+                for id in top
+            ])
+        return batch_results
+
+    def _per_query(
+        self,
+        queries: List[str],
+        n_results: Union[int, List[int]],
+        where: Union[WhereFilter, List[WhereFilter]],
+    ) -> Tuple[List[int], List[Optional[Dict[str, Any]]]]:
+        """Expand result counts and filters to one compiled entry per query."""
+        counts = n_results if isinstance(n_results, list) else [n_results] * len(queries)
+        filters = where if isinstance(where, list) else [where] * len(queries)
+        filters = [_compile_where(query_filter) for query_filter in filters]
+        if len(counts) != len(queries) or len(filters) != len(queries):
+            raise ValueError("n_results and where lists must have one entry per query")
+        return counts, filters
+
+    def _vector_query(
+        self,
+        embeddings: List[List[float]],
+        counts: List[int],
+        filters: List[Optional[Dict[str, Any]]],
+    ) -> List[List[Dict[str, Any]]]:
+        """Run nearest-neighbor queries, one call per distinct filter."""
+        # Group queries by filter so each distinct filter costs one query call
+        groups: Dict[str, List[int]] = {}
+        for index, query_filter in enumerate(filters):
+            groups.setdefault(json.dumps(query_filter, sort_keys=True), []).append(index)
+        
+        batch_results: List[List[Dict[str, Any]]] = [[] for _ in embeddings]
+        for indices in groups.values():
+            results = self.query_by_embeddings(
+                [embeddings[index] for index in indices],
+                n_results=max(counts[index] for index in indices),
+                where=filters[indices[0]],
+            )
+            for index, query_results in zip(indices, results):
+                batch_results[index] = query_results[:counts[index]]
+        
+        return batch_results
+
+    def _distances_to(self, query_embedding: List[float], ids: List[str]) -> Dict[str, float]:
+        """Compute embedding distances from a query to specific stored documents.
+        
+        Ids the vector index does not hold, such as keyword hits from an index built
+        over a different version, are left out.
+        """
+        if self.numpy_index is not None:
+            found = [id for id in ids if id in self.numpy_index.positions]
+            if not found:
+                return {}
+            positions = [self.numpy_index.positions[id] for id in found]
+            return dict(zip(found, self.numpy_index.distances([query_embedding])[0][positions].tolist()))
+        
+        if not ids:
+            return {}
+        result = self.collection.get(ids=ids, include=['embeddings'])
+        if not result["ids"]:
+            return {}
+        matrix = np.asarray(result["embeddings"], dtype=np.float32)
+        space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+        return dict(zip(result["ids"], _embedding_distances(query_embedding, matrix, space).tolist()))
+
+    def query_by_embeddings(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 5,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Find the nearest colleges for precomputed query embeddings on the active backend.
+        
+        Args:
+            query_embeddings: Query vectors
+            n_results: Number of results per query
+            where: Chroma metadata filter applied to every query
+            
+        Returns:
+            One list of results per query embedding
+        """
+        self._maybe_refresh()
+        if self.numpy_index is not None:
+            return self.numpy_index.query(query_embeddings, n_results=n_results, where=where)
+        
         results = self.collection.query(
-            query_texts=[query],
+            query_embeddings=query_embeddings,
             n_results=n_results,
+            where=where or None,
             include=['metadatas', 'distances', 'documents']
         )
-        
         return [
-            {
-                "id": id,
-                "metadata": metadata,
-                "distance": distance,
-                "document": document
-            }
-            for id, metadata, distance, document in zip(
-                results["ids"][0],
-                results["metadatas"][0],
-                results["distances"][0],
-                results["documents"][0]
-            )
+            _format_query_results(results, position) for position in range(len(query_embeddings))
         ]
 
     def get_all_colleges(self) -> List[Dict[str, Any]]:
         """Get all colleges in the vector store."""
+        self._maybe_refresh()
+        if self.collection is None:
+            index = self.numpy_index
+            return [
+                {"id": id, "metadata": metadata, "document": index.documents[position]}
+                for position, (id, metadata) in enumerate(zip(index.ids, index.metadatas))
+            ]
+        
         result = self.collection.get(include=['metadatas', 'documents'])
         if not result["ids"]:
             return []
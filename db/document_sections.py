@@ -0,0 +1,28 @@
+"""Sections of the institution documents, which can also be stored as documents of their own.
+
+A section document has the id ``doc_{UNITID}#{section}`` and its institution's metadata
+with the section name added under ``SECTION_FIELD``.
+"""
+
+# Sections of an institution document, in document order
+DOCUMENT_SECTIONS = [
+    "overview",
+    "mission",
+    "costs",
+    "admissions",
+    "enrollment",
+    "demographics",
+    "graduation",
+    "finance",
+]
+SECTION_FIELD = "SECTION"
+SECTION_ID_SEPARATOR = "#"
+
+
+def section_id(doc_id: str, section: str) -> str:
+    return f"{doc_id}{SECTION_ID_SEPARATOR}{section}"
+
+
+def parent_id(doc_id: str) -> str:
+    """Get the institution document id of a section id, or the id itself."""
+    return doc_id.split(SECTION_ID_SEPARATOR, 1)[0]
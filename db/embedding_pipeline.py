@@ -0,0 +1,268 @@
+"""Concurrent, rate-limited embedding of documents ahead of writing them to Chroma."""
+import collections
+import concurrent.futures
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import openai
+
+DEFAULT_EMBEDDING_MODEL = "text-embedding-ada-002"
+
+# OpenAI embedding limits: tokens per input, and inputs and tokens per request
+MAX_INPUT_TOKENS = 8191
+MAX_REQUEST_INPUTS = 2048
+MAX_REQUEST_TOKENS = 300_000
+
+# Requests are kept well below the per-request token limit so that a shard is spread
+# over several concurrent requests
+DEFAULT_REQUEST_TOKENS = 100_000
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_REQUESTS_PER_MINUTE = 3_000
+
+# Shards embedded ahead of the one being written; bounds memory when writes fall behind
+DEFAULT_MAX_PENDING_SHARDS = 2
+
+DEFAULT_MAX_RETRIES = 6
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+# Errors worth retrying; anything else (bad input, authentication) fails immediately
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+Shard = Tuple[List[str], List[str], List[Dict[str, Any]]]
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at a per-minute rate.
+
+    The bucket holds at most one minute of capacity, so a burst can never exceed the
+    rate limit it models.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Take ``amount`` from the bucket, waiting until it has refilled enough.
+
+        Returns:
+            Seconds spent waiting
+        """
+        amount = min(float(amount), self.capacity)
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.available >= amount:
+                    self.available -= amount
+                    return waited
+                delay = (amount - self.available) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def _get_encoding(model: str):
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def pack_requests(
+    token_counts: Sequence[int],
+    max_request_tokens: int = DEFAULT_REQUEST_TOKENS,
+    max_request_inputs: int = MAX_REQUEST_INPUTS,
+) -> List[List[int]]:
+    """Group inputs, in order, into requests within the per-request limits.
+
+    Args:
+        token_counts: Token count of each input, each at most the per-input limit
+        max_request_tokens: Maximum tokens in one request
+        max_request_inputs: Maximum inputs in one request
+
+    Returns:
+        Positions of the inputs in each request
+    """
+    requests: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for position, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > max_request_tokens or len(current) >= max_request_inputs):
+            requests.append(current)
+            current, current_tokens = [], 0
+        current.append(position)
+        current_tokens += tokens
+    if current:
+        requests.append(current)
+    return requests
+
+
+def _retry_after(error: Exception) -> float:
+    """Get the server's Retry-After delay from an API error, or 0 if it has none."""
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after", 0))
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
+
+
+class EmbeddingPipeline:
+    """Embeds build shards concurrently so vectors are ready before each write.
+
+    Each shard's documents are tokenized, truncated to the per-input limit and packed
+    into token-bounded requests. Requests run on a thread pool under shared token and
+    request buckets, and retryable API errors are retried with jittered exponential
+    backoff. ``run`` yields shards in order with their embeddings while later shards are
+    still being embedded, so writing one shard overlaps embedding the next.
+
+    Args:
+        embed: Function embedding a list of texts, e.g. the collection's Chroma embedding function
+        model: Embedding model, used to pick the tokenizer
+        concurrency: Maximum requests in flight
+        tokens_per_minute: Token rate limit
+        requests_per_minute: Request rate limit
+        max_request_tokens: Maximum tokens per request, capped at the API limit
+        max_pending_shards: Shards embedded ahead of the consumer
+        max_retries: Retries of a request before its documents are skipped
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[List[str]], List[Any]],
+        model: str = DEFAULT_EMBEDDING_MODEL,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+        requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+        max_request_tokens: int = DEFAULT_REQUEST_TOKENS,
+        max_pending_shards: int = DEFAULT_MAX_PENDING_SHARDS,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+    ):
+        self.embed = embed
+        self.encoding = _get_encoding(model)
+        self.concurrency = max(1, concurrency)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.max_request_tokens = min(max_request_tokens, MAX_REQUEST_TOKENS)
+        self.max_pending_shards = max(1, max_pending_shards)
+        self.max_retries = max_retries
+
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            "documents": 0,
+            "requests": 0,
+            "tokens": 0,
+            "retries": 0,
+            "truncated": 0,
+            "failed": 0,
+            "throttled_seconds": 0.0,
+        }
+
+    def _count(self, **increments: float) -> None:
+        with self.stats_lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    def prepare(self, texts: List[str]) -> Tuple[List[str], List[int]]:
+        """Truncate texts to the per-input token limit.
+
+        Newlines are replaced first, as the Chroma OpenAI embedding function does, so
+        counts match what is sent.
+
+        Returns:
+            The texts to embed and their token counts
+        """
+        texts = [text.replace("\n", " ") for text in texts]
+        encoded = self.encoding.encode_batch(texts, disallowed_special=())
+        token_counts = []
+        for position, tokens in enumerate(encoded):
+            if len(tokens) > MAX_INPUT_TOKENS:
+                tokens = tokens[:MAX_INPUT_TOKENS]
+                texts[position] = self.encoding.decode(tokens)
+                self._count(truncated=1)
+            token_counts.append(len(tokens))
+        return texts, token_counts
+
+    def _request(self, texts: List[str], tokens: int) -> List[Any]:
+        """Embed one request, waiting for rate limit capacity and retrying transient errors."""
+        for attempt in range(self.max_retries + 1):
+            throttled = self.request_bucket.acquire(1) + self.token_bucket.acquire(tokens)
+            self._count(throttled_seconds=throttled)
+            try:
+                embeddings = self.embed(texts)
+                self._count(requests=1, tokens=tokens)
+                return embeddings
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
+                delay = max(delay * random.uniform(0.5, 1.0), _retry_after(e))
+                self._count(retries=1)
+                time.sleep(delay)
+
+    def _submit(self, executor: concurrent.futures.Executor, texts: List[str]):
+        """Start embedding a shard's texts, one future per packed request."""
+        prepared, token_counts = self.prepare(texts)
+        requests = pack_requests(token_counts, self.max_request_tokens)
+        return [
+            (
+                positions,
+                executor.submit(
+                    self._request,
+                    [prepared[position] for position in positions],
+                    sum(token_counts[position] for position in positions),
+                ),
+            )
+            for positions in requests
+        ]
+
+    def _collect(self, shard: Shard, requests) -> Tuple[List[str], List[str], List[Dict[str, Any]], List[Any]]:
+        """Wait for a shard's requests and drop the documents of any that failed."""
+        texts, ids, metadatas = shard
+        embedded: List[Tuple[int, Any]] = []
+        for positions, future in requests:
+            try:
+                embedded.extend(zip(positions, future.result()))
+            except Exception as e:
+                print(f"Error embedding {len(positions)} documents: {str(e)}")
+                self._count(failed=len(positions))
+        self._count(documents=len(embedded))
+        return (
+            [texts[position] for position, _ in embedded],
+            [ids[position] for position, _ in embedded],
+            [metadatas[position] for position, _ in embedded],
+            [embedding for _, embedding in embedded],
+        )
+
+    def run(self, shards: Iterable[Shard]) -> Iterator[Tuple[List[str], List[str], List[Dict[str, Any]], List[Any]]]:
+        """Embed shards ahead of the consumer and yield them in order with their embeddings.
+
+        A new shard is only taken from ``shards`` once fewer than ``max_pending_shards``
+        are waiting, so a slow consumer holds back both embedding and the upstream build.
+
+        Yields:
+            (texts, ids, metadatas, embeddings) of each shard, without failed documents
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending: collections.deque = collections.deque()
+            for shard in shards:
+                pending.append((shard, self._submit(executor, shard[0])))
+                if len(pending) > self.max_pending_shards:
+                    yield self._collect(*pending.popleft())
+            while pending:
+                yield self._collect(*pending.popleft())
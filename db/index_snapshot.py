@@ -0,0 +1,249 @@
+"""Single-file, read-only snapshot of the collection for fast cold starts.
+
+A snapshot holds everything the NumPy search path needs in one file that is memory-mapped
+at startup, instead of a Chroma directory of SQLite and HNSW segments:
+
+* a float16 embedding matrix, with float32 squared row norms so none are computed on open
+* metadata as a zstd-compressed Parquet table
+* documents in zstd-compressed blocks, decompressed when a result needs them
+
+The file is ``MAGIC``, the length of a JSON header, the header, then the sections at the
+aligned offsets the header lists.
+"""
+import collections
+import json
+import os
+import struct
+import threading
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from db.numpy_index import NumpyCollegeIndex, read_collection
+from db.where import WhereMaskCache
+
+DEFAULT_SNAPSHOT_PATH = "./index_snapshot/ipeds_colleges.snapshot"
+
+MAGIC = b"IPEDSNAP"
+SNAPSHOT_VERSION = 1
+SECTION_ALIGNMENT = 64
+
+# Documents compressed together; larger blocks compress better but cost more per lookup
+DOCUMENT_BLOCK_SIZE = 64
+# Decompressed document blocks kept per snapshot
+DOCUMENT_CACHE_BLOCKS = 32
+
+_HEADER_LENGTH = struct.Struct("<Q")
+_CODEC = "zstd"
+_METADATA_TYPES = {bool: pa.bool_(), int: pa.int64(), float: pa.float64(), str: pa.string()}
+
+
+def _metadata_table(metadatas: List[Dict[str, Any]]) -> pa.Table:
+    """Build one nullable column per metadata key.
+
+    A key whose values are not all of one type is stored as JSON text, so every value
+    reads back exactly as it was exported.
+    """
+    keys = list(dict.fromkeys(key for metadata in metadatas for key in metadata))
+    columns = {}
+    json_keys = []
+    for key in keys:
+        values = [metadata.get(key) for metadata in metadatas]
+        types = {type(value) for value in values if value is not None}
+        if len(types) == 1 and next(iter(types)) in _METADATA_TYPES:
+            columns[key] = pa.array(values, type=_METADATA_TYPES[types.pop()])
+        else:
+            columns[key] = pa.array([None if value is None else json.dumps(value) for value in values], pa.string())
+            json_keys.append(key)
+    return pa.table(columns, metadata={"json_keys": json.dumps(json_keys)})
+
+
+def _metadata_rows(table: pa.Table) -> List[Dict[str, Any]]:
+    """Read metadata dicts back, leaving out the keys a document did not have."""
+    json_keys = set(json.loads((table.schema.metadata or {}).get(b"json_keys", b"[]")))
+    columns = {name: table.column(name).to_pylist() for name in table.column_names}
+    for key in json_keys:
+        columns[key] = [None if value is None else json.loads(value) for value in columns[key]]
+    return [
+        {key: values[row] for key, values in columns.items() if values[row] is not None}
+        for row in range(table.num_rows)
+    ]
+
+
+class _CompressedDocuments(Sequence):
+    """Documents read from compressed blocks of a mapped snapshot, on first access."""
+
+    def __init__(self, buffer: np.ndarray, blocks: List[List[int]], count: int, block_size: int):
+        self.buffer = buffer
+        self.blocks = blocks
+        self.count = count
+        self.block_size = block_size
+        self.codec = pa.Codec(_CODEC)
+        self._cache: "collections.OrderedDict[int, List[str]]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _block(self, block: int) -> List[str]:
+        with self._lock:
+            if block in self._cache:
+                self._cache.move_to_end(block)
+                return self._cache[block]
+
+        offset, length, raw_length = self.blocks[block]
+        raw = self.codec.decompress(
+            pa.py_buffer(self.buffer[offset:offset + length]), decompressed_size=raw_length
+        )
+        documents = json.loads(raw.to_pybytes())
+
+        with self._lock:
+            self._cache[block] = documents
+            if len(self._cache) > DOCUMENT_CACHE_BLOCKS:
+                self._cache.popitem(last=False)
+        return documents
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[index] for index in range(*position.indices(self.count))]
+        if position < 0:
+            position += self.count
+        if not 0 <= position < self.count:
+            raise IndexError("document position out of range")
+        return self._block(position // self.block_size)[position % self.block_size]
+
+
+def _align(offset: int) -> int:
+    return -(-offset // SECTION_ALIGNMENT) * SECTION_ALIGNMENT
+
+
+class SnapshotIndex(NumpyCollegeIndex):
+    """Exact search over a memory-mapped snapshot file.
+
+    Opening a snapshot maps the file and reads only the header and the metadata table.
+    The first query reads the float16 matrix into a float32 copy used for every query,
+    and documents are decompressed per block as results use them.
+    """
+
+    def __init__(self, path: str = DEFAULT_SNAPSHOT_PATH):
+        self.path = path
+        self.buffer = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self.buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not an index snapshot")
+
+        start = len(MAGIC) + _HEADER_LENGTH.size
+        (header_length,) = _HEADER_LENGTH.unpack(bytes(self.buffer[len(MAGIC):start]))
+        header = json.loads(bytes(self.buffer[start:start + header_length]))
+        if header["version"] != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {header['version']} in {path}")
+        self.header = header
+
+        count, dimension = header["count"], header["dimension"]
+        sections = header["sections"]
+        self.embeddings = np.frombuffer(
+            self.buffer, dtype=np.float16, count=count * dimension, offset=sections["embeddings"][0]
+        ).reshape(count, dimension)
+        self.squared_norms = np.frombuffer(
+            self.buffer, dtype=np.float32, count=count, offset=sections["squared_norms"][0]
+        )
+
+        offset, length = sections["metadata"]
+        # ParquetFile rather than read_table, which imports pyarrow.dataset and pandas
+        table = pq.ParquetFile(pa.BufferReader(pa.py_buffer(self.buffer[offset:offset + length]))).read()
+        self.metadatas: List[Dict[str, Any]] = _metadata_rows(table)
+        self.documents = _CompressedDocuments(
+            self.buffer, header["document_blocks"], count, header["document_block_size"]
+        )
+
+        self.ids: List[str] = header["ids"]
+        self.space: str = header["space"]
+        self.positions: Dict[str, int] = {doc_id: position for position, doc_id in enumerate(self.ids)}
+
+        # Recently used where expressions and their document masks
+        self._masks = WhereMaskCache(self.metadatas)
+
+        # float32 copy of the matrix, made by the first query; float16 products have no BLAS path
+        self._matrix = None
+
+    def _products(self, queries: np.ndarray) -> np.ndarray:
+        if self._matrix is None:
+            self._matrix = np.asarray(self.embeddings, dtype=np.float32)
+        return queries @ self._matrix.T
+
+    @classmethod
+    def export(cls, collection, path: str = DEFAULT_SNAPSHOT_PATH) -> "SnapshotIndex":
+        """Write a Chroma collection to a snapshot file.
+
+        The file is written next to ``path`` and moved into place, so a process opening
+        ``path`` sees either the old snapshot or the new one.
+
+        Args:
+            collection: Chroma collection to export
+            path: Snapshot file to write
+
+        Returns:
+            The exported snapshot, opened from disk
+        """
+        contents = read_collection(collection)
+        embeddings = contents["embeddings"].astype(np.float16)
+        # Norms of the stored float16 rows, so distances are consistent with the matrix
+        rounded = embeddings.astype(np.float32)
+        squared_norms = np.einsum("ij,ij->i", rounded, rounded).astype(np.float32)
+
+        metadata_sink = pa.BufferOutputStream()
+        pq.write_table(_metadata_table(contents["metadatas"]), metadata_sink, compression=_CODEC)
+
+        codec = pa.Codec(_CODEC)
+        document_blocks = []
+        for start in range(0, len(contents["documents"]), DOCUMENT_BLOCK_SIZE):
+            raw = json.dumps(contents["documents"][start:start + DOCUMENT_BLOCK_SIZE]).encode("utf-8")
+            document_blocks.append((codec.compress(raw).to_pybytes(), len(raw)))
+
+        payloads = {
+            "embeddings": embeddings.tobytes(),
+            "squared_norms": squared_norms.tobytes(),
+            "metadata": metadata_sink.getvalue().to_pybytes(),
+        }
+        header = {
+            "version": SNAPSHOT_VERSION,
+            "collection": collection.name,
+            "count": len(contents["ids"]),
+            "dimension": embeddings.shape[1],
+            "space": contents["space"],
+            "ids": contents["ids"],
+            "document_block_size": DOCUMENT_BLOCK_SIZE,
+        }
+
+        # Offsets depend on the header length and the header lists the offsets, so lay the
+        # sections out until the header stops growing
+        header_length = 0
+        while True:
+            offset = _align(len(MAGIC) + _HEADER_LENGTH.size + header_length)
+            header["sections"] = {}
+            for name, payload in payloads.items():
+                header["sections"][name] = [offset, len(payload)]
+                offset = _align(offset + len(payload))
+            header["document_blocks"] = []
+            for compressed, raw_length in document_blocks:
+                header["document_blocks"].append([offset, len(compressed), raw_length])
+                offset += len(compressed)
+            encoded = json.dumps(header).encode("utf-8")
+            if len(encoded) <= header_length:
+                break
+            header_length = len(encoded)
+        encoded = encoded.ljust(header_length)
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(MAGIC + _HEADER_LENGTH.pack(header_length) + encoded)
+            for name, payload in payloads.items():
+                f.seek(header["sections"][name][0])
+                f.write(payload)
+            for (compressed, _), (offset, _, _) in zip(document_blocks, header["document_blocks"]):
+                f.seek(offset)
+                f.write(compressed)
+        os.replace(temporary_path, path)
+        return cls(path)
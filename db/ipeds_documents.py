@@ -0,0 +1,736 @@
+"""Columnar builder for the IPEDS institution documents stored in the vector database.
+
+All tables are joined onto the HD2023 institutions with one left merge each, derived
+fields are computed as column operations, and text and metadata are rendered from the
+resulting wide frame. The output is identical to the per-row builder in
+``scripts/optimized_access_to_vector_mac.py``, including its value coercion: a row read
+with ``df.loc`` takes the common dtype of its table, so every numeric column of an
+all-numeric table with a float column renders as a float.
+"""
+import concurrent.futures
+import json
+import multiprocessing
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from db.analysis_store import hash_text
+from db.document_sections import DOCUMENT_SECTIONS, SECTION_FIELD, SECTION_ID_SEPARATOR, section_id
+from db.ipeds_tables import COLUMN_DTYPES_ATTR, ROW_DTYPE_ATTR, TableSchema
+
+# Institutions per process-pool task
+DEFAULT_SHARD_SIZE = 500
+
+# Metadata field holding the hash of a document's text and other metadata
+CONTENT_HASH_FIELD = "CONTENT_HASH"
+
+# Documents per collection write; Chroma embeds each write in one request
+WRITE_BATCH_SIZE = 200
+
+CONTROL_LABELS = {1: "Public", 2: "Private non-profit", 3: "Private for-profit"}
+
+LEVEL_LABELS = {
+    1: "Four or more years",
+    2: "At least 2 but less than 4 years",
+    3: "Less than 2 years",
+}
+
+ADDRESS_FIELDS = ["ADDR", "CITY", "STABBR", "ZIP"]
+
+TUITION_FIELDS = {
+    "TUITION1": "In-state tuition",
+    "TUITION2": "Out-of-state tuition",
+    "TUITION3": "Other tuition",
+    "FEES1": "In-state fees",
+    "FEES2": "Out-of-state fees",
+}
+
+ADMISSION_FIELDS = {
+    "APPLCN": "Applications received",
+    "ADMSSN": "Admissions offers",
+    "ENRLT": "Enrolled students",
+}
+
+ENROLLMENT_FIELDS = {
+    "EFUG": "Undergraduate enrollment",
+    "EFGRAD": "Graduate enrollment",
+    "EFTOTLT": "Total enrollment",
+}
+
+RACE_FIELDS = {
+    "EFAIANT": "American Indian/Alaska Native",
+    "EFASIAT": "Asian",
+    "EFBKAAT": "Black/African American",
+    "EFHISPT": "Hispanic/Latino",
+    "EFNHPIT": "Native Hawaiian/Pacific Islander",
+    "EFWHITT": "White",
+    "EF2MORT": "Two or more races",
+    "EFNRALT": "Race/ethnicity unknown",
+}
+
+# Finance table, section heading and reported fields, in document order
+FINANCE_SECTIONS = [
+    ("F2223_F1A", "Financial Data (Public Institution):", {
+        "F1A18": "Total revenues and other additions",
+        "F1A181": "Tuition and fees",
+        "F1A43": "Total expenses and other deductions",
+        "F1A06": "Instruction expenses",
+        "F1A11": "Research expenses",
+        "F1A121": "Public service expenses",
+        "F1A02": "Total assets",
+    }),
+    ("F2223_F2", "Financial Data (Private For-Profit Institution):", {
+        "F2D01": "Total revenues and investment return",
+        "F2D0111": "Tuition and fees",
+        "F2D02": "Total expenses",
+        "F2C19": "Total assets",
+        "F2C08A": "Total liabilities",
+    }),
+    ("F2223_F3", "Financial Data (Private Non-Profit Institution):", {
+        "F3D01": "Total revenues and investment return",
+        "F3D0111": "Tuition and fees",
+        "F3D02": "Total expenses",
+        "F3D06": "Instruction expenses",
+        "F3D07": "Research expenses",
+        "F3D08": "Public service expenses",
+        "F3C19": "Total assets",
+        "F3C08A": "Total liabilities",
+        "F3H01": "Value of endowment assets",
+    }),
+]
+
+# Metadata stored with each document, by source table
+METADATA_FIELDS = {
+    "HD2023": ["CITY", "STABBR", "ZIP", "SECTOR", "ICLEVEL", "CONTROL", "WEBADDR"],
+    "IC2023_AY": ["TUITION1", "TUITION2", "TUITION3", "FEES1", "FEES2"],
+    "ADM2023": ["APPLCN", "ADMSSN", "ENRLT"],
+    "EF2023": ["EFUG", "EFGRAD", "EFTOTLT"],
+    "EF2023A": ["EFTOTLM", "EFTOTLW", "EFAIANT", "EFASIAT", "EFBKAAT", "EFHISPT", "EFNHPIT", "EFWHITT", "EF2MORT", "EFNRALT"],
+    "GR2023": ["GRTOTLT", "GRCODEP"],
+    "IC2023Mission": ["MISSION", "missionURL"],
+    "F2223_F1A": ["F1A18", "F1A43", "F1A02"],
+    "F2223_F2": ["F2D01", "F2D02", "F2C19"],
+    "F2223_F3": ["F3D01", "F3D02", "F3C19", "F3H01"],
+}
+
+# Columns each table contributes to the wide frame
+USED_COLUMNS = {
+    "HD2023": ["INSTNM", *ADDRESS_FIELDS, "CONTROL", "ICLEVEL", "WEBADDR", "SECTOR"],
+    "IC2023Mission": ["MISSION", "missionURL"],
+    "IC2023_AY": list(TUITION_FIELDS),
+    "ADM2023": list(ADMISSION_FIELDS),
+    "EF2023": list(ENROLLMENT_FIELDS),
+    "EF2023A": ["EFTOTLM", "EFTOTLW", *RACE_FIELDS],
+    "GR2023": ["GRTOTLT", "GRCODEP"],
+    **{table: list(fields) for table, _, fields in FINANCE_SECTIONS},
+}
+for _table, _fields in METADATA_FIELDS.items():
+    USED_COLUMNS[_table] += [field for field in _fields if field not in USED_COLUMNS[_table]]
+
+# Rows of each table that describe an institution as a whole
+ROW_FILTERS = {"EF2023A": {"EFALEVEL": 1, "LINE": 29}}
+
+# Compact dtypes of loaded columns. Finance amounts exceed 32-bit integers and float32
+# would change how values render, so those are left as parsed.
+_COUNT_DTYPES = {
+    table: {field: "Int32" for field in fields}
+    for table, fields in {
+        "IC2023_AY": TUITION_FIELDS,
+        "ADM2023": ADMISSION_FIELDS,
+        "EF2023": ENROLLMENT_FIELDS,
+        "EF2023A": ["EFTOTLM", "EFTOTLW", *RACE_FIELDS],
+        "GR2023": ["GRTOTLT"],
+    }.items()
+}
+COMPACT_DTYPES = {
+    **_COUNT_DTYPES,
+    "HD2023": {"CITY": "category", "STABBR": "category", "CONTROL": "Int8", "ICLEVEL": "Int8", "SECTOR": "Int8"},
+    "EF2023A": {**_COUNT_DTYPES["EF2023A"], "EFALEVEL": "Int16", "LINE": "Int16"},
+}
+
+# What the columnar builder loads from each table
+TABLE_SCHEMAS = {
+    table: TableSchema(columns, COMPACT_DTYPES.get(table), ROW_FILTERS.get(table))
+    for table, columns in USED_COLUMNS.items()
+}
+
+
+def _presence_column(table_name: str) -> str:
+    return f"{table_name}."
+
+
+def _wide_column(table_name: str, field: str) -> str:
+    return f"{table_name}.{field}"
+
+
+def _render_dtypes(rows: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Cast a table's columns to the types its values have in a ``df.loc`` row.
+
+    A table loaded with only some of its columns carries its full-width row dtype, and
+    the parsed dtype of compacted columns, in ``attrs``. Integer and boolean columns
+    become nullable so institutions missing from the table do not turn them into floats
+    when merged.
+    """
+    row_dtype = pd.api.types.pandas_dtype(rows.attrs.get(ROW_DTYPE_ATTR) or rows.iloc[0].dtype)
+    part = rows[columns]
+    # Compacted columns go back to the dtype they were parsed as, which decides how they render
+    parsed = rows.attrs.get(COLUMN_DTYPES_ATTR, {})
+    restore = {
+        column: parsed[column]
+        for column in columns
+        if column in parsed and str(part[column].dtype) != parsed[column]
+    }
+    if restore:
+        part = part.astype(restore)
+    if row_dtype != object:
+        part = part.astype(row_dtype)
+
+    casts = {}
+    for column in columns:
+        if pd.api.types.is_bool_dtype(part[column]):
+            casts[column] = "boolean"
+        elif pd.api.types.is_integer_dtype(part[column]):
+            casts[column] = "Int64"
+    return part.astype(casts) if casts else part
+
+
+def join_tables(hd_df: pd.DataFrame, table_data: Dict[str, pd.DataFrame]) -> Tuple[pd.DataFrame, Dict[str, List[str]]]:
+    """Join every table onto the institutions in ``hd_df`` by UNITID.
+
+    Each table's first row per UNITID is used, as in the per-row builder.
+
+    Returns:
+        The wide frame with one row per institution, and the columns present per table
+    """
+    hd_df = hd_df[hd_df["UNITID"].notna()]
+    wide = pd.DataFrame({"UNITID": hd_df["UNITID"].astype("int64").to_numpy()})
+    present_columns: Dict[str, List[str]] = {}
+
+    for table_name, df in table_data.items():
+        if not isinstance(df, pd.DataFrame) or df.empty or table_name not in USED_COLUMNS:
+            continue
+
+        columns = [column for column in USED_COLUMNS[table_name] if column in df.columns]
+        rows = df[~df.index.duplicated(keep="first")]
+        part = _render_dtypes(rows, columns)
+        part.columns = [_wide_column(table_name, column) for column in columns]
+        part[_presence_column(table_name)] = True
+
+        wide = wide.merge(part, left_on="UNITID", right_index=True, how="left")
+        present_columns[table_name] = columns
+
+    return wide, present_columns
+
+
+class _Renderer:
+    """Renders document lines and metadata column by column from the wide frame."""
+
+    def __init__(self, wide: pd.DataFrame, present_columns: Dict[str, List[str]]):
+        self.wide = wide
+        self.present_columns = present_columns
+        self.size = len(wide)
+        self.lines: List[List[str]] = [[] for _ in range(self.size)]
+        # Number of lines each row had when each section started
+        self.section_starts: Dict[str, List[int]] = {}
+        # Rows whose values the per-row builder could not format; it skips those institutions
+        self.failed = np.zeros(self.size, dtype=bool)
+
+    def present(self, table_name: str) -> np.ndarray:
+        if table_name not in self.present_columns:
+            return np.zeros(self.size, dtype=bool)
+        return self.wide[_presence_column(table_name)].eq(True).to_numpy()
+
+    def has_column(self, table_name: str, field: str) -> bool:
+        return field in self.present_columns.get(table_name, ())
+
+    def values(self, table_name: str, field: str) -> List[Any]:
+        return self.wide[_wide_column(table_name, field)].tolist()
+
+    def notnull(self, table_name: str, field: str) -> np.ndarray:
+        """Rows where the table is present and the field has a value."""
+        if not self.has_column(table_name, field):
+            return np.zeros(self.size, dtype=bool)
+        return self.present(table_name) & self.wide[_wide_column(table_name, field)].notna().to_numpy()
+
+    def numeric(self, table_name: str, field: str, evaluated: np.ndarray) -> np.ndarray:
+        """Get a field as floats for arithmetic and comparisons.
+
+        Rows in ``evaluated`` holding a non-numeric value are marked failed, since the
+        per-row builder raises when it compares or adds them.
+        """
+        column = self.wide[_wide_column(table_name, field)]
+        numbers = pd.to_numeric(column, errors="coerce").astype("Float64").to_numpy(
+            dtype=np.float64, na_value=np.nan
+        )
+        self.failed |= evaluated & np.isnan(numbers)
+        return numbers
+
+    def format(self, values: List[Any], mask: np.ndarray, spec: str) -> List[Optional[str]]:
+        """Format the masked values with ``spec``; rows that cannot be formatted are marked failed."""
+        formatted: List[Optional[str]] = [None] * self.size
+        for row in np.flatnonzero(mask):
+            try:
+                formatted[row] = spec.format(values[row])
+            except (ValueError, TypeError):
+                self.failed[row] = True
+        return formatted
+
+    def field_items(self, table_name: str, fields: Dict[str, str], spec: str) -> List[List[str]]:
+        """Format each present, non-null field as a "label: value" item."""
+        items: List[List[str]] = [[] for _ in range(self.size)]
+        for field, label in fields.items():
+            mask = self.notnull(table_name, field)
+            if not mask.any():
+                continue
+            formatted = self.format(self.values(table_name, field), mask, f"{label}: {spec}")
+            for row in np.flatnonzero(mask):
+                if formatted[row] is not None:
+                    items[row].append(formatted[row])
+        return items
+
+    def add_line(self, formatted: List[Optional[str]]) -> None:
+        for line, text in zip(self.lines, formatted):
+            if text is not None:
+                line.append(text)
+
+    def add_section(self, heading: str, items: List[List[str]]) -> None:
+        for line, row_items in zip(self.lines, items):
+            if row_items:
+                line.append(heading)
+                line.extend(f"  - {item}" for item in row_items)
+
+    def begin_section(self, section: str) -> None:
+        self.section_starts[section] = [len(line) for line in self.lines]
+
+    def render_basic(self) -> None:
+        hd = "HD2023"
+        present = self.present(hd)
+        if self.has_column(hd, "INSTNM"):
+            self.add_line(self.format(self.values(hd, "INSTNM"), present, "Institution: {}"))
+
+        address: List[List[str]] = [[] for _ in range(self.size)]
+        for field in ADDRESS_FIELDS:
+            mask = self.notnull(hd, field)
+            values = self.values(hd, field) if mask.any() else []
+            for row in np.flatnonzero(mask):
+                address[row].append(str(values[row]))
+        self.add_line([f"Address: {', '.join(parts)}" if parts else None for parts in address])
+
+        for field, heading, labels in (("CONTROL", "Control", CONTROL_LABELS), ("ICLEVEL", "Level", LEVEL_LABELS)):
+            if not self.has_column(hd, field):
+                continue
+            values = self.values(hd, field)
+            formatted: List[Optional[str]] = [None] * self.size
+            for row in np.flatnonzero(present):
+                try:
+                    label = labels.get(values[row], f"Other (code: {values[row]})")
+                except TypeError:
+                    # Unhashable values cannot be looked up
+                    self.failed[row] = True
+                    continue
+                formatted[row] = f"{heading}: {label}"
+            self.add_line(formatted)
+
+        mask = self.notnull(hd, "WEBADDR")
+        if mask.any():
+            self.add_line(self.format(self.values(hd, "WEBADDR"), mask, "Website: {}"))
+
+    def render_mission(self) -> None:
+        mission = "IC2023Mission"
+        has_mission = self.notnull(mission, "MISSION")
+        has_url = self.notnull(mission, "missionURL") & ~has_mission
+        if has_mission.any():
+            self.add_line(self.format(self.values(mission, "MISSION"), has_mission, "Mission Statement: {}"))
+        if has_url.any():
+            self.add_line(self.format(self.values(mission, "missionURL"), has_url, "Mission Statement URL: {}"))
+
+    def render_admissions(self) -> None:
+        adm = "ADM2023"
+        items = self.field_items(adm, ADMISSION_FIELDS, "{:,}")
+
+        if self.has_column(adm, "APPLCN") and self.has_column(adm, "ADMSSN"):
+            both = self.notnull(adm, "APPLCN") & self.notnull(adm, "ADMSSN")
+            applications = self.numeric(adm, "APPLCN", both)
+            admissions = self.numeric(adm, "ADMSSN", both)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rates = (admissions / applications * 100).tolist()
+            for row in np.flatnonzero(both & (applications > 0)):
+                items[row].append(f"Admission rate: {rates[row]:.1f}%")
+
+        self.add_section("Admissions:", items)
+
+    def render_demographics(self) -> None:
+        efa = "EF2023A"
+        items: List[List[str]] = [[] for _ in range(self.size)]
+
+        if self.has_column(efa, "EFTOTLM") and self.has_column(efa, "EFTOTLW"):
+            both = self.notnull(efa, "EFTOTLM") & self.notnull(efa, "EFTOTLW")
+            men = self.numeric(efa, "EFTOTLM", both)
+            women = self.numeric(efa, "EFTOTLW", both)
+            total = men + women
+            with np.errstate(divide="ignore", invalid="ignore"):
+                male_pcts = (men / total * 100).tolist()
+                female_pcts = (women / total * 100).tolist()
+            for row in np.flatnonzero(both & (total > 0)):
+                items[row].append(f"Gender: {male_pcts[row]:.1f}% male, {female_pcts[row]:.1f}% female")
+
+        # Counts above zero, summed in field order like the per-row builder
+        counts = {}
+        total_race = np.zeros(self.size)
+        for field, label in RACE_FIELDS.items():
+            if not self.has_column(efa, field):
+                continue
+            notnull = self.notnull(efa, field)
+            values = self.numeric(efa, field, notnull)
+            included = notnull & (values > 0)
+            counts[label] = np.where(included, values, 0.0)
+            total_race = total_race + counts[label]
+
+        race_items: List[List[str]] = [[] for _ in range(self.size)]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for label, count in counts.items():
+                pcts = count / total_race * 100
+                shown = (total_race > 0) & (count > 0) & (pcts >= 1.0)
+                pct_values = pcts.tolist()
+                for row in np.flatnonzero(shown):
+                    race_items[row].append(f"{label}: {pct_values[row]:.1f}%")
+        for row_items, race in zip(items, race_items):
+            if race:
+                row_items.append("Race/Ethnicity:")
+                row_items.extend(f"  - {item}" for item in race)
+
+        self.add_section("Demographics:", items)
+
+    def render_graduation(self) -> None:
+        gr = "GR2023"
+        items: List[List[str]] = [[] for _ in range(self.size)]
+        mask = self.notnull(gr, "GRTOTLT")
+        if mask.any():
+            rates = self.numeric(gr, "GRTOTLT", mask)
+            # Graduation rates above 100 are stored as hundredths of a percent
+            rates = np.where(rates > 100, rates / 100, rates).tolist()
+            for row in np.flatnonzero(mask):
+                items[row].append(f"Overall graduation rate: {rates[row]:.1f}%")
+        self.add_section("Graduation Rates:", items)
+
+    def texts(self) -> List[str]:
+        self.begin_section("overview")
+        self.render_basic()
+        self.begin_section("mission")
+        self.render_mission()
+        self.begin_section("costs")
+        self.add_section("Costs:", self.field_items("IC2023_AY", TUITION_FIELDS, "${:,}"))
+        self.begin_section("admissions")
+        self.render_admissions()
+        self.begin_section("enrollment")
+        self.add_section("Enrollment:", self.field_items("EF2023", ENROLLMENT_FIELDS, "{:,}"))
+        self.begin_section("demographics")
+        self.render_demographics()
+        self.begin_section("graduation")
+        self.render_graduation()
+        self.begin_section("finance")
+        for table_name, heading, fields in FINANCE_SECTIONS:
+            self.add_section(heading, self.field_items(table_name, fields, "${:,}"))
+        return [" ".join(line) for line in self.lines]
+
+    def section_texts(self) -> List[Dict[str, str]]:
+        """Split each rendered row into its non-empty sections; call after ``texts``.
+
+        Joining a row's sections in order with spaces gives its document text.
+        """
+        sections: List[Dict[str, str]] = [{} for _ in range(self.size)]
+        ends = [len(line) for line in self.lines]
+        for section in reversed(DOCUMENT_SECTIONS):
+            starts = self.section_starts[section]
+            for row, line in enumerate(self.lines):
+                if ends[row] > starts[row]:
+                    sections[row][section] = " ".join(line[starts[row]:ends[row]])
+            ends = starts
+        return [
+            {section: row[section] for section in DOCUMENT_SECTIONS if section in row} for row in sections
+        ]
+
+    def metadatas(self) -> List[Dict[str, Any]]:
+        unit_ids = self.wide["UNITID"].tolist()
+        metadatas: List[Dict[str, Any]] = [{"UNITID": unit_id} for unit_id in unit_ids]
+
+        if self.has_column("HD2023", "INSTNM"):
+            names = self.values("HD2023", "INSTNM")
+            for row in np.flatnonzero(self.present("HD2023")):
+                metadatas[row]["INSTNM"] = names[row]
+
+        for table_name in self.present_columns:
+            for field in METADATA_FIELDS.get(table_name, []):
+                mask = self.notnull(table_name, field)
+                if not mask.any():
+                    continue
+                values = self.values(table_name, field)
+                for row in np.flatnonzero(mask):
+                    metadatas[row][field] = values[row]
+        return metadatas
+
+
+Documents = Tuple[List[str], List[str], List[Dict[str, Any]]]
+
+
+def render_documents(
+    wide: pd.DataFrame,
+    present_columns: Dict[str, List[str]],
+    sections: bool = False,
+) -> Documents:
+    """Render the texts, ids and metadatas of the rows of a joined frame.
+
+    Args:
+        wide: Joined frame from ``join_tables``, or a slice of one
+        present_columns: Columns present per table, from ``join_tables``
+        sections: Also render each institution's sections as documents, after the
+            institution documents
+
+    Returns:
+        Texts, ids and metadatas in row order
+    """
+    renderer = _Renderer(wide, present_columns)
+    texts = renderer.texts()
+    metadatas = renderer.metadatas()
+    unit_ids = wide["UNITID"].tolist()
+
+    keep = np.flatnonzero(~renderer.failed)
+    documents = (
+        [texts[row] for row in keep],
+        [f"doc_{unit_ids[row]}" for row in keep],
+        [metadatas[row] for row in keep],
+    )
+    if sections:
+        section_texts = renderer.section_texts()
+        for row in keep:
+            for section, text in section_texts[row].items():
+                documents[0].append(text)
+                documents[1].append(section_id(f"doc_{unit_ids[row]}", section))
+                documents[2].append({**metadatas[row], SECTION_FIELD: section})
+    return documents
+
+
+def split_sections(
+    texts: List[str], ids: List[str], metadatas: List[Dict[str, Any]], *columns: List[Any]
+) -> Tuple[Tuple[List[Any], ...], Tuple[List[Any], ...]]:
+    """Separate section documents from institution documents.
+
+    Args:
+        texts, ids, metadatas: Documents, as rendered with ``sections=True``
+        columns: Further per-document lists to split the same way, such as embeddings
+
+    Returns:
+        (texts, ids, metadatas, *columns) of the institution documents and of the sections
+    """
+    parts: Tuple[List[int], List[int]] = ([], [])
+    for position, doc_id in enumerate(ids):
+        parts[SECTION_ID_SEPARATOR in doc_id].append(position)
+    return tuple(
+        tuple([values[position] for position in positions] for values in (texts, ids, metadatas, *columns))
+        for positions in parts
+    )
+
+
+def build_institution_documents(
+    hd_df: pd.DataFrame,
+    table_data: Dict[str, pd.DataFrame],
+) -> Documents:
+    """Build the document text, id and metadata of every institution in ``hd_df``.
+
+    Args:
+        hd_df: HD2023 rows with a UNITID column, one per institution to build
+        table_data: Loaded tables indexed by UNITID, in load order
+
+    Returns:
+        Texts, ids and metadatas in ``hd_df`` order
+    """
+    return render_documents(*join_tables(hd_df, table_data))
+
+
+def render_document_shard(joined: Tuple[pd.DataFrame, Dict[str, List[str]]], start: int, end: int) -> Documents:
+    """Render the documents of rows ``start:end`` of a ``join_tables`` result."""
+    wide, present_columns = joined
+    return render_documents(wide.iloc[start:end], present_columns)
+
+
+def render_sectioned_shard(joined: Tuple[pd.DataFrame, Dict[str, List[str]]], start: int, end: int) -> Documents:
+    """Render the documents of rows ``start:end`` followed by their section documents."""
+    wide, present_columns = joined
+    return render_documents(wide.iloc[start:end], present_columns, sections=True)
+
+
+# Shard builder and the data it reads, inherited by forked workers instead of pickled per task
+_shared_build: Optional[Callable[[Any, int, int], Documents]] = None
+_shared_data: Any = None
+
+
+def _build_shard(start: int, end: int) -> Tuple[Documents, float]:
+    started = time.perf_counter()
+    documents = _shared_build(_shared_data, start, end)
+    return documents, time.perf_counter() - started
+
+
+def build_documents_in_parallel(
+    build: Callable[[Any, int, int], Documents],
+    data: Any,
+    total: int,
+    workers: int = 1,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+) -> Iterator[Tuple[Documents, float]]:
+    """Build documents for ``total`` rows in shards across a pool of forked processes.
+
+    ``data`` is handed to the workers once through fork copy-on-write; each task only
+    carries its row range. Shards are yielded in row order as soon as they are ready, so
+    the caller can write earlier shards while later ones are still being built.
+
+    Args:
+        build: Function building the documents of rows ``start:end`` from ``data``
+        data: Everything ``build`` reads, such as the joined tables
+        total: Number of rows to build
+        workers: Number of worker processes; 1 builds in this process
+        shard_size: Rows per task
+
+    Yields:
+        Each shard's (texts, ids, metadatas) and the seconds spent building it
+    """
+    global _shared_build, _shared_data
+
+    ranges = [(start, min(start + shard_size, total)) for start in range(0, total, shard_size)]
+    if not ranges:
+        return
+
+    _shared_build, _shared_data = build, data
+    try:
+        if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+            for start, end in ranges:
+                yield _build_shard(start, end)
+            return
+
+        context = multiprocessing.get_context("fork")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            yield from executor.map(_build_shard, *zip(*ranges))
+    finally:
+        _shared_build, _shared_data = None, None
+
+
+def content_hash(text: str, metadata: Dict[str, Any]) -> str:
+    """Hash a document's text and metadata, ignoring any stored content hash."""
+    fields = {key: value for key, value in metadata.items() if key != CONTENT_HASH_FIELD}
+    return hash_text(text, json.dumps(fields, sort_keys=True))
+
+
+def with_content_hashes(texts: List[str], metadatas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copy each metadata dict with the content hash of its document added."""
+    return [
+        {**metadata, CONTENT_HASH_FIELD: content_hash(text, metadata)}
+        for text, metadata in zip(texts, metadatas)
+    ]
+
+
+class IncrementalSync:
+    """Brings a collection in line with a new build, embedding only what changed.
+
+    Documents are matched by id (``doc_{UNITID}``) and compared by content hash. New and
+    changed documents are upserted; changed ones are deleted first, since Chroma merges
+    upserted metadata into the old record and would keep fields that no longer exist.
+    Documents without a stored hash count as changed.
+    """
+
+    def __init__(self, collection, page_size: int = 1000):
+        self.collection = collection
+        self.existing: Dict[str, Optional[str]] = {}
+        for offset in range(0, collection.count(), page_size):
+            page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            for id, metadata in zip(page["ids"], page["metadatas"]):
+                self.existing[id] = (metadata or {}).get(CONTENT_HASH_FIELD)
+
+        self.seen: set = set()
+        self.counts = {"new": 0, "changed": 0, "unchanged": 0, "removed": 0}
+
+    def diff(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> List[int]:
+        """Find the new and changed documents of one build shard and count them.
+
+        Args:
+            metadatas: Metadata including the content hash
+
+        Returns:
+            Positions of the documents that have to be embedded and written
+        """
+        pending = []
+        for position, (id, metadata) in enumerate(zip(ids, metadatas)):
+            self.seen.add(id)
+            if id not in self.existing:
+                self.counts["new"] += 1
+            elif self.existing[id] != metadata[CONTENT_HASH_FIELD]:
+                self.counts["changed"] += 1
+            else:
+                self.counts["unchanged"] += 1
+                continue
+            pending.append(position)
+        return pending
+
+    def upsert(
+        self,
+        texts: List[str],
+        ids: List[str],
+        metadatas: List[Dict[str, Any]],
+        embeddings: Optional[List[Any]] = None,
+        batch_size: int = WRITE_BATCH_SIZE,
+    ) -> int:
+        """Write documents selected by ``diff``, replacing the stored version of changed ones.
+
+        Args:
+            embeddings: Precomputed embeddings, or None to let the collection embed the texts
+
+        Returns:
+            Number of documents written
+        """
+        changed = [id for id in ids if id in self.existing]
+        if changed:
+            self.collection.delete(ids=changed)
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            self.collection.upsert(
+                documents=texts[start:end],
+                metadatas=metadatas[start:end],
+                ids=ids[start:end],
+                embeddings=embeddings[start:end] if embeddings is not None else None,
+            )
+        return len(ids)
+
+    def write(
+        self,
+        texts: List[str],
+        ids: List[str],
+        metadatas: List[Dict[str, Any]],
+        batch_size: int = WRITE_BATCH_SIZE,
+    ) -> int:
+        """Upsert the new and changed documents of one build shard.
+
+        Args:
+            metadatas: Metadata including the content hash
+
+        Returns:
+            Number of documents written, each of which is embedded
+        """
+        pending = self.diff(ids, metadatas)
+        return self.upsert(
+            [texts[position] for position in pending],
+            [ids[position] for position in pending],
+            [metadatas[position] for position in pending],
+            batch_size=batch_size,
+        )
+
+    def remove_missing(self, batch_size: int = WRITE_BATCH_SIZE) -> int:
+        """Delete stored documents that the new build did not produce.
+
+        Returns:
+            Number of deleted documents
+        """
+        removed = [id for id in self.existing if id not in self.seen]
+        for start in range(0, len(removed), batch_size):
+            self.collection.delete(ids=removed[start:start + batch_size])
+        self.counts["removed"] = len(removed)
+        return len(removed)
@@ -0,0 +1,303 @@
+"""Extraction of IPEDS Access tables with a Parquet cache keyed by the source file."""
+import os
+import shutil
+import subprocess
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_TABLE_CACHE_DIR = "./ipeds_cache"
+
+# Parquet schema metadata key holding the dtype a full-width row of the table takes
+ROW_DTYPE_KEY = b"ipeds_row_dtype"
+
+# DataFrame.attrs key carrying that dtype once the table is loaded
+ROW_DTYPE_ATTR = "row_dtype"
+
+# DataFrame.attrs key carrying the dtype each column was parsed as, before compaction
+COLUMN_DTYPES_ATTR = "column_dtypes"
+
+# Rows parsed at a time when a table is streamed with a schema
+DEFAULT_CHUNK_ROWS = 5000
+
+_INDEX_COLUMNS = ("UNITID", "unitid")
+
+
+class TableSchema(NamedTuple):
+    """The part of an Access table the document builder needs.
+
+    Args:
+        columns: Columns read besides UNITID
+        dtypes: Compact dtype per column, such as "Int32" or "category". A column is only
+            converted when no value changes; otherwise it keeps its parsed dtype.
+        row_filter: Column values a row must equal to be kept
+    """
+    columns: List[str]
+    dtypes: Optional[Dict[str, str]] = None
+    row_filter: Optional[Dict[str, Any]] = None
+
+    @property
+    def read_columns(self) -> List[str]:
+        """UNITID, the filter columns and the used columns, without duplicates."""
+        return list(dict.fromkeys(["UNITID", *(self.row_filter or {}), *self.columns]))
+
+    def filter_rows(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Keep the rows matching ``row_filter``."""
+        if not self.row_filter:
+            return df
+        mask = np.ones(len(df), dtype=bool)
+        for column, value in self.row_filter.items():
+            mask &= (df[column] == value).to_numpy()
+        return df[mask]
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Filter, prune and compact a loaded table.
+
+        The parsed dtype of each kept column is recorded in ``attrs`` so the builder can
+        restore it before rendering.
+        """
+        attrs = dict(df.attrs)
+        df = self.filter_rows(df)
+        df = df[[column for column in self.read_columns if column in df.columns]]
+        attrs.setdefault(COLUMN_DTYPES_ATTR, {column: str(dtype) for column, dtype in df.dtypes.items()})
+
+        casts = {}
+        for column, dtype in (self.dtypes or {}).items():
+            if column in df.columns and _is_lossless(df[column], dtype):
+                casts[column] = dtype
+        df = df.astype(casts) if casts else df.copy()
+        df.attrs = attrs
+        return df
+
+
+def _is_lossless(values: pd.Series, dtype: str) -> bool:
+    """Check that converting a column to ``dtype`` keeps every value."""
+    target = pd.api.types.pandas_dtype(dtype)
+    if isinstance(target, pd.CategoricalDtype):
+        return values.dtype == object
+    if not pd.api.types.is_integer_dtype(target) or not pd.api.types.is_numeric_dtype(values):
+        return False
+    present = values.dropna()
+    if present.empty:
+        return True
+    info = np.iinfo(target.numpy_dtype)
+    return bool(
+        (present == np.floor(present)).all()
+        and present.min() >= info.min
+        and present.max() <= info.max
+    )
+
+
+def _common_dtype(left, right):
+    """Combine the dtypes a column was parsed as in two chunks, as one parse would."""
+    if left == right:
+        return left
+    if left == object or right == object or left == bool or right == bool:
+        return np.dtype(object)
+    return np.result_type(left, right)
+
+
+def stream_mdb_export(
+    mdb_path: str,
+    table_name: str,
+    schema: Optional[TableSchema] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> pd.DataFrame:
+    """Parse a table straight from the ``mdb-export`` pipe instead of buffering its CSV.
+
+    With a schema, the table is parsed in chunks and each chunk is filtered and pruned
+    as it arrives, so the full-width table is never held in memory. The full-width row
+    dtype is still tracked across chunks and kept in ``attrs``.
+
+    Raises:
+        subprocess.CalledProcessError: If mdb-export fails
+    """
+    with subprocess.Popen(
+        ["mdb-export", mdb_path, table_name],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    ) as process:
+        try:
+            if schema is None:
+                df = pd.read_csv(process.stdout)
+            else:
+                df = _read_chunks(process.stdout, schema, chunk_rows)
+        finally:
+            # Drain the rest of the output so the process can exit
+            process.stdout.read()
+            stderr = process.stderr.read()
+            process.wait()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, process.args, stderr=stderr)
+    return df
+
+
+def _text_dtype(values: pd.Series) -> np.dtype:
+    """Get the dtype the CSV parser would give a column read here as strings."""
+    present = values.dropna()
+    numbers = pd.to_numeric(present, errors="coerce")
+    if numbers.isna().any():
+        return np.dtype(object)
+    if len(present) < len(values) or not pd.api.types.is_integer_dtype(numbers):
+        return np.dtype("float64")
+    return np.dtype("int64")
+
+
+def _read_chunks(stream, schema: TableSchema, chunk_rows: int) -> pd.DataFrame:
+    """Keep the schema's rows and columns of each chunk, then compact the result.
+
+    A chunk's parsed types can differ from what one parse of the whole table gives, e.g.
+    a ZIP column whose leading zeros are only kept when some other row makes it text.
+    The used columns are therefore read as strings and only converted once their type is
+    known for the whole table.
+    """
+    row_filter = schema.row_filter or {}
+    text_columns = [
+        column for column in schema.columns
+        if column not in row_filter and column not in _INDEX_COLUMNS
+    ]
+    chunks = pd.read_csv(stream, chunksize=chunk_rows, dtype={column: str for column in text_columns})
+
+    parsed_dtypes: Dict[str, Any] = {}
+    parts = []
+    for chunk in chunks:
+        for column, dtype in chunk.dtypes.items():
+            if column in text_columns:
+                dtype = _text_dtype(chunk[column])
+            parsed_dtypes[column] = _common_dtype(parsed_dtypes.get(column, dtype), dtype)
+        chunk = schema.filter_rows(chunk)
+        parts.append(chunk[[column for column in schema.read_columns if column in chunk.columns]])
+
+    df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+    for column in df.columns:
+        if column in text_columns and parsed_dtypes[column] != object:
+            df[column] = pd.to_numeric(df[column])
+        # Columns that changed type between chunks get the type one parse would give them
+        if df[column].dtype != parsed_dtypes[column]:
+            df[column] = df[column].astype(parsed_dtypes[column])
+
+    values = [dtype for column, dtype in parsed_dtypes.items() if column not in _INDEX_COLUMNS]
+    row = values[0] if values else np.dtype(object)
+    for dtype in values[1:]:
+        row = _common_dtype(row, dtype)
+    df.attrs[ROW_DTYPE_ATTR] = str(row)
+    return schema.apply(df)
+
+
+def row_dtype(df: pd.DataFrame) -> str:
+    """Get the dtype a row of the table has once it is indexed by UNITID.
+
+    ``df.loc[unitid]`` coerces a row to the common dtype of all the table's columns, which
+    decides how its values render. It is recorded before any columns are pruned.
+    """
+    values = df.drop(columns=list(_INDEX_COLUMNS), errors="ignore")
+    if values.empty:
+        return "object"
+    return str(values.iloc[0].dtype)
+
+
+class IPEDSTableCache:
+    """Parquet copies of the tables of one Access database file.
+
+    Files live in a directory named after the database's size and modification time, so
+    a replaced or modified ``.accdb`` file never serves stale tables. Reads can select
+    only the columns a caller needs; the full-width row dtype of each table is kept in
+    ``df.attrs`` so pruned tables still render like full ones.
+    """
+
+    def __init__(self, mdb_path: str, cache_dir: str = DEFAULT_TABLE_CACHE_DIR):
+        self.mdb_path = mdb_path
+        self.cache_dir = cache_dir
+        stat = os.stat(mdb_path)
+        self.source_stem = os.path.splitext(os.path.basename(mdb_path))[0]
+        self.fingerprint = f"{self.source_stem}-{stat.st_size}-{stat.st_mtime_ns}"
+        self.directory = os.path.join(cache_dir, self.fingerprint)
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, table_name: str) -> str:
+        return os.path.join(self.directory, f"{table_name}.parquet")
+
+    def load(self, table_name: str, schema: Optional[TableSchema] = None) -> pd.DataFrame:
+        """Load a table from the cache, exporting and caching it on a miss.
+
+        The full table is cached, so the cache serves any schema.
+
+        Args:
+            table_name: Access table name
+            schema: Rows, columns and dtypes to load, or None for the whole table
+
+        Returns:
+            The table, with its full-width row dtype in ``attrs``
+        """
+        path = self.path(table_name)
+        if os.path.exists(path):
+            self.hits += 1
+            df = self._read(path, schema)
+        else:
+            self.misses += 1
+            df = stream_mdb_export(self.mdb_path, table_name)
+            df.attrs[ROW_DTYPE_ATTR] = row_dtype(df)
+            self._write(df, path)
+        return schema.apply(df) if schema is not None else df
+
+    def _read(self, path: str, schema: Optional[TableSchema]) -> pd.DataFrame:
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        arrow_schema = parquet_file.schema_arrow
+        columns = filters = None
+        if schema is not None:
+            columns = [column for column in schema.read_columns if column in arrow_schema.names]
+            # Row filters are pushed down into the Parquet reader
+            filters = [
+                (column, "=", value)
+                for column, value in (schema.row_filter or {}).items()
+                if column in arrow_schema.names
+            ] or None
+        df = pq.read_table(path, columns=columns, filters=filters).to_pandas()
+
+        # Parquet nulls come back as None; the CSV parser's missing strings are NaN
+        for column in df.columns:
+            if df[column].dtype == object:
+                df[column] = df[column].where(df[column].notna(), np.nan)
+
+        metadata = arrow_schema.metadata or {}
+        df.attrs[ROW_DTYPE_ATTR] = metadata.get(ROW_DTYPE_KEY, b"object").decode()
+        return df
+
+    def _write(self, df: pd.DataFrame, path: str) -> None:
+        """Write a table to the cache; tables Parquet cannot store are left uncached."""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.replace_schema_metadata({
+                **(table.schema.metadata or {}),
+                ROW_DTYPE_KEY: df.attrs[ROW_DTYPE_ATTR].encode(),
+            })
+            os.makedirs(self.directory, exist_ok=True)
+            temporary_path = f"{path}.tmp"
+            pq.write_table(table, temporary_path)
+            os.replace(temporary_path, path)
+        except Exception as e:
+            print(f"Not caching {os.path.basename(path)}: {e}")
+
+    def purge_stale(self) -> List[str]:
+        """Delete cached copies of earlier versions of the same database file.
+
+        Returns:
+            Removed cache directories
+        """
+        if not os.path.isdir(self.cache_dir):
+            return []
+        removed = []
+        for name in os.listdir(self.cache_dir):
+            stale = name.startswith(f"{self.source_stem}-") and name != self.fingerprint
+            if stale and os.path.isdir(os.path.join(self.cache_dir, name)):
+                shutil.rmtree(os.path.join(self.cache_dir, name))
+                removed.append(name)
+        return removed
@@ -0,0 +1,319 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core._api import suppress_langchain_beta_warning
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.embeddings import Embeddings
+from langchain_core.load import dumps, loads
+
+from db.analysis_store import hash_text
+
+DEFAULT_LLM_CACHE_PATH = "./llm_cache.db"
+DEFAULT_SIMILARITY_THRESHOLD = 0.99
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 5_000
+
+# Longest normalized prompt sent to the embedding model; longer prompts only hit exactly
+MAX_EMBEDDED_CHARS = 20_000
+
+# Whitespace, including escaped whitespace inside serialized chat messages
+_WHITESPACE_PATTERN = re.compile(r"(?:\\[nrt]|\s)+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace and casing differences so near-identical prompts share a key."""
+    return _WHITESPACE_PATTERN.sub(" ", prompt).strip().casefold()
+
+
+def prompt_text(prompt: str) -> str:
+    """Extract the message contents from a serialized chat prompt for embedding.
+
+    Chat models pass the cache a JSON serialization of their messages; embedding that
+    boilerplate would make unrelated prompts look alike, so only the contents are kept.
+    """
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return prompt
+    if not isinstance(messages, list):
+        return prompt
+
+    contents = []
+    for message in messages:
+        content = message.get("kwargs", {}).get("content") if isinstance(message, dict) else None
+        if isinstance(content, str):
+            contents.append(content)
+    return "\n".join(contents) if contents else prompt
+
+
+class SemanticLLMCache(BaseCache):
+    """Disk-backed LangChain cache with exact and optional embedding-similarity lookups.
+
+    Pass an instance as the ``cache`` argument of a chat model to cache every chain built on
+    it. Exact hits match the normalized prompt and the full model configuration. When
+    ``embeddings`` is set, a miss falls back to the most similar cached prompt for the same
+    model configuration whose cosine similarity reaches ``similarity_threshold``. Prompts
+    longer than MAX_EMBEDDED_CHARS are never embedded, so only exact hits serve them.
+
+    A similar prompt is only a safe substitute when nothing that changes the answer can
+    hide in a small textual difference, such as a feature extraction prompt whose IPEDS
+    document pins the target. Give other chains' models ``exact_only()`` instead, which
+    shares the same entries but neither embeds prompts nor serves similar ones.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_LLM_CACHE_PATH,
+        embeddings: Optional[Embeddings] = None,
+        similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.path = path
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_latency = 0.0
+
+        # Misses waiting for the model response: start time and prompt embedding
+        self._pending: Dict[Tuple[str, str], Tuple[float, Optional[np.ndarray]]] = {}
+
+        # llm_hash -> keys and unit embeddings of its cached prompts, loaded on first lookup
+        self._keys: Dict[str, List[str]] = {}
+        self._matrices: Dict[str, np.ndarray] = {}
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                llm_hash TEXT NOT NULL,
+                return_val TEXT NOT NULL,
+                embedding BLOB,
+                latency REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_llm ON llm_cache (llm_hash)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (last_accessed)"
+        )
+        self._conn.commit()
+
+    def exact_only(self) -> "ExactLLMCache":
+        """A view of this cache that serves exact hits only."""
+        return ExactLLMCache(self)
+
+    def lookup(
+        self, prompt: str, llm_string: str, similar: bool = True
+    ) -> Optional[RETURN_VAL_TYPE]:
+        """Look up a cached response by exact key, then by prompt similarity if ``similar``."""
+        normalized = normalize_prompt(prompt)
+        key = hash_text(llm_string, normalized)
+        llm_hash = hash_text(llm_string)
+        now = time.time()
+
+        with self._lock:
+            self._purge_expired(now)
+            row = self._conn.execute(
+                "SELECT key, return_val, latency FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self.exact_hits += 1
+                return self._hit(row, now)
+
+        embedding = self._embed(prompt) if similar else None
+        if embedding is not None:
+            with self._lock:
+                row = self._most_similar(llm_hash, embedding)
+                if row is not None:
+                    self.semantic_hits += 1
+                    return self._hit(row, now)
+
+        with self._lock:
+            self.misses += 1
+            self._pending[(prompt, llm_string)] = (time.perf_counter(), embedding)
+        return None
+
+    def update(
+        self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE, similar: bool = True
+    ) -> None:
+        """Store a model response along with how long it took to generate.
+
+        The prompt is embedded for later similarity lookups only if ``similar``.
+        """
+        normalized = normalize_prompt(prompt)
+        key = hash_text(llm_string, normalized)
+        llm_hash = hash_text(llm_string)
+        now = time.time()
+
+        with self._lock:
+            started, embedding = self._pending.pop((prompt, llm_string), (None, None))
+        latency = time.perf_counter() - started if started is not None else 0.0
+        if embedding is None and similar:
+            embedding = self._embed(prompt)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    llm_hash,
+                    json.dumps([dumps(generation) for generation in return_val]),
+                    embedding.tobytes() if embedding is not None else None,
+                    latency,
+                    now,
+                    now,
+                ),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    """
+                    DELETE FROM llm_cache WHERE key IN (
+                        SELECT key FROM llm_cache ORDER BY last_accessed ASC LIMIT ?
+                    )
+                    """,
+                    (overflow,),
+                )
+                self.evictions += overflow
+                self._forget_embeddings()
+            elif embedding is not None:
+                self._add_embedding(llm_hash, key, embedding)
+            self._conn.commit()
+
+    def clear(self, **kwargs: Any) -> None:
+        """Delete every cached response."""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self._forget_embeddings()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit rate, saved latency and size metrics for the cache."""
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        hits = self.exact_hits + self.semantic_hits
+        lookups = hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "saved_latency_seconds": self.saved_latency,
+            "evictions": self.evictions,
+            "entries": entries,
+            "max_entries": self.max_entries,
+        }
+
+    def _hit(self, row: tuple, now: float) -> RETURN_VAL_TYPE:
+        """Record a hit for a cached row and deserialize its generations. Caller holds the lock."""
+        key, return_val, latency = row
+        self.saved_latency += latency
+        self._conn.execute("UPDATE llm_cache SET last_accessed = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        with suppress_langchain_beta_warning():
+            return [loads(generation) for generation in json.loads(return_val)]
+
+    def _purge_expired(self, now: float) -> None:
+        """Delete entries older than the TTL. Caller holds the lock."""
+        if self.ttl_seconds is None:
+            return
+        purged = self._conn.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        self._conn.commit()
+        if purged:
+            self._forget_embeddings()
+
+    def _embed(self, prompt: str) -> Optional[np.ndarray]:
+        """Embed a prompt's normalized contents as a unit-length vector, if similarity is enabled."""
+        if self.embeddings is None:
+            return None
+        text = normalize_prompt(prompt_text(prompt))
+        # Truncating could cut off exactly the part that differs between two prompts
+        if len(text) > MAX_EMBEDDED_CHARS:
+            return None
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _load_embeddings(self, llm_hash: str) -> None:
+        """Read a model configuration's prompt embeddings into memory. Caller holds the lock."""
+        rows = self._conn.execute(
+            "SELECT key, embedding FROM llm_cache WHERE llm_hash = ? AND embedding IS NOT NULL",
+            (llm_hash,),
+        ).fetchall()
+        self._keys[llm_hash] = [row[0] for row in rows]
+        self._matrices[llm_hash] = (
+            np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+            if rows
+            else np.empty((0, 0), dtype=np.float32)
+        )
+
+    def _add_embedding(self, llm_hash: str, key: str, embedding: np.ndarray) -> None:
+        """Add a stored prompt's embedding to a loaded matrix. Caller holds the lock."""
+        if llm_hash not in self._matrices:
+            return
+        keys, matrix = self._keys[llm_hash], self._matrices[llm_hash]
+        if key in keys:
+            matrix[keys.index(key)] = embedding
+        elif len(keys):
+            keys.append(key)
+            self._matrices[llm_hash] = np.vstack([matrix, embedding])
+        else:
+            keys.append(key)
+            self._matrices[llm_hash] = embedding[np.newaxis, :].copy()
+
+    def _forget_embeddings(self) -> None:
+        """Drop loaded matrices after rows were deleted. Caller holds the lock."""
+        self._keys.clear()
+        self._matrices.clear()
+
+    def _most_similar(self, llm_hash: str, embedding: np.ndarray) -> Optional[tuple]:
+        """Find the closest cached prompt above the threshold. Caller holds the lock."""
+        if llm_hash not in self._matrices:
+            self._load_embeddings(llm_hash)
+        keys = self._keys[llm_hash]
+        if not keys:
+            return None
+
+        similarities = self._matrices[llm_hash] @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        return self._conn.execute(
+            "SELECT key, return_val, latency FROM llm_cache WHERE key = ?", (keys[best],)
+        ).fetchone()
+
+
+class ExactLLMCache(BaseCache):
+    """View of a SemanticLLMCache that only serves exact hits; see ``exact_only``."""
+
+    def __init__(self, cache: SemanticLLMCache):
+        self.cache = cache
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        return self.cache.lookup(prompt, llm_string, similar=False)
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self.cache.update(prompt, llm_string, return_val, similar=False)
+
+    def clear(self, **kwargs: Any) -> None:
+        self.cache.clear(**kwargs)
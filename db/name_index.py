@@ -0,0 +1,193 @@
+import heapq
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, NamedTuple, Optional
+
+# Minimum confidence for a name match to be trusted without a vector search
+DEFAULT_MIN_CONFIDENCE = 0.85
+
+# Fuzzy matching only runs on short texts; long descriptions rely on exact name spans
+MAX_FUZZY_TOKENS = 12
+
+# Confidence of an exact name found inside a longer description
+EMBEDDED_NAME_SCORE = 0.95
+
+# Confidence of a name shared by several institutions that the text does not disambiguate
+AMBIGUOUS_NAME_SCORE = 0.5
+
+# Confidence boost for a fuzzy match whose city or state also appears in the text
+LOCATION_BONUS = 0.05
+
+# Fuzzy matches closer than this to the runner-up are ambiguous unless location decides
+FUZZY_AMBIGUITY_MARGIN = 0.05
+
+# USPS codes of the states, DC and the territories IPEDS covers
+US_STATE_CODES = frozenset({
+    "AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "DC", "FL", "GA", "HI", "ID", "IL",
+    "IN", "IA", "KS", "KY", "LA", "ME", "MD", "MA", "MI", "MN", "MS", "MO", "MT", "NE",
+    "NV", "NH", "NJ", "NM", "NY", "NC", "ND", "OH", "OK", "OR", "PA", "RI", "SC", "SD",
+    "TN", "TX", "UT", "VT", "VA", "WA", "WV", "WI", "WY", "AS", "FM", "GU", "MH", "MP",
+    "PR", "PW", "VI",
+})
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_STATE_ABBREVIATION = re.compile(r"\b([A-Z]{2})\b")
+
+
+def normalize_name(text: str) -> str:
+    """Lowercase a name and reduce punctuation to single spaces."""
+    return _NON_ALNUM.sub(" ", text.lower().replace("&", " and ")).strip()
+
+
+def _trigrams(normalized: str) -> set:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameMatch(NamedTuple):
+    """An institution resolved from free text by name."""
+    doc_id: str
+    unitid: Optional[int]
+    name: str
+    city: str
+    state: str
+    score: float
+    method: str
+
+
+class InstitutionNameIndex:
+    """Local exact and trigram index over institution names, cities and states.
+
+    Resolves which institution a short name or a longer description refers to without
+    any network call. Exact name spans are tried first, longest first; short texts fall
+    back to trigram Dice similarity. City and state mentions break ties between
+    institutions that share a name.
+    """
+
+    def __init__(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        self.entries: List[Dict[str, Any]] = []
+        self.by_name: Dict[str, List[int]] = defaultdict(list)
+        self.by_trigram: Dict[str, List[int]] = defaultdict(list)
+        self.trigram_counts: List[int] = []
+        self.max_name_tokens = 0
+
+        for doc_id, metadata in zip(ids, metadatas):
+            name = metadata.get("INSTNM")
+            if not name:
+                continue
+            normalized = normalize_name(str(name))
+            position = len(self.entries)
+            self.entries.append({
+                "doc_id": doc_id,
+                "unitid": metadata.get("UNITID"),
+                "name": str(name),
+                "city": str(metadata.get("CITY") or ""),
+                "state": str(metadata.get("STABBR") or ""),
+                "normalized_city": normalize_name(str(metadata.get("CITY") or "")),
+            })
+            self.by_name[normalized].append(position)
+            self.max_name_tokens = max(self.max_name_tokens, len(normalized.split()))
+
+            trigrams = _trigrams(normalized)
+            self.trigram_counts.append(len(trigrams))
+            for trigram in trigrams:
+                self.by_trigram[trigram].append(position)
+
+    @classmethod
+    def from_collection(cls, collection) -> "InstitutionNameIndex":
+        """Build the index from the metadata stored in a Chroma collection."""
+        result = collection.get(include=["metadatas"])
+        return cls(result["ids"], result["metadatas"])
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def resolve(self, text: str) -> Optional[NameMatch]:
+        """Find the institution a name or description most likely refers to.
+
+        Returns:
+            The best match with its confidence score, or None if no name is similar
+        """
+        normalized = normalize_name(text)
+        tokens = normalized.split()
+        if not tokens:
+            return None
+
+        states = set(_STATE_ABBREVIATION.findall(text)) & US_STATE_CODES
+        match = self._exact_match(tokens, normalized, states)
+        if match is None and len(tokens) <= MAX_FUZZY_TOKENS:
+            match = self._fuzzy_match(normalized, states)
+        return match
+
+    def _location_score(self, position: int, normalized: str, states: set) -> int:
+        """Count how many of an entry's city and state are mentioned in the text."""
+        entry = self.entries[position]
+        score = int(entry["state"] in states)
+        if entry["normalized_city"] and f" {entry['normalized_city']} " in f" {normalized} ":
+            score += 1
+        return score
+
+    def _to_match(self, position: int, score: float, method: str) -> NameMatch:
+        entry = self.entries[position]
+        return NameMatch(
+            doc_id=entry["doc_id"],
+            unitid=entry["unitid"],
+            name=entry["name"],
+            city=entry["city"],
+            state=entry["state"],
+            score=min(score, 1.0),
+            method=method,
+        )
+
+    def _exact_match(self, tokens: List[str], normalized: str, states: set) -> Optional[NameMatch]:
+        """Find the longest span of the text that is exactly an institution name."""
+        # Single words are too generic to identify an institution inside a description
+        min_span = 1 if len(tokens) == 1 else 2
+        for span in range(min(self.max_name_tokens, len(tokens)), min_span - 1, -1):
+            for start in range(len(tokens) - span + 1):
+                positions = self.by_name.get(" ".join(tokens[start:start + span]))
+                if not positions:
+                    continue
+
+                score = 1.0 if span == len(tokens) else EMBEDDED_NAME_SCORE
+                if len(positions) == 1:
+                    return self._to_match(positions[0], score, "exact")
+
+                ranked = sorted(
+                    positions,
+                    key=lambda position: self._location_score(position, normalized, states),
+                    reverse=True,
+                )
+                best = self._location_score(ranked[0], normalized, states)
+                if best > self._location_score(ranked[1], normalized, states):
+                    return self._to_match(ranked[0], score, "exact+location")
+                return self._to_match(ranked[0], AMBIGUOUS_NAME_SCORE, "ambiguous")
+        return None
+
+    def _fuzzy_match(self, normalized: str, states: set) -> Optional[NameMatch]:
+        """Find the name with the highest trigram Dice similarity to the text.
+
+        A best match within FUZZY_AMBIGUITY_MARGIN of the runner-up, such as one campus of
+        a university system named without its campus, is returned as ambiguous unless a
+        city or state mention favors it.
+        """
+        query_trigrams = _trigrams(normalized)
+        shared: Dict[int, int] = defaultdict(int)
+        for trigram in query_trigrams:
+            for position in self.by_trigram.get(trigram, ()):
+                shared[position] += 1
+        if not shared:
+            return None
+
+        def similarity(position: int) -> float:
+            dice = 2 * shared[position] / (len(query_trigrams) + self.trigram_counts[position])
+            if self._location_score(position, normalized, states):
+                dice += LOCATION_BONUS
+            return dice
+
+        ranked = heapq.nlargest(2, shared, key=similarity)
+        best = ranked[0]
+        if len(ranked) > 1 and similarity(best) - similarity(ranked[1]) < FUZZY_AMBIGUITY_MARGIN:
+            if self._location_score(best, normalized, states) <= self._location_score(ranked[1], normalized, states):
+                return self._to_match(best, AMBIGUOUS_NAME_SCORE, "ambiguous")
+        return self._to_match(best, similarity(best), "fuzzy")
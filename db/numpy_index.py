@@ -0,0 +1,188 @@
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from db.where import WhereMaskCache
+
+DEFAULT_NUMPY_INDEX_DIR = "./numpy_index"
+EMBEDDINGS_FILE = "embeddings.npy"
+SIDECAR_FILE = "index_meta.json"
+
+# Page size used when reading the Chroma collection during export
+EXPORT_PAGE_SIZE = 1000
+
+
+def read_collection(collection) -> Dict[str, Any]:
+    """Read every document of a Chroma collection, page by page.
+
+    Returns:
+        Dict of ids, metadatas, documents, a float32 embedding matrix and the distance space
+
+    Raises:
+        ValueError: If the collection is empty
+    """
+    total = collection.count()
+
+    ids: List[str] = []
+    metadatas: List[Dict[str, Any]] = []
+    documents: List[str] = []
+    matrix: Optional[np.ndarray] = None
+
+    for offset in range(0, total, EXPORT_PAGE_SIZE):
+        page = collection.get(
+            include=["embeddings", "metadatas", "documents"],
+            limit=EXPORT_PAGE_SIZE,
+            offset=offset,
+        )
+        page_embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+        if matrix is None:
+            matrix = np.empty((total, page_embeddings.shape[1]), dtype=np.float32)
+        matrix[len(ids):len(ids) + len(page["ids"])] = page_embeddings
+
+        ids.extend(page["ids"])
+        metadatas.extend(page["metadatas"])
+        documents.extend(page["documents"])
+
+    if matrix is None:
+        raise ValueError(f"Collection '{collection.name}' is empty; nothing to export")
+
+    return {
+        "ids": ids,
+        "metadatas": metadatas,
+        "documents": documents,
+        "embeddings": matrix[:len(ids)],
+        "space": (collection.metadata or {}).get("hnsw:space", "l2"),
+    }
+
+
+class NumpyCollegeIndex:
+    """Exact nearest-neighbor search over a memory-mapped float32 embedding matrix.
+
+    The index is a ``.npy`` matrix with one row per document plus a JSON sidecar holding
+    ids, metadatas, documents and the collection's distance space. Distances match what
+    Chroma reports for the same space, so results are interchangeable with the Chroma path.
+    """
+
+    def __init__(self, index_dir: str = DEFAULT_NUMPY_INDEX_DIR):
+        self.index_dir = index_dir
+        self.embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode="r")
+
+        with open(os.path.join(index_dir, SIDECAR_FILE), encoding="utf-8") as f:
+            sidecar = json.load(f)
+        self.ids: List[str] = sidecar["ids"]
+        self.metadatas: List[Dict[str, Any]] = sidecar["metadatas"]
+        self.documents: List[str] = sidecar["documents"]
+        self.space: str = sidecar.get("space", "l2")
+        self.positions: Dict[str, int] = {doc_id: position for position, doc_id in enumerate(self.ids)}
+
+        # Squared row norms are needed for L2 distances and cosine normalization
+        self.squared_norms = np.einsum("ij,ij->i", self.embeddings, self.embeddings)
+
+        # Recently used where expressions and their document masks
+        self._masks = WhereMaskCache(self.metadatas)
+
+    @classmethod
+    def export(cls, collection, index_dir: str = DEFAULT_NUMPY_INDEX_DIR) -> "NumpyCollegeIndex":
+        """Export a Chroma collection's embeddings, ids, metadatas and documents.
+
+        Args:
+            collection: Chroma collection to export
+            index_dir: Directory the matrix and sidecar file are written to
+
+        Returns:
+            The exported index, loaded from disk
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        contents = read_collection(collection)
+
+        np.save(os.path.join(index_dir, EMBEDDINGS_FILE), contents["embeddings"])
+        with open(os.path.join(index_dir, SIDECAR_FILE), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "ids": contents["ids"],
+                    "metadatas": contents["metadatas"],
+                    "documents": contents["documents"],
+                    "space": contents["space"],
+                },
+                f,
+            )
+
+        return cls(index_dir)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def distances(self, query_embeddings: List[List[float]]) -> np.ndarray:
+        """Compute distances from each query to every indexed document.
+
+        Returns:
+            Matrix of shape (number of queries, number of documents)
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        products = self._products(queries)
+
+        if self.space == "ip":
+            return 1.0 - products
+        if self.space == "cosine":
+            query_norms = np.linalg.norm(queries, axis=1)[:, None]
+            return 1.0 - products / (query_norms * np.sqrt(self.squared_norms)[None, :])
+
+        # Chroma's default "l2" space reports squared Euclidean distance
+        query_squared_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+        return np.maximum(query_squared_norms + self.squared_norms[None, :] - 2.0 * products, 0.0)
+
+    def _products(self, queries: np.ndarray) -> np.ndarray:
+        """Dot products of queries with every indexed row."""
+        return queries @ self.embeddings.T
+
+    def where_mask(self, where: Dict[str, Any]) -> np.ndarray:
+        """Get a boolean mask of the documents whose metadata matches a where expression."""
+        return self._masks.mask(where)
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 5,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Find the exact nearest documents for each query embedding.
+
+        Args:
+            query_embeddings: Query vectors
+            n_results: Number of results per query
+            where: Chroma-style metadata filter
+
+        Returns:
+            One list of result dicts per query, nearest first
+        """
+        distances = self.distances(query_embeddings)
+        k = min(n_results, distances.shape[1])
+
+        if where:
+            # Filtered-out documents can never be selected
+            mask = self.where_mask(where)
+            distances[:, ~mask] = np.inf
+            k = min(k, int(mask.sum()))
+
+        if k == 0:
+            return [[] for _ in query_embeddings]
+
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+
+        results = []
+        for row, candidates in enumerate(top):
+            candidate_distances = distances[row, candidates]
+            # Sort by distance, breaking ties by position for deterministic output
+            order = np.lexsort((candidates, candidate_distances))
+            results.append([
+                {
+                    "id": self.ids[index],
+                    "metadata": self.metadatas[index],
+                    "distance": float(distances[row, index]),
+                    "document": self.documents[index],
+                }
+                for index in candidates[order]
+            ])
+        return results
@@ -0,0 +1,354 @@
+"""Chroma collections partitioned by document id hash and used as one collection.
+
+Each shard is an independent Chroma ``PersistentClient`` directory inside the main
+persist directory, so shards can be written by separate processes. Which collection is
+served, and over how many shards, is recorded by its alias (``db/collection_alias.py``).
+"""
+import collections
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+
+import chromadb
+
+SHARD_MANIFEST = "shards.json"
+
+# Batches queued per shard writer before ShardedWriter.write waits for one to finish
+MAX_PENDING_WRITES = 2
+
+_RESULT_FIELDS = ("ids", "distances", "metadatas", "documents", "embeddings")
+
+
+def shard_of(doc_id: str, shard_count: int) -> int:
+    """Get the shard a document belongs to.
+
+    Document ids are ``doc_{UNITID}``, so this partitions by UNITID. crc32 is used
+    rather than ``hash`` so every process agrees.
+    """
+    return zlib.crc32(doc_id.encode("utf-8")) % shard_count
+
+
+def shard_directory(persist_directory: str, shard: int) -> str:
+    return os.path.join(persist_directory, f"shard-{shard:02d}")
+
+
+def read_shard_count(persist_directory: str) -> int:
+    """Get the shard count of a persist directory built before collection aliases.
+
+    Such builds recorded it in a ``shards.json`` manifest; without one the collection
+    is not sharded.
+    """
+    path = os.path.join(persist_directory, SHARD_MANIFEST)
+    if not os.path.exists(path):
+        return 1
+    with open(path, encoding="utf-8") as f:
+        return int(json.load(f)["shard_count"])
+
+
+def partition(ids: List[str], shard_count: int) -> List[List[int]]:
+    """Get the positions of the ids that belong to each shard."""
+    positions: List[List[int]] = [[] for _ in range(shard_count)]
+    for position, doc_id in enumerate(ids):
+        positions[shard_of(doc_id, shard_count)].append(position)
+    return positions
+
+
+def _take(values, positions: List[int]):
+    return None if values is None else [values[position] for position in positions]
+
+
+class ShardedCollection:
+    """Several Chroma collections used through the ``Collection`` methods this repo calls.
+
+    Queries run on every shard at the same time and their results are merged by
+    distance. Writes and id lookups are routed to the shard owning each id.
+    """
+
+    def __init__(self, shards: List[Any], embedding_function: Optional[Callable] = None):
+        self.shards = shards
+        self.name = shards[0].name
+        self.embedding_function = embedding_function
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(shards))
+
+    @classmethod
+    def open(
+        cls,
+        persist_directory: str,
+        name: str,
+        embedding_function: Optional[Callable] = None,
+        shard_count: int = 2,
+        create: bool = True,
+    ) -> "ShardedCollection":
+        """Open every shard of a collection.
+
+        Args:
+            persist_directory: Main Chroma persist directory
+            name: Collection name
+            embedding_function: Embeds query texts and documents added without embeddings
+            shard_count: Number of shards
+            create: Create shards that do not exist instead of raising
+
+        Raises:
+            ValueError: If ``create`` is False and a shard does not exist
+        """
+        shards = []
+        for shard in range(shard_count):
+            client = chromadb.PersistentClient(path=shard_directory(persist_directory, shard))
+            if create:
+                shards.append(client.get_or_create_collection(name=name, embedding_function=embedding_function))
+            else:
+                shards.append(client.get_collection(name=name, embedding_function=embedding_function))
+        return cls(shards, embedding_function)
+
+    @property
+    def metadata(self) -> Optional[Dict[str, Any]]:
+        return self.shards[0].metadata
+
+    def _fan_out(self, call: Callable[[Any], Any], shards: Optional[List[int]] = None) -> List[Any]:
+        """Call a function on several shards at the same time, returning results in shard order."""
+        shards = range(len(self.shards)) if shards is None else shards
+        try:
+            futures = self._executor.map(lambda shard: call(self.shards[shard]), shards)
+        except RuntimeError:
+            # Closed while a caller still held the collection; finish on this thread
+            return [call(self.shards[shard]) for shard in shards]
+        return list(futures)
+
+    def close(self) -> None:
+        """Stop the shard query threads once running calls finish, without waiting for them."""
+        self._executor.shutdown(wait=False)
+
+    def count(self) -> int:
+        return sum(self._fan_out(lambda shard: shard.count()))
+
+    def query(
+        self,
+        query_embeddings: Optional[List[List[float]]] = None,
+        query_texts: Optional[List[str]] = None,
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: List[str] = ["metadatas", "documents", "distances"],
+    ) -> Dict[str, Any]:
+        """Query every shard and keep the ``n_results`` nearest results per query."""
+        if query_embeddings is None:
+            query_embeddings = self.embedding_function(query_texts)
+        include = list(dict.fromkeys([*include, "distances"]))
+
+        responses = self._fan_out(lambda shard: shard.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where,
+            include=include,
+        ))
+
+        merged: Dict[str, Any] = {field: [] for field in _RESULT_FIELDS}
+        for position in range(len(query_embeddings)):
+            rows = [
+                (distance, shard, rank)
+                for shard, response in enumerate(responses)
+                for rank, distance in enumerate(response["distances"][position])
+            ]
+            rows.sort()
+            rows = rows[:n_results]
+            for field in _RESULT_FIELDS:
+                if responses[0].get(field) is not None:
+                    merged[field].append([responses[shard][field][position][rank] for _, shard, rank in rows])
+        return {field: values if responses[0].get(field) is not None else None for field, values in merged.items()}
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: List[str] = ["metadatas", "documents"],
+    ) -> Dict[str, Any]:
+        """Get documents from the shards, in shard order.
+
+        Pages given by ``limit`` and ``offset`` run through the shards one after another.
+        """
+        if ids is not None:
+            owners = sorted({shard_of(doc_id, len(self.shards)) for doc_id in ids})
+            responses = self._fan_out(
+                lambda shard: shard.get(ids=ids, where=where, include=include), owners
+            )
+        elif limit is None and not offset:
+            responses = self._fan_out(lambda shard: shard.get(where=where, include=include))
+        elif where is not None:
+            everything = self.get(where=where, include=include)
+            start = offset or 0
+            end = None if limit is None else start + limit
+            return {
+                field: values[start:end] if isinstance(values, list) else values
+                for field, values in everything.items()
+            }
+        else:
+            responses = []
+            skip = offset or 0
+            remaining = limit
+            for shard in self.shards:
+                if remaining is not None and remaining <= 0:
+                    break
+                size = shard.count()
+                if skip >= size:
+                    skip -= size
+                    continue
+                response = shard.get(limit=remaining, offset=skip, include=include)
+                responses.append(response)
+                skip = 0
+                if remaining is not None:
+                    remaining -= len(response["ids"])
+
+        merged: Dict[str, Any] = {"ids": []}
+        for field in ("metadatas", "documents", "embeddings"):
+            merged[field] = [] if field in include else None
+        for response in responses:
+            merged["ids"].extend(response["ids"])
+            for field in ("metadatas", "documents", "embeddings"):
+                if merged[field] is not None and response.get(field) is not None:
+                    merged[field].extend(list(response[field]))
+        return merged
+
+    def _route(self, method: str, ids: List[str], **fields) -> None:
+        """Send each id, and the matching entries of other fields, to its shard."""
+        groups = partition(ids, len(self.shards))
+
+        def call(shard: int) -> None:
+            positions = groups[shard]
+            getattr(self.shards[shard], method)(
+                ids=_take(ids, positions),
+                **{field: _take(values, positions) for field, values in fields.items()},
+            )
+
+        list(self._executor.map(call, [shard for shard, positions in enumerate(groups) if positions]))
+
+    def add(self, ids: List[str], documents=None, metadatas=None, embeddings=None) -> None:
+        self._route("add", ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def upsert(self, ids: List[str], documents=None, metadatas=None, embeddings=None) -> None:
+        self._route("upsert", ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        if ids is None:
+            self._fan_out(lambda shard: shard.delete(where=where))
+        else:
+            self._route("delete", ids)
+
+
+# Client of the shard written by this worker process and the collections it has opened
+_writer_client = None
+_writer_collections: Dict[str, Any] = {}
+_writer_recreate = False
+
+
+def _open_writer(directory: str, name: str, recreate: bool) -> None:
+    global _writer_client, _writer_recreate
+    _writer_client = chromadb.PersistentClient(path=directory)
+    _writer_recreate = recreate
+    _writer_collection(name)
+
+
+def _writer_collection(name: str) -> Any:
+    if name not in _writer_collections:
+        if _writer_recreate and name in _writer_client.list_collections():
+            _writer_client.delete_collection(name=name)
+        _writer_collections[name] = _writer_client.get_or_create_collection(name=name)
+    return _writer_collections[name]
+
+
+def _write_batch(
+    name: str, texts: List[str], ids: List[str], metadatas: List[Dict[str, Any]], embeddings: List[Any]
+) -> int:
+    _writer_collection(name).add(documents=texts, metadatas=metadatas, ids=ids, embeddings=embeddings)
+    return len(ids)
+
+
+class ShardedWriter:
+    """Writes precomputed documents into shard collections, one process per shard.
+
+    Each shard has a single dedicated process, so no Chroma directory is ever written
+    by two processes. ``write`` returns once the batch is queued, and only waits when
+    a shard already has ``MAX_PENDING_WRITES`` batches queued.
+
+    Other collections sharded the same way can be written through the same writer, so
+    they share its processes instead of opening the shard directories again.
+
+    Args:
+        persist_directory: Main Chroma persist directory
+        name: Collection written by default
+        shard_count: Number of shards
+        recreate: Delete the existing shard collections first
+    """
+
+    def __init__(self, persist_directory: str, name: str, shard_count: int, recreate: bool = False):
+        self.name = name
+        self.shard_count = shard_count
+        # Spawned rather than forked: the parent has Chroma clients and worker threads
+        context = multiprocessing.get_context("spawn")
+        self.executors = [
+            concurrent.futures.ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=context,
+                initializer=_open_writer,
+                initargs=(shard_directory(persist_directory, shard), name, recreate),
+            )
+            for shard in range(shard_count)
+        ]
+        self.pending: List[collections.deque] = [collections.deque() for _ in range(shard_count)]
+        # Documents written per collection
+        self.written: Dict[str, int] = collections.Counter()
+
+    def _finish(self, shard: int) -> None:
+        name, size, future = self.pending[shard].popleft()
+        try:
+            self.written[name] += future.result()
+        except Exception as e:
+            print(f"Error writing {size} documents to shard {shard}: {str(e)}")
+
+    def write(
+        self,
+        texts: List[str],
+        ids: List[str],
+        metadatas: List[Dict[str, Any]],
+        embeddings: List[Any],
+        name: Optional[str] = None,
+    ) -> None:
+        """Queue documents with their embeddings for their shards of a collection, by default ``name``."""
+        name = self.name if name is None else name
+        for shard, positions in enumerate(partition(ids, self.shard_count)):
+            if not positions:
+                continue
+            while len(self.pending[shard]) >= MAX_PENDING_WRITES:
+                self._finish(shard)
+            future = self.executors[shard].submit(
+                _write_batch,
+                name,
+                _take(texts, positions),
+                _take(ids, positions),
+                _take(metadatas, positions),
+                [list(map(float, embeddings[position])) for position in positions],
+            )
+            self.pending[shard].append((name, len(positions), future))
+
+    def close(self) -> int:
+        """Wait for every queued write and stop the writer processes.
+
+        Returns:
+            Number of documents written to the default collection; ``written`` has the
+            count of every collection
+        """
+        for shard in range(self.shard_count):
+            while self.pending[shard]:
+                self._finish(shard)
+        for executor in self.executors:
+            executor.shutdown()
+        return self.written[self.name]
+
+    def __enter__(self) -> "ShardedWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,73 @@
+"""In-process evaluation of Chroma ``where`` expressions for the local search backends."""
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Number of compiled metadata filter masks kept per index
+MASK_CACHE_SIZE = 64
+
+_COMPARISONS = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$gt": lambda value, operand: value > operand,
+    "$gte": lambda value, operand: value >= operand,
+    "$lt": lambda value, operand: value < operand,
+    "$lte": lambda value, operand: value <= operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+}
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Check whether a metadata dict satisfies a Chroma ``where`` expression.
+
+    Supports ``$and``/``$or`` and the comparison operators Chroma accepts on metadata.
+    As in Chroma, a document without the filtered field never matches.
+    """
+    if not where:
+        return True
+
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        else:
+            if key not in metadata:
+                return False
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, operand in condition.items():
+                if operator not in _COMPARISONS:
+                    raise ValueError(f"Unsupported where operator: {operator}")
+                if not _COMPARISONS[operator](metadata[key], operand):
+                    return False
+
+    return True
+
+
+class WhereMaskCache:
+    """Boolean document masks for recently used where expressions over a fixed metadata list."""
+
+    def __init__(self, metadatas: List[Dict[str, Any]], max_size: int = MASK_CACHE_SIZE):
+        self.metadatas = metadatas
+        self.max_size = max_size
+        self._masks: Dict[str, np.ndarray] = {}
+
+    def mask(self, where: Dict[str, Any]) -> np.ndarray:
+        """Get a boolean mask of the documents whose metadata matches a where expression."""
+        key = json.dumps(where, sort_keys=True)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = np.fromiter(
+                (matches_where(metadata, where) for metadata in self.metadatas),
+                dtype=bool,
+                count=len(self.metadatas),
+            )
+            if len(self._masks) >= self.max_size:
+                self._masks.pop(next(iter(self._masks)))
+            self._masks[key] = mask
+        return mask
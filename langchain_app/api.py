@@ -0,0 +1,344 @@
+"""HTTP service running the school matcher graph, with progress and tokens streamed over SSE.
+
+Each worker process loads the vector store and compiles the graph once at startup and
+serves every session with them. Sessions are identified by their graph ``thread_id``; a
+session's checkpoints live in its worker's memory, so a deployment with several workers
+needs to route each thread id to the same worker. With SCHOOLMATCH_CHECKPOINT_DB set they
+are saved to SQLite instead, and sessions waiting for feedback survive a restart. Sessions
+idle for longer than a TTL, or least recently used beyond a maximum count, are evicted with
+their checkpoints.
+
+    POST /matches                        start a match; returns its thread_id
+    GET  /matches/{thread_id}/events     progress, tokens and the end of the current run (SSE)
+    POST /matches/{thread_id}/feedback   answer the human feedback interrupt and run again
+    GET  /matches/{thread_id}            status and results so far
+    DELETE /matches/{thread_id}          end the session and free its checkpoints
+    GET  /metrics                        sessions, evictions and checkpoint memory
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.types import Command
+from pydantic import BaseModel
+
+from db.checkpoint_store import SqliteCheckpointSaver
+from langchain_app.school_matcher_graph import (
+    STREAM_MODES,
+    StreamEvents,
+    create_graph_config,
+)
+from langchain_app.sessions import (
+    DEFAULT_MAX_CHECKPOINTS_PER_THREAD,
+    DEFAULT_MAX_SESSIONS,
+    DEFAULT_SESSION_TTL,
+    SessionManager,
+)
+from langchain_app.utils.human_feedback import EMPTY_INPUT_MSG, HUMAN_FEEDBACK_INPUT_MSG
+from models.college_filter import CollegeFilter
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+
+# Events that end a run's event stream
+TERMINAL_EVENTS = ("awaiting_feedback", "done", "error")
+
+# Longest wait between sweeps for sessions past their TTL
+MAX_EVICTION_INTERVAL = 60.0
+
+# Seconds between checks of the collection alias for a rebuilt vector store. Rebuilds keep
+# only the previous version, so a worker that never switches fails after the second one
+DEFAULT_ALIAS_REFRESH_INTERVAL = 60.0
+
+
+class MatchRequest(BaseModel):
+    """Body of POST /matches."""
+    school: str
+    filter: Optional[CollegeFilter] = None
+    thread_id: Optional[str] = None
+
+
+class FeedbackRequest(BaseModel):
+    """Body of POST /matches/{thread_id}/feedback; empty feedback accepts the recommendation."""
+    feedback: str = ""
+
+
+class MatchSession:
+    """One thread id's runs and the events of the current run.
+
+    Events are queued as the graph produces them, so a client that connects to the event
+    stream late still receives the whole run.
+    """
+
+    def __init__(self, thread_id: str):
+        self.thread_id = thread_id
+        self.status = "running"
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def config(self) -> dict:
+        config = create_graph_config(thread_id=self.thread_id)
+        config["run_name"] = "School Matcher API"
+        return config
+
+
+def create_default_graph() -> CompiledStateGraph:
+    """Build the graph the CLI builds with its default options.
+
+    Sessions are saved to the SQLite file named by SCHOOLMATCH_CHECKPOINT_DB when it is set,
+    so they survive restarts, and otherwise kept in memory. The vector store switches to a
+    rebuilt collection within SCHOOLMATCH_ALIAS_REFRESH_INTERVAL seconds of its activation.
+    """
+    from db.analysis_store import DEFAULT_ANALYSIS_STORE_PATH, AnalysisStore
+    from db.college_vector_store import CollegeVectorStore
+    from langchain_app.school_matcher_graph import create_school_matcher_graph
+
+    checkpoint_db = os.getenv("SCHOOLMATCH_CHECKPOINT_DB")
+    checkpointer = (
+        SqliteCheckpointSaver(checkpoint_db, max_checkpoints_per_thread=DEFAULT_MAX_CHECKPOINTS_PER_THREAD)
+        if checkpoint_db
+        else None
+    )
+    refresh_interval = float(os.getenv("SCHOOLMATCH_ALIAS_REFRESH_INTERVAL", DEFAULT_ALIAS_REFRESH_INTERVAL))
+    return create_school_matcher_graph(
+        CollegeVectorStore(refresh_interval=refresh_interval),
+        analysis_store=AnalysisStore(DEFAULT_ANALYSIS_STORE_PATH),
+        checkpointer=checkpointer,
+    )
+
+
+async def run_session(
+    graph: CompiledStateGraph,
+    session: MatchSession,
+    graph_input: Any,
+    session_manager: Optional[SessionManager] = None,
+) -> None:
+    """Run the graph until it waits for feedback or finishes, queueing its events.
+
+    Web search tool calls are continued without waiting, as in the CLI. Each event marks
+    the session as used, so a long run is never evicted as idle.
+    """
+    stream_events = StreamEvents()
+    try:
+        while True:
+            async for mode, chunk in graph.astream(graph_input, config=session.config, stream_mode=STREAM_MODES):
+                for event in stream_events.events(mode, chunk):
+                    await session.events.put(event)
+                if session_manager is not None:
+                    session_manager.touch(session.thread_id)
+
+            state = await graph.aget_state(session.config)
+            if not state.next:
+                session.status = "done"
+                await session.events.put({"type": "done", **stream_events.timings()})
+                return
+
+            messages = state.values.get("messages", [])
+            if messages and getattr(messages[-1], "tool_calls", None):
+                graph_input = Command(resume="")
+                continue
+
+            session.status = "awaiting_feedback"
+            await session.events.put({
+                "type": "awaiting_feedback",
+                "prompt": HUMAN_FEEDBACK_INPUT_MSG,
+                **stream_events.timings(),
+            })
+            return
+    except Exception as e:
+        session.status = "error"
+        await session.events.put({"type": "error", "message": str(e)})
+
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def create_app(
+    graph_factory: Callable[[], CompiledStateGraph] = create_default_graph,
+    max_sessions: int = DEFAULT_MAX_SESSIONS,
+    session_ttl: float = DEFAULT_SESSION_TTL,
+) -> FastAPI:
+    """Create the service.
+
+    Args:
+        graph_factory: Builds the compiled graph; called once per worker process at startup.
+            Its checkpointer must be a BoundedMemorySaver or SqliteCheckpointSaver, which
+            report the metrics served at /metrics
+        max_sessions: Most sessions kept per worker; the least recently used are evicted
+        session_ttl: Seconds a session may be idle before it is evicted
+
+    Returns:
+        FastAPI application
+    """
+
+    def evicted(thread_id: str) -> None:
+        session = app.state.sessions.pop(thread_id, None)
+        if session is not None and session.task is not None:
+            session.task.cancel()
+
+    async def evict_expired(session_manager: SessionManager) -> None:
+        while True:
+            await asyncio.sleep(min(session_ttl, MAX_EVICTION_INTERVAL))
+            session_manager.evict_expired()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        # Loading the index and compiling the graph happen once per process, off the loop
+        app.state.graph = await asyncio.to_thread(graph_factory)
+        app.state.sessions = {}
+        checkpointer = app.state.graph.checkpointer
+        app.state.session_manager = SessionManager(
+            checkpointer,
+            max_sessions=max_sessions,
+            ttl=session_ttl,
+            on_evict=evicted,
+        )
+        if isinstance(checkpointer, SqliteCheckpointSaver):
+            # Sessions saved before a restart expire like the others, even if never requested
+            app.state.session_manager.restore(await asyncio.to_thread(checkpointer.thread_ids))
+        sweeper = asyncio.create_task(evict_expired(app.state.session_manager))
+        yield
+        sweeper.cancel()
+        for session in app.state.sessions.values():
+            if session.task is not None:
+                session.task.cancel()
+
+    app = FastAPI(title="SchoolMatch", lifespan=lifespan)
+
+    async def get_session(request: Request, thread_id: str) -> MatchSession:
+        session = request.app.state.sessions.get(thread_id)
+        if session is None:
+            session = await restore_session(request, thread_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail=f"No match with thread_id {thread_id}")
+        return session
+
+    async def restore_session(request: Request, thread_id: str) -> Optional[MatchSession]:
+        """Pick up a session saved by a persistent checkpointer before a restart."""
+        session = MatchSession(thread_id)
+        state = await request.app.state.graph.aget_state(session.config)
+        if not state.values:
+            return None
+
+        request.app.state.session_manager.create(thread_id)
+        request.app.state.sessions[thread_id] = session
+        if state.next:
+            session.status = "awaiting_feedback"
+            await session.events.put({"type": "awaiting_feedback", "prompt": HUMAN_FEEDBACK_INPUT_MSG})
+        else:
+            session.status = "done"
+            await session.events.put({"type": "done"})
+        return session
+
+    def start_run(request: Request, session: MatchSession, graph_input: Any) -> None:
+        session.status = "running"
+        session.events = asyncio.Queue()
+        session_manager = request.app.state.session_manager
+        session_manager.touch(session.thread_id)
+        session.task = asyncio.create_task(
+            run_session(request.app.state.graph, session, graph_input, session_manager)
+        )
+
+    @app.get("/health")
+    async def health() -> dict:
+        return {"status": "ok", "sessions": len(app.state.sessions)}
+
+    @app.get("/metrics")
+    async def metrics() -> dict:
+        session_metrics = app.state.session_manager.metrics()
+        return {**session_metrics._asdict(), "checkpoints": session_metrics.checkpoints._asdict()}
+
+    @app.post("/matches", status_code=202)
+    async def start_match(request: Request, body: MatchRequest) -> dict:
+        if body.thread_id in request.app.state.sessions:
+            raise HTTPException(status_code=409, detail=f"A match with thread_id {body.thread_id} already exists")
+
+        thread_id = request.app.state.session_manager.create(body.thread_id)
+        session = MatchSession(thread_id)
+        request.app.state.sessions[thread_id] = session
+        start_run(request, session, {"messages": [], "school": body.school, "college_filter": body.filter})
+        return {"thread_id": thread_id, "events": f"/matches/{thread_id}/events"}
+
+    @app.get("/matches/{thread_id}/events")
+    async def match_events(request: Request, thread_id: str) -> StreamingResponse:
+        session = await get_session(request, thread_id)
+
+        async def stream() -> AsyncIterator[str]:
+            while True:
+                event = await session.events.get()
+                yield _sse(event)
+                if event["type"] in TERMINAL_EVENTS:
+                    return
+
+        return StreamingResponse(
+            stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.post("/matches/{thread_id}/feedback", status_code=202)
+    async def match_feedback(request: Request, thread_id: str, body: FeedbackRequest) -> dict:
+        session = await get_session(request, thread_id)
+        if session.status != "awaiting_feedback":
+            raise HTTPException(status_code=409, detail=f"Match {thread_id} is {session.status}, not awaiting feedback")
+
+        start_run(request, session, Command(resume=body.feedback or EMPTY_INPUT_MSG))
+        return {"thread_id": thread_id, "events": f"/matches/{thread_id}/events"}
+
+    @app.get("/matches/{thread_id}")
+    async def match_status(request: Request, thread_id: str) -> dict:
+        session = await get_session(request, thread_id)
+        values = (await request.app.state.graph.aget_state(session.config)).values
+        return {
+            "thread_id": thread_id,
+            "status": session.status,
+            "target_unitid": values.get("target_unitid"),
+            "features": values.get("features", ""),
+            "partners": [result.model_dump() for result in values.get("ipeds_semantic_search", [])],
+            "final_recommendation": values.get("final_recommendation", ""),
+        }
+
+    @app.delete("/matches/{thread_id}", status_code=204)
+    async def end_match(request: Request, thread_id: str) -> Response:
+        await get_session(request, thread_id)
+        evicted(thread_id)
+        request.app.state.session_manager.close(thread_id)
+        return Response(status_code=204)
+
+    return app
+
+
+app = create_app(
+    max_sessions=int(os.getenv("SCHOOLMATCH_MAX_SESSIONS", DEFAULT_MAX_SESSIONS)),
+    session_ttl=float(os.getenv("SCHOOLMATCH_SESSION_TTL", DEFAULT_SESSION_TTL)),
+)
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(prog="schoolmatch-api")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Interface to bind")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to bind")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes, each with its own vector store, graph and sessions",
+    )
+    args = parser.parse_args()
+    uvicorn.run("langchain_app.api:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
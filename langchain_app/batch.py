@@ -0,0 +1,201 @@
+import concurrent.futures
+import json
+import os
+from time import perf_counter
+from typing import Any, Dict, List, Set
+
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.types import Command
+
+from langchain_app.school_matcher_graph import create_graph_config
+from langchain_app.utils.human_feedback import EMPTY_INPUT_MSG
+from models.college_filter import CollegeFilter
+
+DEFAULT_BATCH_WORKERS = 4
+
+
+def load_targets(input_path: str) -> List[Dict[str, Any]]:
+    """Load target institutions from a JSONL file.
+
+    Each line is an object with a "school" description, an optional "id" and an optional
+    "filter" holding CollegeFilter fields. Lines without an id are identified by their
+    line number. Ids must be unique.
+
+    Args:
+        input_path: Path to the JSONL file of targets
+
+    Returns:
+        Targets with "id", "school" and "filter" keys, in file order
+    """
+    targets = []
+    line_numbers: Dict[str, int] = {}
+    with open(input_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not record.get("school"):
+                raise ValueError(f"{input_path}:{line_number} is missing a 'school' description")
+            target_id = str(record.get("id", line_number))
+            # Finished targets are skipped on a rerun by their id, so ids must be unique
+            if target_id in line_numbers:
+                raise ValueError(
+                    f"{input_path}:{line_number} repeats the id {target_id!r} "
+                    f"of line {line_numbers[target_id]}"
+                )
+            line_numbers[target_id] = line_number
+            targets.append({
+                "id": target_id,
+                "school": record["school"],
+                "filter": CollegeFilter(**record["filter"]) if record.get("filter") else None,
+            })
+    return targets
+
+
+def load_completed_ids(output_path: str) -> Set[str]:
+    """Get the ids of targets that already finished successfully in an earlier run.
+
+    Failed targets are not counted, so a rerun retries them. A truncated last line left
+    by an interrupted run is ignored.
+    """
+    if not os.path.exists(output_path):
+        return set()
+
+    completed = set()
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok":
+                completed.add(str(record["id"]))
+    return completed
+
+
+def run_target(graph: CompiledStateGraph, target: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one target through the graph without waiting for human feedback.
+
+    Args:
+        graph: Compiled school matcher graph
+        target: Target with "id", "school" and optional "filter" keys
+
+    Returns:
+        Result record for the output file
+    """
+    # Every attempt runs on a new thread, so a thread left behind by a killed run is never
+    # continued with its stale messages
+    config = create_graph_config()
+    config["run_name"] = "School Matcher Batch"
+    start = perf_counter()
+
+    try:
+        graph.invoke(
+            {"messages": [], "school": target["school"], "college_filter": target.get("filter")},
+            config=config,
+        )
+
+        # The only interrupt is the human feedback prompt; answering it with the empty
+        # input ends the run with the current recommendation
+        while graph.get_state(config).next:
+            graph.invoke(Command(resume=EMPTY_INPUT_MSG), config=config)
+
+        return _result_record(target, graph.get_state(config).values, perf_counter() - start)
+    finally:
+        # The thread is never resumed, whether it finished or failed, so its checkpoints are dropped
+        graph.checkpointer.delete_thread(config["configurable"]["thread_id"])
+
+
+async def arun_target(graph: CompiledStateGraph, target: Dict[str, Any]) -> Dict[str, Any]:
+    """Async run_target; many targets can run at once on one event loop.
+
+    Args:
+        graph: Compiled school matcher graph
+        target: Target with "id", "school" and optional "filter" keys
+
+    Returns:
+        Result record for the output file
+    """
+    config = create_graph_config()
+    config["run_name"] = "School Matcher Batch"
+    start = perf_counter()
+
+    try:
+        await graph.ainvoke(
+            {"messages": [], "school": target["school"], "college_filter": target.get("filter")},
+            config=config,
+        )
+        while (await graph.aget_state(config)).next:
+            await graph.ainvoke(Command(resume=EMPTY_INPUT_MSG), config=config)
+
+        return _result_record(target, (await graph.aget_state(config)).values, perf_counter() - start)
+    finally:
+        await graph.checkpointer.adelete_thread(config["configurable"]["thread_id"])
+
+
+def _result_record(target: Dict[str, Any], values: Dict[str, Any], elapsed: float) -> Dict[str, Any]:
+    return {
+        "id": target["id"],
+        "school": target["school"],
+        "status": "ok",
+        "target_unitid": values.get("target_unitid"),
+        "features": values.get("features", ""),
+        "partners": [result.model_dump() for result in values.get("ipeds_semantic_search", [])],
+        "final_recommendation": values.get("final_recommendation", ""),
+        "elapsed_seconds": round(elapsed, 2),
+    }
+
+
+def run_batch(
+    graph: CompiledStateGraph,
+    input_path: str,
+    output_path: str,
+    max_workers: int = DEFAULT_BATCH_WORKERS,
+) -> Dict[str, int]:
+    """Run many targets through the graph concurrently and stream results to a JSONL file.
+
+    Results are appended as each target finishes, so an interrupted run can be resumed
+    by running the same command again; targets already written with status "ok" are skipped.
+
+    Args:
+        graph: Compiled school matcher graph
+        input_path: JSONL file of targets
+        output_path: JSONL file that results are appended to
+        max_workers: Maximum number of targets running at once
+
+    Returns:
+        Counts of succeeded, failed and skipped targets
+    """
+    targets = load_targets(input_path)
+    completed = load_completed_ids(output_path)
+    pending = [target for target in targets if target["id"] not in completed]
+    summary = {"succeeded": 0, "failed": 0, "skipped": len(targets) - len(pending)}
+
+    print(
+        f"Running {len(pending)} of {len(targets)} targets "
+        f"({summary['skipped']} already completed) with {max_workers} workers"
+    )
+
+    with open(output_path, "a", encoding="utf-8") as out, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_target, graph, target): target for target in pending}
+
+        for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+            target = futures[future]
+            try:
+                record = future.result()
+                summary["succeeded"] += 1
+            except Exception as e:
+                record = {
+                    "id": target["id"],
+                    "school": target["school"],
+                    "status": "error",
+                    "error": str(e),
+                }
+                summary["failed"] += 1
+
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            print(f"[{done}/{len(pending)}] {target['id']}: {record['status']}")
+
+    return summary
@@ -6,29 +6,166 @@ import warnings
 warnings.filterwarnings('ignore', message='typing.NotRequired is not a Python type')
 warnings.filterwarnings('ignore', category=UserWarning, module='pydantic._internal._generate_schema')
 
+from langchain_openai import OpenAIEmbeddings
 from langsmith import tracing_context
 
 from db.college_vector_store import CollegeVectorStore
+from db.analysis_store import AnalysisStore, DEFAULT_ANALYSIS_STORE_PATH
+from db.checkpoint_store import SqliteCheckpointSaver
+from db.llm_cache import SemanticLLMCache
+from langchain_app.batch import DEFAULT_BATCH_WORKERS, run_batch
 from langchain_app.school_matcher_graph import (
     create_graph_config,
     create_school_matcher_graph,
     run_school_matcher,
 )
+from langchain_app.sessions import DEFAULT_MAX_CHECKPOINTS_PER_THREAD
+
+
+def _create_llm_cache(
+    path: str | None, semantic_threshold: float | None
+) -> SemanticLLMCache | None:
+    if path is None:
+        return None
+    if semantic_threshold is None:
+        return SemanticLLMCache(path)
+    return SemanticLLMCache(
+        path,
+        embeddings=OpenAIEmbeddings(model="text-embedding-ada-002"),
+        similarity_threshold=semantic_threshold,
+    )
+
+
+# Options shared by the root parser and the batch subcommand are defined on both so they
+# can be given before or after "batch". The subcommand's copies have no defaults, since
+# argparse would otherwise overwrite values given before "batch" with them.
+def _default(value, subcommand: bool):
+    return argparse.SUPPRESS if subcommand else value
+
+
+def _add_cache_arguments(parser: argparse.ArgumentParser, subcommand: bool = False) -> None:
+    parser.add_argument(
+        "--analysis-store",
+        default=_default(DEFAULT_ANALYSIS_STORE_PATH, subcommand),
+        help="SQLite file used to reuse partner analyses across runs",
+    )
+    parser.add_argument(
+        "--no-analysis-store",
+        action="store_true",
+        default=_default(False, subcommand),
+        help="Always regenerate partner analyses",
+    )
+    parser.add_argument(
+        "--llm-cache",
+        default=_default(None, subcommand),
+        help="SQLite file used to cache LLM responses (disabled when omitted)",
+    )
+    parser.add_argument(
+        "--semantic-cache-threshold",
+        type=float,
+        default=_default(None, subcommand),
+        help="Also serve cached feature extractions for prompts with at least this embedding similarity",
+    )
+
+
+def _add_retrieval_arguments(parser: argparse.ArgumentParser, subcommand: bool = False) -> None:
+    parser.add_argument(
+        "--section-context",
+        action="store_true",
+        default=_default(False, subcommand),
+        help="Analyze partners on their most relevant document sections (needs a --sections build)",
+    )
+
+
+def _add_session_arguments(parser: argparse.ArgumentParser, subcommand: bool = False) -> None:
+    parser.add_argument(
+        "--checkpoint-db",
+        default=_default(None, subcommand),
+        help="SQLite file sessions are saved to, so they can be resumed after a restart",
+    )
+
+
+def _create_graph(args: argparse.Namespace):
+    vector_store = CollegeVectorStore()
+    analysis_store = None if args.no_analysis_store else AnalysisStore(args.analysis_store)
+    llm_cache = _create_llm_cache(args.llm_cache, args.semantic_cache_threshold)
+    checkpointer = (
+        SqliteCheckpointSaver(args.checkpoint_db, max_checkpoints_per_thread=DEFAULT_MAX_CHECKPOINTS_PER_THREAD)
+        if args.checkpoint_db
+        else None
+    )
+    return create_school_matcher_graph(
+        vector_store,
+        analysis_store=analysis_store,
+        llm_cache=llm_cache,
+        section_context=args.section_context,
+        checkpointer=checkpointer,
+    )
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(prog="schoolmatch")
     parser.add_argument(
         "--school",
-        required=True,
         help="Free-text description of the target institution",
     )
+    parser.add_argument(
+        "--thread-id",
+        help="Session thread id; with --checkpoint-db and no --school, resumes that session",
+    )
+    _add_cache_arguments(parser)
+    _add_retrieval_arguments(parser)
+    _add_session_arguments(parser)
+
+    subparsers = parser.add_subparsers(dest="command")
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help="Run many targets from a JSONL file without interactive feedback",
+    )
+    batch_parser.add_argument(
+        "--input",
+        required=True,
+        help='JSONL file with one {"id": ..., "school": ...} object per line',
+    )
+    batch_parser.add_argument(
+        "--output",
+        required=True,
+        help="JSONL file results are appended to; rerunning resumes where it stopped",
+    )
+    batch_parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_BATCH_WORKERS,
+        help="Maximum number of targets processed at the same time",
+    )
+    _add_cache_arguments(batch_parser, subcommand=True)
+    _add_retrieval_arguments(batch_parser, subcommand=True)
+    _add_session_arguments(batch_parser, subcommand=True)
     args = parser.parse_args()
 
+    resuming = args.command is None and not args.school and args.thread_id
+    if resuming and not args.checkpoint_db:
+        parser.error("resuming with --thread-id needs --checkpoint-db")
+    if args.command is None and not args.school and not resuming:
+        parser.error("--school is required unless a subcommand is given or a session is resumed")
+
     with tracing_context(project_name="schoolmatch"):
-        vector_store = CollegeVectorStore()
-        graph = create_school_matcher_graph(vector_store)
-        run_school_matcher(graph, args.school, create_graph_config())
+        graph = _create_graph(args)
+
+        if args.command == "batch":
+            summary = run_batch(graph, args.input, args.output, max_workers=args.workers)
+            print(
+                f"Batch complete: {summary['succeeded']} succeeded, "
+                f"{summary['failed']} failed, {summary['skipped']} skipped"
+            )
+            return
+
+        config = create_graph_config(args.thread_id)
+        if args.checkpoint_db:
+            print(f"Session thread id: {config['configurable']['thread_id']}")
+        run_school_matcher(graph, args.school, config)
+        # The session reached the end and can no longer be resumed, so its checkpoints are dropped
+        graph.checkpointer.delete_thread(config["configurable"]["thread_id"])
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
-from typing import Callable
+import asyncio
+from typing import Optional
 
 from langchain_core.prompts import (
     ChatPromptTemplate,
@@ -7,6 +8,7 @@ from langchain_core.prompts import (
 )
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import AIMessage
+from langgraph.utils.runnable import RunnableCallable
 from db.college_vector_store import CollegeVectorStore
 from langchain_app.nodes.extract_target_features.prompt import HUMAN_MESSAGE, SYSTEM_MESSAGE
 
@@ -15,7 +17,7 @@ from models.state import State
 def create_feature_extractor(
     llm: ChatOpenAI, 
     vector_store: CollegeVectorStore
-) -> Callable[[State], State]:
+) -> RunnableCallable:
     """Creates a node that extracts M&A-relevant features from the target institution.
     
     Args:
@@ -23,7 +25,8 @@ def create_feature_extractor(
         vector_store: Vector store containing IPEDS data
         
     Returns:
-        Callable that takes an AnalysisState and returns updated state with extracted features
+        Node that takes a State and returns updated state with extracted features; it runs
+        synchronously under invoke and on the event loop under ainvoke
     """
     prompt = ChatPromptTemplate.from_messages([
         SystemMessagePromptTemplate.from_template(SYSTEM_MESSAGE),
@@ -32,34 +35,61 @@ def create_feature_extractor(
     
     chain = prompt | llm
     
+    def find_target(school: str) -> Optional[dict]:
+        """Resolve the target by name first; embed the description only when no
+        institution name matches it confidently."""
+        target = vector_store.resolve_institution(school)
+        if target is None:
+            results = vector_store.find_similar_colleges(school, n_results=1)
+            target = results[0] if results else None
+        return target
+    
+    def chain_input(state: State, target: Optional[dict]) -> dict:
+        return {
+            "school": state.school,
+            "ipeds_data": target["document"] if target else "No IPEDS data found",
+            "run_name": "Feature Extraction"
+        }
+    
+    def with_features(state: State, target: Optional[dict], response: AIMessage) -> State:
+        return State(
+            school=state.school,
+            target_unitid=target["metadata"].get("UNITID") if target else None,
+            college_filter=state.college_filter,
+            features=response.content,
+            ipeds_semantic_search=[],
+            recommendations="",
+            final_recommendation="",
+            messages=state.messages + [response]  # Preserve existing messages and add new one
+        )
+    
+    def failed(state: State, e: Exception) -> State:
+        print(f"Error in feature extraction: {str(e)}")
+        return State(
+            school=state.school,
+            college_filter=state.college_filter,
+            features="",
+            ipeds_semantic_search=[],
+            recommendations="",
+            final_recommendation=""
+        )
+    
     def feature_extractor(state: State) -> State:
         """Extract features from the school description and IPEDS data."""
         try:
-            # Query vector store for target school data
-            results = vector_store.find_similar_colleges(state.school, n_results=1)
-            ipeds_data = results[0]["document"] if results else "No IPEDS data found"
-
-            response: AIMessage = chain.invoke({
-                "school": state.school,
-                "ipeds_data": ipeds_data,
-                "run_name": "Feature Extraction"
-            })
-            return State(
-                school=state.school,
-                features=response.content,
-                ipeds_semantic_search=[],
-                recommendations="",
-                final_recommendation="",
-                messages=state.messages + [response]  # Preserve existing messages and add new one
-            )
+            target = find_target(state.school)
+            response: AIMessage = chain.invoke(chain_input(state, target))
+            return with_features(state, target, response)
+        except Exception as e:
+            return failed(state, e)
+    
+    async def afeature_extractor(state: State) -> State:
+        """Async feature_extractor; the vector store is synchronous and runs on a worker thread."""
+        try:
+            target = await asyncio.to_thread(find_target, state.school)
+            response: AIMessage = await chain.ainvoke(chain_input(state, target))
+            return with_features(state, target, response)
         except Exception as e:
-            print(f"Error in feature extraction: {str(e)}")
-            return State(
-                school=state.school,
-                features="",
-                ipeds_semantic_search=[],
-                recommendations="",
-                final_recommendation=""
-            )
+            return failed(state, e)
     
-    return feature_extractor
+    return RunnableCallable(feature_extractor, afeature_extractor, name="feature_extractor")
@@ -1,4 +1,4 @@
-from typing import Callable, Literal
+from typing import Literal, Optional
 import os
 
 from langchain_core.prompts import (
@@ -7,8 +7,11 @@ from langchain_core.prompts import (
     SystemMessagePromptTemplate,
 )
 from langchain_openai import ChatOpenAI
+from langchain_core.caches import BaseCache
+from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import AIMessage
 from langgraph.types import Command
+from langgraph.utils.runnable import RunnableCallable
 from langgraph.prebuilt import ToolNode
 from langchain_app.nodes.final_rec.prompt import HUMAN_MESSAGE, SYSTEM_MESSAGE
 from langchain_core.tools import tool
@@ -23,16 +26,19 @@ from langchain_app.utils.human_feedback import extract_feedback_history
 from models.state import State, NodeName
 
 
-def create_final_recommender() -> Callable[
-    [State], Command[Literal[NodeName.WEB_SEARCH_TOOL, NodeName.HUMAN_FEEDBACK]]
-]:
+def create_final_recommender(
+    cache: Optional[BaseCache] = None,
+    llm: Optional[BaseChatModel] = None,
+) -> RunnableCallable:
     """Creates a node that makes the final recommendation.
     
     Args:
-        llm: Language model for final recommendation
+        cache: Optional LLM response cache for the recommendation model
+        llm: Recommendation model; o4-mini with high reasoning effort when omitted
         
     Returns:
-        Callable that takes a State and returns updated state with final recommendation
+        Node that takes a State and returns a Command with the final recommendation; it
+        runs synchronously under invoke and on the event loop under ainvoke
     """
 
     prompt = ChatPromptTemplate.from_messages([
@@ -40,18 +46,18 @@ def create_final_recommender() -> Callable[
         HumanMessagePromptTemplate.from_template(HUMAN_MESSAGE),
     ])
     
-    llm = ChatOpenAI(
-        model="o4-mini",
-        reasoning_effort="high",
-        api_key=os.getenv("OPENAI_API_KEY")
-    )
+    if llm is None:
+        llm = ChatOpenAI(
+            model="o4-mini",
+            reasoning_effort="high",
+            api_key=os.getenv("OPENAI_API_KEY"),
+            cache=cache
+        )
     llm_with_tools = llm.bind_tools([web_search])
     runnnable = prompt | llm_with_tools
     
-    def final_recommender(
-        state: State
-    ) -> Command[Literal[NodeName.WEB_SEARCH_TOOL, NodeName.HUMAN_FEEDBACK]]:
-        """Generate final recommendation based on all analyses and feedback history."""
+    def chain_input(state: State) -> dict:
+        """Collect the analyses, feedback history and web search results for the prompt."""
         # Extract any web search results from previous messages
         web_search_results = []
         for msg in state.messages:
@@ -67,14 +73,18 @@ def create_final_recommender() -> Callable[
             else "No web search results available."
         )
         
-        # Invoke the chain with all available information
-        response: AIMessage = runnnable.invoke({
+        # All available information
+        return {
             "ipeds_semantic_search": state.ipeds_semantic_search,
             "human_feedback": extract_feedback_history(state.messages),
             "web_search_results": web_search_info,
             "run_name": "Final Recommendation"
-        })
-        
+        }
+    
+    def route(
+        state: State, response: AIMessage
+    ) -> Command[Literal[NodeName.WEB_SEARCH_TOOL, NodeName.HUMAN_FEEDBACK]]:
+        """Send tool calls to web search and a finished recommendation to human feedback."""
         # Debugging
         print(f"\n\n=============== FINAL RECOMMENDER RESPONSE ===============")
         print(f"Response type: {type(response)}")
@@ -96,4 +106,18 @@ def create_final_recommender() -> Callable[
         )
         return Command(update=updated_state, goto=NodeName.HUMAN_FEEDBACK)
     
-    return final_recommender
+    def final_recommender(
+        state: State
+    ) -> Command[Literal[NodeName.WEB_SEARCH_TOOL, NodeName.HUMAN_FEEDBACK]]:
+        """Generate final recommendation based on all analyses and feedback history."""
+        response: AIMessage = runnnable.invoke(chain_input(state))
+        return route(state, response)
+    
+    async def afinal_recommender(
+        state: State
+    ) -> Command[Literal[NodeName.WEB_SEARCH_TOOL, NodeName.HUMAN_FEEDBACK]]:
+        """Async final_recommender."""
+        response: AIMessage = await runnnable.ainvoke(chain_input(state))
+        return route(state, response)
+    
+    return RunnableCallable(final_recommender, afinal_recommender, name="final_recommender")
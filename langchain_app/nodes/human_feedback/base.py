@@ -1,6 +1,7 @@
 from typing import Literal, Callable
 
 from langgraph.types import Command, interrupt
+from langgraph.utils.runnable import RunnableCallable
 from pydantic import BaseModel
 
 from models.state import State, NodeName
@@ -11,14 +12,13 @@ from langchain_app.utils.human_feedback import (
 )
 
 
-def create_human_feedback_node(
-) -> Callable[[State], Command[Literal[NodeName.FINAL_RECOMMENDER, NodeName.END]]]:
+def create_human_feedback_node() -> RunnableCallable:
     """
     Creates a node that prompts the user for feedback on the final recommendation.
 
     Returns:
-        A function that takes a State and returns a Command 
-        with a Literal indicating the next node name.
+        A node that takes a State and returns a Command with a Literal indicating the
+        next node name, under both invoke and ainvoke.
     """
 
     human_feedback_func = create_get_human_feedback(
@@ -41,7 +41,16 @@ def create_human_feedback_node(
         """
         return human_feedback_func(state)
 
-    return human_feedback_wrapper
+    async def ahuman_feedback_wrapper(
+        state: State
+    ) -> Command[Literal[NodeName.FINAL_RECOMMENDER, NodeName.END]]:
+        """
+        Async wrapper for human feedback node. It makes no I/O calls, so it runs the
+        same code on the event loop instead of a worker thread.
+        """
+        return human_feedback_func(state)
+
+    return RunnableCallable(human_feedback_wrapper, ahuman_feedback_wrapper, name="human_feedback_wrapper")
 
 
 def create_get_human_feedback(
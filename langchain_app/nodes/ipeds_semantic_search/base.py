@@ -1,4 +1,7 @@
-from typing import Callable
+import asyncio
+from enum import Enum
+from time import perf_counter
+from typing import Callable, Optional
 
 from langchain_core.prompts import (
     ChatPromptTemplate,
@@ -7,13 +10,48 @@ from langchain_core.prompts import (
 )
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import AIMessage
-from langchain_app.nodes.ipeds_semantic_search.prompt import HUMAN_MESSAGE, SYSTEM_MESSAGE
+from langgraph.config import get_stream_writer
+from langgraph.utils.runnable import RunnableCallable
+from langchain_app.nodes.ipeds_semantic_search.prompt import (
+    HUMAN_MESSAGE,
+    SYSTEM_MESSAGE,
+    BATCH_HUMAN_MESSAGE,
+    BATCH_SYSTEM_MESSAGE,
+    BATCH_CANDIDATE_BLOCK,
+)
 
-from models.state import State
-from models.analysis_state import VectorDataBaseResults
-from db.college_vector_store import CollegeVectorStore
+from models.state import State, NodeName
+from models.analysis_state import VectorDataBaseResults, CandidateAnalysisBatch
+from models.college_filter import CollegeFilter
+from db.college_vector_store import CollegeVectorStore, DEFAULT_MAX_SECTIONS
+from db.analysis_store import AnalysisStore, AnalysisKey, hash_text
 from models.constants import SECTOR_MAP, PROGRAM_LEVELS
 
+# Number of partner institutions analyzed per run
+MAX_PARTNERS = 10
+
+# Default cap on concurrent LLM analysis requests
+DEFAULT_MAX_CONCURRENCY = 5
+
+# Prompt token budget for one batched analysis request; larger candidate sets are chunked
+DEFAULT_BATCH_TOKEN_BUDGET = 24_000
+
+
+class AnalysisMode(str, Enum):
+    """How partner compatibility analyses are requested from the LLM."""
+    PER_CANDIDATE = "per_candidate"
+    BATCHED = "batched"
+
+
+# Version of the prompts each mode analyzes with, so stored analyses are only reused by the
+# mode and prompts that produced them; entries of other versions age out of the store's LRU
+PROMPT_VERSIONS = {
+    AnalysisMode.PER_CANDIDATE: f"{AnalysisMode.PER_CANDIDATE.value}:"
+    + hash_text(SYSTEM_MESSAGE, HUMAN_MESSAGE),
+    AnalysisMode.BATCHED: f"{AnalysisMode.BATCHED.value}:"
+    + hash_text(BATCH_SYSTEM_MESSAGE, BATCH_HUMAN_MESSAGE, BATCH_CANDIDATE_BLOCK),
+}
+
 
 def _format_partner_info(metadata: dict[str, any], document: str) -> str:
     """Format partner institution information into a readable string.
@@ -42,15 +80,159 @@ Additional Information:
 """
 
 
-def create_ipeds_semantic_search(vector_store: CollegeVectorStore, llm: ChatOpenAI) -> Callable[[State], State]:
+def _select_candidates(matches: list[dict[str, any]], school: str) -> list[dict[str, any]]:
+    """Drop matches named like the target school and cap the partner list.
+    
+    Args:
+        matches: Vector store matches ordered by distance
+        school: Description of the target institution
+        
+    Returns:
+        Matches to analyze, in their original order
+    """
+    candidates = []
+    target_school = school.lower().strip()
+    
+    for match in matches:
+        school_name = match['metadata'].get('INSTNM', '').lower().strip()
+        
+        # Skip if this is the target school
+        if target_school in school_name or school_name in target_school:
+            continue
+        
+        candidates.append(match)
+        
+        # Only keep top 10 matches
+        if len(candidates) == MAX_PARTNERS:
+            break
+    
+    return candidates
+
+
+def _chunk_candidates(
+    llm: ChatOpenAI,
+    features: str,
+    candidate_blocks: list[str],
+    token_budget: int,
+) -> list[list[int]]:
+    """Group candidate blocks into batched requests that fit the prompt token budget.
+    
+    Args:
+        llm: Language model used to count tokens
+        features: Extracted target features, sent once per request
+        candidate_blocks: Formatted candidate blocks
+        token_budget: Maximum prompt tokens for one request
+        
+    Returns:
+        Lists of candidate positions, one list per request
+    """
+    overhead = llm.get_num_tokens(BATCH_SYSTEM_MESSAGE + BATCH_HUMAN_MESSAGE + features)
+    
+    chunks = []
+    current = []
+    current_tokens = overhead
+    for position, block in enumerate(candidate_blocks):
+        block_tokens = llm.get_num_tokens(block)
+        
+        # A block that is too large on its own still gets a request of its own
+        if current and current_tokens + block_tokens > token_budget:
+            chunks.append(current)
+            current = []
+            current_tokens = overhead
+        
+        current.append(position)
+        current_tokens += block_tokens
+    
+    if current:
+        chunks.append(current)
+    
+    return chunks
+
+
+def _analysis_key(
+    state: State,
+    match: dict[str, any],
+    partner_info: str,
+    model_name: str,
+    prompt_version: str,
+) -> Optional[AnalysisKey]:
+    """Build the analysis store key for one candidate, or None if either UNITID is unknown."""
+    candidate_unitid = match['metadata'].get('UNITID')
+    if state.target_unitid is None or candidate_unitid is None:
+        return None
+    
+    return AnalysisKey(
+        target_unitid=int(state.target_unitid),
+        candidate_unitid=int(candidate_unitid),
+        features_hash=hash_text(state.features),
+        candidate_hash=hash_text(partner_info),
+        model=model_name,
+        prompt_version=prompt_version,
+    )
+
+
+def _report_usage(
+    mode: AnalysisMode,
+    num_candidates: int,
+    responses: list[AIMessage],
+    elapsed: float,
+) -> None:
+    """Print token totals and wall time for one run of partner analyses."""
+    input_tokens = 0
+    output_tokens = 0
+    for response in responses:
+        usage = getattr(response, "usage_metadata", None) or {}
+        input_tokens += usage.get("input_tokens", 0)
+        output_tokens += usage.get("output_tokens", 0)
+    
+    print(
+        f"IPEDS analysis [{mode.value}]: {num_candidates} candidates, "
+        f"{len(responses)} LLM responses, {input_tokens:,} input tokens, "
+        f"{output_tokens:,} output tokens, {elapsed:.2f}s"
+    )
+
+
+def _to_vector_database_result(match: dict[str, any], analysis: str) -> VectorDataBaseResults:
+    """Build the state entry for one analyzed partner institution."""
+    return VectorDataBaseResults(
+        school=match['metadata'].get('INSTNM', 'Unknown Institution'),
+        location=(
+            f"{match['metadata'].get('CITY', 'N/A')}, {match['metadata'].get('STABBR', 'N/A')}"
+        ),
+        analysis=analysis,
+        similarity_score=1.0 - match['distance']
+    )
+
+
+def create_ipeds_semantic_search(
+    vector_store: CollegeVectorStore,
+    llm: ChatOpenAI,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    analysis_mode: AnalysisMode = AnalysisMode.PER_CANDIDATE,
+    batch_token_budget: int = DEFAULT_BATCH_TOKEN_BUDGET,
+    analysis_store: Optional[AnalysisStore] = None,
+    section_context: bool = False,
+    max_sections: int = DEFAULT_MAX_SECTIONS,
+) -> RunnableCallable:
     """Creates a node that finds semantic similarity between institutions.
     
     Args:
         vector_store: Vector store containing college embeddings
         llm: Language model for semantic search analysis
+        max_concurrency: Maximum number of analysis requests in flight at once.
+            Use 1 to send requests one after another.
+        analysis_mode: PER_CANDIDATE sends one request per partner; BATCHED sends the target
+            features once with all partner blocks and parses a structured list of analyses
+        batch_token_budget: Prompt token budget for one batched request
+        analysis_store: Optional persistent store consulted before analyzing a partner
+        section_context: Rank partners by their best matching document section and give the
+            LLM only their overview and most relevant sections instead of the full document.
+            Needs section vectors; full documents are used when the build has none
+        max_sections: Sections included per partner besides the overview, with section_context
         
     Returns:
-        Callable that takes an AnalysisState and returns updated state with semantic search results
+        Node that takes a State and returns updated state with semantic search results; it
+        runs synchronously under invoke and on the event loop under ainvoke
     """
 
     prompt = ChatPromptTemplate.from_messages([
@@ -60,6 +242,267 @@ def create_ipeds_semantic_search(vector_store: CollegeVectorStore, llm: ChatOpen
     
     chain = prompt | llm
     
+    model_name = getattr(llm, "model_name", None) or type(llm).__name__
+    prompt_version = PROMPT_VERSIONS[analysis_mode]
+    
+    if section_context and vector_store.section_collection is None:
+        print("No section vectors in the vector store; partner analyses use full documents")
+    
+    batch_chain = None
+    if analysis_mode == AnalysisMode.BATCHED:
+        batch_prompt = ChatPromptTemplate.from_messages([
+            SystemMessagePromptTemplate.from_template(BATCH_SYSTEM_MESSAGE),
+            HumanMessagePromptTemplate.from_template(BATCH_HUMAN_MESSAGE),
+        ])
+        batch_chain = batch_prompt | llm.with_structured_output(
+            CandidateAnalysisBatch, include_raw=True
+        )
+    
+    def per_candidate_requests(features: str, partner_infos: list[str]) -> list[dict]:
+        """One analysis request per candidate."""
+        return [
+            {
+                "features": features,
+                "partner_description": partner_info,
+                "run_name": "IPEDS Semantic Search Analysis",
+            }
+            for partner_info in partner_infos
+        ]
+    
+    def collect_per_candidate(
+        candidates: list[dict[str, any]],
+        responses: list,
+    ) -> tuple[list[Optional[str]], list[AIMessage]]:
+        """Read the analysis of each candidate from its response, in input order."""
+        analyses = []
+        succeeded = []
+        for match, response in zip(candidates, responses):
+            if isinstance(response, Exception):
+                print(
+                    f"Error analyzing {match['metadata'].get('INSTNM', 'Unknown Institution')}: "
+                    f"{str(response)}"
+                )
+                analyses.append(None)
+                continue
+            
+            analyses.append(response.content)
+            succeeded.append(response)
+        
+        return analyses, succeeded
+    
+    def batched_requests(features: str, partner_infos: list[str]) -> tuple[list[list[int]], list[dict]]:
+        """Group all candidates into structured-output requests that fit the token budget."""
+        candidate_blocks = [
+            BATCH_CANDIDATE_BLOCK.format(candidate_id=position + 1, partner_description=partner_info)
+            for position, partner_info in enumerate(partner_infos)
+        ]
+        chunks = _chunk_candidates(llm, features, candidate_blocks, batch_token_budget)
+        return chunks, [
+            {
+                "features": features,
+                "candidates": "\n".join(candidate_blocks[position] for position in chunk),
+                "run_name": "IPEDS Batched Semantic Search Analysis",
+            }
+            for chunk in chunks
+        ]
+    
+    def collect_batched(
+        candidates: list[dict[str, any]],
+        chunks: list[list[int]],
+        outputs: list,
+    ) -> tuple[list[Optional[str]], list[AIMessage]]:
+        """Read the analyses of each chunk's candidates from its structured output."""
+        analyses = [None] * len(candidates)
+        succeeded = []
+        for chunk, output in zip(chunks, outputs):
+            if isinstance(output, Exception) or output["parsed"] is None:
+                error = output if isinstance(output, Exception) else output["parsing_error"]
+                print(f"Error in batched analysis of candidates {[p + 1 for p in chunk]}: {str(error)}")
+                continue
+            
+            succeeded.append(output["raw"])
+            for item in output["parsed"].analyses:
+                position = item.candidate_id - 1
+                if position in chunk:
+                    analyses[position] = item.analysis
+        
+        for match, analysis in zip(candidates, analyses):
+            if analysis is None:
+                print(
+                    f"No batched analysis returned for "
+                    f"{match['metadata'].get('INSTNM', 'Unknown Institution')}"
+                )
+        
+        return analyses, succeeded
+    
+    def run_requests(runnable, requests: list[dict], on_done: Callable[[int], None]) -> list:
+        """Run requests on a bounded thread pool, reporting each as it finishes.
+        
+        A failed request is returned as its exception instead of raising, and results are
+        put back in input order.
+        """
+        results = [None] * len(requests)
+        for index, result in runnable.batch_as_completed(
+            requests, config={"max_concurrency": max_concurrency}, return_exceptions=True
+        ):
+            results[index] = result
+            on_done(index)
+        return results
+    
+    async def arun_requests(runnable, requests: list[dict], on_done: Callable[[int], None]) -> list:
+        """Async run_requests; requests are tasks on the event loop, at most max_concurrency at once."""
+        results = [None] * len(requests)
+        async for index, result in runnable.abatch_as_completed(
+            requests, config={"max_concurrency": max_concurrency}, return_exceptions=True
+        ):
+            results[index] = result
+            on_done(index)
+        return results
+    
+    def find_candidates(state: State) -> Optional[dict[str, any]]:
+        """Query the vector store and look up stored analyses; None if nothing matched."""
+        # Apply the caller's filter and leave the target out inside the vector query,
+        # so excluded institutions never take a candidate slot
+        college_filter = state.college_filter or CollegeFilter()
+        if state.target_unitid is not None:
+            college_filter = college_filter.excluding(state.target_unitid)
+        
+        if section_context and vector_store.section_collection is not None:
+            # Each match's document holds only the sections relevant to the features
+            matches = vector_store.find_similar_colleges_by_section(
+                state.features, n_results=MAX_PARTNERS, where=college_filter, max_sections=max_sections
+            )
+        else:
+            matches = vector_store.find_similar_colleges(
+                state.features, n_results=MAX_PARTNERS, where=college_filter
+            )
+        if not matches:
+            print("No matches found in vector store")
+            return None
+        
+        candidates = _select_candidates(matches, state.school)
+        partner_infos = [
+            _format_partner_info(match['metadata'], match['document']) for match in candidates
+        ]
+        
+        analyses: list[Optional[str]] = [None] * len(candidates)
+        keys = [
+            _analysis_key(state, match, partner_info, model_name, prompt_version)
+            for match, partner_info in zip(candidates, partner_infos)
+        ]
+        if analysis_store is not None:
+            analyses = [
+                analysis_store.get(key) if key is not None else None for key in keys
+            ]
+        pending = [position for position, analysis in enumerate(analyses) if analysis is None]
+        if analysis_store is not None:
+            print(
+                f"Analysis store: {len(candidates) - len(pending)} of {len(candidates)} "
+                f"partner analyses reused"
+            )
+        
+        return {
+            "candidates": candidates,
+            "partner_infos": partner_infos,
+            "analyses": analyses,
+            "keys": keys,
+            "pending": pending,
+        }
+    
+    def progress_reporter(found: dict[str, any]) -> Callable[[int], None]:
+        """Report analyzed candidates to callers streaming the graph in "custom" mode."""
+        try:
+            write_progress = get_stream_writer()
+        except KeyError:
+            # Not streaming; this LangGraph version only sets a writer for stream calls
+            write_progress = lambda chunk: None
+        progress = {"analyzed": len(found["candidates"]) - len(found["pending"])}
+        
+        def on_analyzed(count: int) -> None:
+            progress["analyzed"] += count
+            write_progress({
+                "node": NodeName.IPEDS_SEARCH.value,
+                "analyzed": progress["analyzed"],
+                "total": len(found["candidates"]),
+            })
+        
+        on_analyzed(0)
+        return on_analyzed
+    
+    def pending_requests(
+        state: State, found: dict[str, any]
+    ) -> tuple[Optional[list[list[int]]], list[dict], Callable[[int], int]]:
+        """Requests for the candidates without a stored analysis, and how many each covers.
+
+        The candidate chunks of batched requests come first; they are None when nothing is
+        pending or each request covers one candidate.
+        """
+        if not found["pending"]:
+            return None, [], lambda index: 0
+        pending_infos = [found["partner_infos"][position] for position in found["pending"]]
+        if analysis_mode == AnalysisMode.BATCHED:
+            chunks, requests = batched_requests(state.features, pending_infos)
+            return chunks, requests, lambda index: len(chunks[index])
+        return None, per_candidate_requests(state.features, pending_infos), lambda index: 1
+    
+    def with_analyses(
+        state: State,
+        found: dict[str, any],
+        chunks: Optional[list[list[int]]],
+        results: list,
+        elapsed: float,
+    ) -> State:
+        """Store the new analyses and build the updated state."""
+        candidates, analyses, keys = found["candidates"], found["analyses"], found["keys"]
+        pending = found["pending"]
+        
+        new_messages = []
+        if pending:
+            pending_candidates = [candidates[position] for position in pending]
+            if analysis_mode == AnalysisMode.BATCHED:
+                new_analyses, responses = collect_batched(pending_candidates, chunks, results)
+                # The raw structured-output message is not a readable analysis, so it is
+                # kept out of the conversation history
+            else:
+                new_analyses, responses = collect_per_candidate(pending_candidates, results)
+                new_messages = responses[-1:]
+            _report_usage(analysis_mode, len(pending), responses, elapsed)
+            
+            for position, analysis in zip(pending, new_analyses):
+                analyses[position] = analysis
+                if analysis is not None and analysis_store is not None and keys[position]:
+                    analysis_store.put(keys[position], analysis)
+        
+        ipeds_semantic_search = [
+            _to_vector_database_result(match, analysis)
+            for match, analysis in zip(candidates, analyses)
+            if analysis is not None
+        ]
+        
+        return State(
+            school=state.school,
+            target_unitid=state.target_unitid,
+            college_filter=state.college_filter,
+            features=state.features,
+            ipeds_semantic_search=ipeds_semantic_search,
+            recommendations=state.recommendations,
+            final_recommendation=state.final_recommendation,
+            messages=state.messages + new_messages
+        )
+    
+    def failed(state: State, e: Exception) -> State:
+        print(f"Error in IPEDS semantic search analyzer: {str(e)}")
+        return State(
+            school=state.school,
+            target_unitid=state.target_unitid,
+            college_filter=state.college_filter,
+            features=state.features,
+            ipeds_semantic_search=[],
+            recommendations="",
+            final_recommendation="",
+            messages=state.messages  # Preserve existing messages
+        )
+    
     def ipeds_semantic_search(state: State) -> State:
         """Returns semantically similar institutions to the target school."""
         try:
@@ -67,60 +510,47 @@ def create_ipeds_semantic_search(vector_store: CollegeVectorStore, llm: ChatOpen
                 print("Error: No features found in state")
                 return state
             
-            # Get more matches than needed since we'll filter some out
-            matches = vector_store.find_similar_colleges(state.features, n_results=10)
-            if not matches:
-                print("No matches found in vector store")
+            found = find_candidates(state)
+            if found is None:
                 return state
+            on_analyzed = progress_reporter(found)
             
-            ipeds_semantic_search = []
-            target_school = state.school.lower().strip()
+            chunks, requests, covered = pending_requests(state, found)
+            start = perf_counter()
+            results = run_requests(
+                batch_chain if chunks is not None else chain,
+                requests,
+                lambda index: on_analyzed(covered(index)),
+            )
+            return with_analyses(state, found, chunks, results, perf_counter() - start)
             
-            for match in matches:
-                school_name = match['metadata'].get('INSTNM', '').lower().strip()
-                
-                # Skip if this is the target school
-                if target_school in school_name or school_name in target_school:
-                    continue
-                
-                partner_info = _format_partner_info(match['metadata'], match['document'])
-                response: AIMessage = chain.invoke({
-                    "features": state.features,
-                    "partner_description": partner_info,
-                    "run_name": "IPEDS Semantic Search Analysis",
-                })
-                
-                ipeds_semantic_search.append(VectorDataBaseResults(
-                    school=match['metadata'].get('INSTNM', 'Unknown Institution'),
-                    location=(
-                        f"{match['metadata'].get('CITY', 'N/A')}, {match['metadata'].get('STABBR', 'N/A')}"
-                    ),
-                    analysis=response.content,
-                    similarity_score=1.0 - match['distance']
-                ))
-                
-                # Only keep top 10 matches
-                if len(ipeds_semantic_search) == 10:
-                    break
+        except Exception as e:
+            return failed(state, e)
+    
+    async def aipeds_semantic_search(state: State) -> State:
+        """Async ipeds_semantic_search; vector store and analysis store calls run on a worker thread."""
+        try:
+            if not state.features:
+                print("Error: No features found in state")
+                return state
+            
+            found = await asyncio.to_thread(find_candidates, state)
+            if found is None:
+                return state
+            on_analyzed = progress_reporter(found)
             
-            return State(
-                school=state.school,
-                features=state.features,
-                ipeds_semantic_search=ipeds_semantic_search,
-                recommendations=state.recommendations,
-                final_recommendation=state.final_recommendation,
-                messages=state.messages + [response] 
+            chunks, requests, covered = pending_requests(state, found)
+            start = perf_counter()
+            results = await arun_requests(
+                batch_chain if chunks is not None else chain,
+                requests,
+                lambda index: on_analyzed(covered(index)),
+            )
+            return await asyncio.to_thread(
+                with_analyses, state, found, chunks, results, perf_counter() - start
             )
             
         except Exception as e:
-            print(f"Error in IPEDS semantic search analyzer: {str(e)}")
-            return State(
-                school=state.school,
-                features=state.features,
-                ipeds_semantic_search=[],
-                recommendations="",
-                final_recommendation="",
-                messages=state.messages  # Preserve existing messages
-            )
+            return failed(state, e)
     
-    return ipeds_semantic_search
+    return RunnableCallable(ipeds_semantic_search, aipeds_semantic_search, name="ipeds_semantic_search")
@@ -7,4 +7,15 @@ SYSTEM_MESSAGE = """Compile information on the target institution and potential
     Potential Partner: 
     {partner_description}
     """
-HUMAN_MESSAGE = """Target Features: {features}\n Potential Partner: \n{partner_description}"""
\ No newline at end of file
+HUMAN_MESSAGE = """Target Features: {features}\n Potential Partner: \n{partner_description}"""
+
+BATCH_SYSTEM_MESSAGE = """Compile information on the target institution and several potential partners.
+    The goal here is to compile data on the target institution and each potential partner to 
+    inform complex analysis later. 
+
+    Each potential partner is given as a numbered candidate block. Write one analysis per
+    candidate block, set candidate_id to the number of the block it refers to, and only use the
+    information in that block together with the target features.
+    """
+BATCH_HUMAN_MESSAGE = """Target Features: {features}\n Potential Partners: \n{candidates}"""
+BATCH_CANDIDATE_BLOCK = """Candidate {candidate_id}:\n{partner_description}"""
\ No newline at end of file
@@ -40,6 +40,8 @@ def create_recommendation_formatter(llm: ChatOpenAI) -> Callable[[State], State]
             })
             return State(
                 school=state.school,
+                target_unitid=state.target_unitid,
+                college_filter=state.college_filter,
                 features=state.features,
                 ipeds_semantic_search=state.ipeds_semantic_search,
                 recommendations=response.content,
@@ -50,6 +52,8 @@ def create_recommendation_formatter(llm: ChatOpenAI) -> Callable[[State], State]
             print(f"Error in recommendation formatter: {str(e)}")
             return State(
                 school=state.school,
+                target_unitid=state.target_unitid,
+                college_filter=state.college_filter,
                 features=state.features,
                 ipeds_semantic_search=state.ipeds_semantic_search,
                 recommendations="",
@@ -2,10 +2,9 @@ from __future__ import annotations
 
 import logging
 from pathlib import Path
-from typing import Callable
 
 from langchain_core.messages import AIMessage
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.utils.runnable import RunnableCallable
 
 from models.state import State
 
@@ -23,7 +22,7 @@ except ImportError as e:
 SKILLS_DIR = Path(__file__).resolve().parents[3] / "skills"
 
 
-def create_web_search_tool_node() -> Callable[[State], State]:
+def create_web_search_tool_node() -> RunnableCallable:
     skill_path = SKILLS_DIR / "web-research" / "SKILL.md"
     skill_content = skill_path.read_text()
 
@@ -31,15 +30,14 @@ def create_web_search_tool_node() -> Callable[[State], State]:
         "/skills/web-research/SKILL.md": skill_content,
     }
 
-    checkpointer = MemorySaver()
-
+    # Each search is a fresh agent run that is never resumed, so it keeps no checkpoints;
+    # a shared thread would grow without bound and feed one session's searches to the next
     agent = create_deep_agent(
         tools=[tavily_web_search],
         skills=["./skills/"],
-        checkpointer=checkpointer,
     )
 
-    def web_search_with_state_update(state: State) -> State:
+    def agent_input(state: State) -> dict:
         query = None
 
         for message in reversed(state.messages):
@@ -54,15 +52,23 @@ def create_web_search_tool_node() -> Callable[[State], State]:
             query = f"general information about {state.school}" if state.school else "general information about the school"
             logger.warning("No web_search tool call found in messages; falling back to query: %s", query)
 
-        result = agent.invoke(
-            {
-                "messages": [{"role": "user", "content": query}],
-                "files": skills_files,
-            },
-            config={"configurable": {"thread_id": "web-search"}},
-        )
-        content = result["messages"][-1].content
+        return {
+            "messages": [{"role": "user", "content": query}],
+            "files": skills_files,
+        }
 
+    def search_results(result: dict) -> dict:
+        content = result["messages"][-1].content
         return {"messages": [AIMessage(content=f"Web Search Results:\n\n{content}")]}
 
-    return web_search_with_state_update
+    def web_search_with_state_update(state: State) -> State:
+        result = agent.invoke(agent_input(state))
+        return search_results(result)
+
+    async def aweb_search_with_state_update(state: State) -> State:
+        result = await agent.ainvoke(agent_input(state))
+        return search_results(result)
+
+    return RunnableCallable(
+        web_search_with_state_update, aweb_search_with_state_update, name="web_search_with_state_update"
+    )
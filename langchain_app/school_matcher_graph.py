@@ -1,47 +1,106 @@
+import asyncio
 import os
 from copy import deepcopy
-from time import sleep
+from time import perf_counter, sleep
+from typing import Any, Optional
 
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
+from langchain_core.caches import BaseCache
+from langchain_core.language_models import BaseChatModel
 from langgraph.graph import StateGraph
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.types import Command
 from langchain_core.messages import BaseMessage
 
 from langchain_app.nodes.extract_target_features.base import create_feature_extractor
-from langchain_app.nodes.ipeds_semantic_search.base import create_ipeds_semantic_search
+from langchain_app.nodes.ipeds_semantic_search.base import (
+    create_ipeds_semantic_search,
+    AnalysisMode,
+    DEFAULT_MAX_CONCURRENCY,
+)
 from langchain_app.nodes.final_rec.base import create_final_recommender
 from langchain_app.nodes.web_search.base import create_web_search_tool_node
 from langchain_app.nodes.human_feedback.base import create_human_feedback_node, EMPTY_INPUT_MSG
+from langchain_app.sessions import BoundedMemorySaver, new_thread_id
 from db.college_vector_store import CollegeVectorStore
+from db.analysis_store import AnalysisStore
+from db.llm_cache import SemanticLLMCache
 from models.state import State, NodeName
 
 
-def create_school_matcher_graph(vector_store: CollegeVectorStore):
-    """Creates the school matcher graph."""
+def create_school_matcher_graph(
+    vector_store: CollegeVectorStore,
+    analysis_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    analysis_mode: AnalysisMode = AnalysisMode.PER_CANDIDATE,
+    analysis_store: Optional[AnalysisStore] = None,
+    llm_cache: Optional[BaseCache] = None,
+    section_context: bool = False,
+    llm: Optional[BaseChatModel] = None,
+    recommender_llm: Optional[BaseChatModel] = None,
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+):
+    """Creates the school matcher graph.
+    
+    Every node also has an async implementation, so the compiled graph can be run with
+    ``invoke``/``stream`` or with ``ainvoke``/``astream`` on an event loop.
+    
+    Args:
+        vector_store: Vector store containing IPEDS data
+        analysis_concurrency: Maximum number of partner analysis requests run in parallel
+        analysis_mode: Whether partners are analyzed one request each or in batched requests
+        analysis_store: Optional persistent store of partner analyses reused across runs
+        llm_cache: Optional response cache shared by every LLM in the graph; a
+            SemanticLLMCache serves similar prompts to feature extraction only
+        section_context: Give partner analyses only the document sections relevant to the
+            target's features; needs a build ingested with --sections
+        llm: Model for feature extraction and partner analyses; gpt-4.1-mini when omitted
+        recommender_llm: Model for the final recommendation; o4-mini when omitted
+        checkpointer: Where thread state is saved; a BoundedMemorySaver keeping the last
+            DEFAULT_MAX_CHECKPOINTS_PER_THREAD checkpoints of each thread when omitted
+    """
     
     # Load environment variables
     load_dotenv()
     
+    # Partner analyses and recommendations differ from earlier prompts in details, such as
+    # a candidate's name or a round of feedback, that a similar cached answer would ignore
+    exact_cache = llm_cache.exact_only() if isinstance(llm_cache, SemanticLLMCache) else llm_cache
+
     # Initialize the LLMs
-    llm = ChatOpenAI(
-        model="gpt-4.1-mini-2025-04-14",
-        temperature=0,
-        api_key=os.getenv("OPENAI_API_KEY")
-    )
+    feature_llm = llm
+    if llm is None:
+        feature_llm, llm = (
+            ChatOpenAI(
+                model="gpt-4.1-mini-2025-04-14",
+                temperature=0,
+                api_key=os.getenv("OPENAI_API_KEY"),
+                cache=cache
+            )
+            for cache in (llm_cache, exact_cache)
+        )
     
     # Create the graph
     graph_builder = StateGraph(State)
     
     # Add nodes
-    graph_builder.add_node(NodeName.FEATURE_EXTRACTOR, create_feature_extractor(llm, vector_store))
-    graph_builder.add_node(NodeName.IPEDS_SEARCH, create_ipeds_semantic_search(vector_store, llm))
+    graph_builder.add_node(NodeName.FEATURE_EXTRACTOR, create_feature_extractor(feature_llm, vector_store))
+    graph_builder.add_node(
+        NodeName.IPEDS_SEARCH,
+        create_ipeds_semantic_search(
+            vector_store,
+            llm,
+            max_concurrency=analysis_concurrency,
+            analysis_mode=analysis_mode,
+            analysis_store=analysis_store,
+            section_context=section_context,
+        )
+    )
     graph_builder.add_node(NodeName.WEB_SEARCH_TOOL, create_web_search_tool_node())
     
     # Add nodes with edges
-    graph_builder.add_node(NodeName.FINAL_RECOMMENDER, create_final_recommender())
+    graph_builder.add_node(NodeName.FINAL_RECOMMENDER, create_final_recommender(cache=exact_cache, llm=recommender_llm))
     graph_builder.add_node(NodeName.HUMAN_FEEDBACK, create_human_feedback_node())
     
     # Add edges
@@ -53,18 +112,165 @@ def create_school_matcher_graph(vector_store: CollegeVectorStore):
     graph_builder.set_entry_point(NodeName.FEATURE_EXTRACTOR)
     
     # Compile the graph
-    return graph_builder.compile(checkpointer=MemorySaver())
+    return graph_builder.compile(checkpointer=checkpointer or BoundedMemorySaver())
+
+
+# Progress line printed when each node before the recommender finishes
+NODE_PROGRESS = {
+    NodeName.FEATURE_EXTRACTOR: "Extracted target features",
+    NodeName.IPEDS_SEARCH: "Finished partner analyses",
+    NodeName.WEB_SEARCH_TOOL: "Finished web search",
+}
+
+
+# Stream modes read by the runners
+STREAM_MODES = ["updates", "messages", "custom"]
+
+
+class StreamEvents:
+    """Turns graph stream chunks into progress and recommendation token events.
+    
+    Events are dicts with a "type":
+    
+    * ``progress``: a node finished or partner analyses advanced; ``message`` describes it,
+      and analysis progress also has ``analyzed`` and ``total``
+    * ``recommendation_start``, then ``token`` events with ``text``, then
+      ``recommendation_end``, for each recommendation the final recommender writes
+    
+    The time from creation to the first token is kept as ``time_to_first_token``.
+    """
+    
+    def __init__(self):
+        self.start = perf_counter()
+        self.time_to_first_token = None
+        # Whether the current recommendation has started
+        self.recommending = False
+    
+    def _tokens(self, text: str) -> list[dict]:
+        events = []
+        if not self.recommending:
+            self.recommending = True
+            if self.time_to_first_token is None:
+                self.time_to_first_token = perf_counter() - self.start
+            events.append({"type": "recommendation_start"})
+        events.append({"type": "token", "text": text})
+        return events
+    
+    def events(self, mode: str, chunk: Any) -> list[dict]:
+        """Get the events of one chunk streamed with ``STREAM_MODES``."""
+        if mode == "messages":
+            # Token chunks of every LLM call in the graph; only the recommendation is shown
+            message, metadata = chunk
+            if metadata.get("langgraph_node") != NodeName.FINAL_RECOMMENDER:
+                return []
+            if isinstance(message.content, str) and message.content:
+                return self._tokens(message.content)
+            return []
+        
+        if mode == "custom":
+            if chunk.get("node") == NodeName.IPEDS_SEARCH and chunk["total"]:
+                return [{
+                    "type": "progress",
+                    "message": f"Analyzed {chunk['analyzed']} of {chunk['total']} candidates",
+                    "analyzed": chunk["analyzed"],
+                    "total": chunk["total"],
+                }]
+            return []
+        
+        events = []
+        for node, update in chunk.items():
+            if node == NodeName.FINAL_RECOMMENDER:
+                # A response returned whole, such as an LLM cache hit, streams no tokens
+                text = update.get("final_recommendation") if isinstance(update, dict) else None
+                if text and not self.recommending:
+                    events.extend(self._tokens(text))
+                if self.recommending:
+                    events.append({"type": "recommendation_end"})
+                self.recommending = False
+            elif node in NODE_PROGRESS:
+                events.append({"type": "progress", "message": NODE_PROGRESS[node]})
+        return events
+    
+    def timings(self) -> dict:
+        """Seconds to the first recommendation token (None if there was none) and so far."""
+        return {"time_to_first_token": self.time_to_first_token, "duration": perf_counter() - self.start}
+
+
+def _print_event(event: dict) -> None:
+    if event["type"] == "progress":
+        print(event["message"], flush=True)
+    elif event["type"] == "recommendation_start":
+        print("\n*** Recommendation ***\n")
+    elif event["type"] == "token":
+        print(event["text"], end="", flush=True)
+    elif event["type"] == "recommendation_end":
+        print()
+
+
+def stream_school_matcher(graph: CompiledStateGraph, graph_input: Any, config: dict) -> dict:
+    """Runs the graph until it finishes or waits for feedback, printing as it goes.
+    
+    Recommendation tokens are printed as the model produces them. Before that, a progress
+    line is printed as each node finishes and as partner analyses complete.
+    
+    Args:
+        graph: Compiled school matcher graph
+        graph_input: Initial state, or a Command resuming the graph
+        config: Graph config with the thread id
+        
+    Returns:
+        Seconds from the start of the stream to the first recommendation token (None if no
+        recommendation text was generated) and to the end of the stream
+    """
+    stream_events = StreamEvents()
+    for mode, chunk in graph.stream(graph_input, config=config, stream_mode=STREAM_MODES):
+        for event in stream_events.events(mode, chunk):
+            _print_event(event)
+    return stream_events.timings()
+
+
+async def astream_school_matcher(graph: CompiledStateGraph, graph_input: Any, config: dict) -> dict:
+    """Async stream_school_matcher; nodes run their async implementations on the event loop."""
+    stream_events = StreamEvents()
+    async for mode, chunk in graph.astream(graph_input, config=config, stream_mode=STREAM_MODES):
+        for event in stream_events.events(mode, chunk):
+            _print_event(event)
+    return stream_events.timings()
+
 
+def _report_stream_timings(timings: dict) -> None:
+    if timings["time_to_first_token"] is not None:
+        print(
+            f"\nTime to first recommendation token: {timings['time_to_first_token']:.2f}s "
+            f"(run took {timings['duration']:.2f}s)"
+        )
 
-def run_school_matcher(graph: CompiledStateGraph, school_description: str, config: dict) -> None:
-    """Runs the school matcher graph with a given school description"""
+
+def _print_saved_recommendation(values: dict) -> None:
+    if not values:
+        raise ValueError("No saved session with this thread id")
+    print(f"\nResuming session for {values.get('school', '')}\n")
+    print("*** Recommendation ***")
+    print(values.get("final_recommendation", ""))
+
+
+def run_school_matcher(graph: CompiledStateGraph, school_description: Optional[str], config: dict) -> None:
+    """Runs the school matcher graph with a given school description
+    
+    With no description, the session saved under the config's thread id is resumed at its
+    feedback prompt, e.g. after a restart with a persistent checkpointer.
+    """
     config = deepcopy(config)
     config["run_name"] = "School Matcher"
 
-    #Initial invocation with school description
-    graph.invoke({"messages": [], "school": school_description}, config=config)
+    if school_description is None:
+        _print_saved_recommendation(graph.get_state(config).values)
+    else:
+        #Initial invocation with school description; the recommendation is printed as it streams
+        _report_stream_timings(
+            stream_school_matcher(graph, {"messages": [], "school": school_description}, config)
+        )
 
-    feedback_provided = False
     while graph.get_state(config).next:
         current_state = graph.get_state(config).values
         messages: list[BaseMessage] = current_state["messages"]
@@ -73,15 +279,14 @@ def run_school_matcher(graph: CompiledStateGraph, school_description: str, confi
             print("No messages in state, continuing...")
             continue
             
-        # Print the last message content
+        # The last message's content was already printed while it streamed
         last_message = messages[-1]
-        print(last_message.content)
         
         # Check if the last message has tool calls
         if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
             print("\nPerforming web search to gather more information...\n")
             # Just send an empty command to continue with the tool processing
-            graph.invoke(Command(resume=""), config=config)
+            _report_stream_timings(stream_school_matcher(graph, Command(resume=""), config))
             continue
 
         sleep(0.5)
@@ -91,24 +296,68 @@ def run_school_matcher(graph: CompiledStateGraph, school_description: str, confi
         human_feedback_text = human_feedback_text or EMPTY_INPUT_MSG
         if human_feedback_text != EMPTY_INPUT_MSG:
             print(f"\nFeedback: {human_feedback_text}\n\n")
-            feedback_provided = True
         else:
             print("\nNo feedback provided\n")
-            feedback_provided = False
 
         config["run_name"] = "Human Feedback"
 
-        #invoke with human feedback
-        graph.invoke(Command(resume=human_feedback_text), config=config)
+        #resume with human feedback; a revised recommendation streams like the first
+        _report_stream_timings(
+            stream_school_matcher(graph, Command(resume=human_feedback_text), config)
+        )
+
+
+async def arun_school_matcher(graph: CompiledStateGraph, school_description: Optional[str], config: dict) -> None:
+    """Async run_school_matcher, so one event loop can drive many sessions at once.
     
-    if feedback_provided:
-        last_message: BaseMessage = graph.get_state(config).values["messages"][-1]
-        print(f"\n*** Final Recommendation ***\n{last_message.content}")
+    Sessions are kept apart by the thread id in their config. The feedback prompt is read
+    on a worker thread, so waiting for it does not block other sessions.
+    """
+    config = deepcopy(config)
+    config["run_name"] = "School Matcher"
+
+    if school_description is None:
+        _print_saved_recommendation((await graph.aget_state(config)).values)
+    else:
+        _report_stream_timings(
+            await astream_school_matcher(graph, {"messages": [], "school": school_description}, config)
+        )
+
+    while (await graph.aget_state(config)).next:
+        messages: list[BaseMessage] = (await graph.aget_state(config)).values["messages"]
+        
+        if not messages:
+            print("No messages in state, continuing...")
+            continue
+        
+        last_message = messages[-1]
+        if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
+            print("\nPerforming web search to gather more information...\n")
+            _report_stream_timings(await astream_school_matcher(graph, Command(resume=""), config))
+            continue
+
+        await asyncio.sleep(0.5)
+
+        human_feedback_text = await asyncio.to_thread(
+            input, "Feedback (press Enter to continue without feedback): "
+        )
+        human_feedback_text = human_feedback_text or EMPTY_INPUT_MSG
+        if human_feedback_text != EMPTY_INPUT_MSG:
+            print(f"\nFeedback: {human_feedback_text}\n\n")
+        else:
+            print("\nNo feedback provided\n")
+
+        config["run_name"] = "Human Feedback"
+
+        _report_stream_timings(
+            await astream_school_matcher(graph, Command(resume=human_feedback_text), config)
+        )
 
 
-def create_graph_config() -> dict:
+def create_graph_config(thread_id: Optional[str] = None) -> dict:
+    """Run config for a session; a new unique thread id is issued when none is given."""
     return {
-        "configurable": {"thread_id": "1"},
+        "configurable": {"thread_id": thread_id or new_thread_id()},
         "metadata": {"langsmith_project": "schoolmatch"},
         "callbacks": [],
     }
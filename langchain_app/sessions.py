@@ -0,0 +1,259 @@
+"""Session thread ids and bounded in-memory checkpoints for long-running processes.
+
+``MemorySaver`` keeps every checkpoint of every step of every thread for the life of the
+process. ``BoundedMemorySaver`` keeps only the newest checkpoints of each thread, and
+``SessionManager`` issues unique thread ids and deletes the checkpoints of sessions that
+have been idle too long or are the least recently used beyond a limit.
+"""
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, NamedTuple, Optional
+
+from langgraph.checkpoint.memory import MemorySaver
+
+from db.checkpoint_store import CheckpointMetrics, SqliteCheckpointSaver
+
+# A resumed run only needs the latest checkpoint; a few more keep recent state history
+DEFAULT_MAX_CHECKPOINTS_PER_THREAD = 10
+DEFAULT_MAX_SESSIONS = 1000
+DEFAULT_SESSION_TTL = 3600.0
+
+
+def new_thread_id() -> str:
+    """Returns a thread id no other session uses."""
+    return uuid.uuid4().hex
+
+
+class SessionMetrics(NamedTuple):
+    """Sessions tracked by a SessionManager and the memory their checkpoints use."""
+    sessions: int
+    created: int
+    evicted_lru: int
+    evicted_ttl: int
+    checkpoints: CheckpointMetrics
+
+
+class BoundedMemorySaver(MemorySaver):
+    """MemorySaver that keeps at most ``max_checkpoints_per_thread`` checkpoints per thread.
+
+    When a checkpoint is saved, the oldest ones of its thread beyond the limit are deleted
+    along with their pending writes and any channel values no remaining checkpoint uses.
+    The latest checkpoint, which interrupted runs resume from, is always kept.
+    """
+
+    def __init__(self, max_checkpoints_per_thread: int = DEFAULT_MAX_CHECKPOINTS_PER_THREAD, **kwargs):
+        if max_checkpoints_per_thread < 1:
+            raise ValueError("max_checkpoints_per_thread must be at least 1")
+        super().__init__(**kwargs)
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.pruned_checkpoints = 0
+        # (thread id, checkpoint ns, checkpoint id) -> channel versions the checkpoint reads
+        self._channel_versions: dict[tuple[str, str, str], dict[str, Any]] = {}
+        self._lock = threading.RLock()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        with self._lock:
+            saved = super().put(config, checkpoint, metadata, new_versions)
+            thread_id = config["configurable"]["thread_id"]
+            checkpoint_ns = config["configurable"]["checkpoint_ns"]
+            self._channel_versions[(thread_id, checkpoint_ns, checkpoint["id"])] = dict(
+                checkpoint["channel_versions"]
+            )
+            self._prune(thread_id, checkpoint_ns)
+            return saved
+
+    def put_writes(self, config, writes, task_id, task_path: str = "") -> None:
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+
+    def get_tuple(self, config):
+        with self._lock:
+            # Looking up an unknown thread would leave an empty entry in the storage defaultdict
+            if config["configurable"]["thread_id"] not in self.storage:
+                return None
+            return super().get_tuple(config)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            super().delete_thread(thread_id)
+            for key in [key for key in self._channel_versions if key[0] == thread_id]:
+                del self._channel_versions[key]
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        excess = len(checkpoints) - self.max_checkpoints_per_thread
+        if excess <= 0:
+            return
+
+        # Checkpoint ids sort by creation time
+        for checkpoint_id in sorted(checkpoints)[:excess]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            self._channel_versions.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+        self.pruned_checkpoints += excess
+
+        in_use = {
+            (channel, version)
+            for checkpoint_id in checkpoints
+            for channel, version in self._channel_versions.get((thread_id, checkpoint_ns, checkpoint_id), {}).items()
+        }
+        unused = [
+            key for key in self.blobs
+            if key[0] == thread_id and key[1] == checkpoint_ns and (key[2], key[3]) not in in_use
+        ]
+        for key in unused:
+            del self.blobs[key]
+
+    def metrics(self) -> CheckpointMetrics:
+        """Counts and serialized size of everything held, taken under the lock."""
+        with self._lock:
+            checkpoints = [
+                saved
+                for namespaces in self.storage.values()
+                for saved_by_id in namespaces.values()
+                for saved in saved_by_id.values()
+            ]
+            writes = [write for writes in self.writes.values() for write in writes.values()]
+            size = sum(len(checkpoint[1]) + len(metadata[1]) for checkpoint, metadata, _ in checkpoints)
+            size += sum(len(value[1]) for _, _, value, _ in writes)
+            size += sum(len(value[1]) for value in self.blobs.values())
+            return CheckpointMetrics(
+                threads=len(self.storage),
+                checkpoints=len(checkpoints),
+                writes=len(writes),
+                blobs=len(self.blobs),
+                bytes=size,
+                pruned_checkpoints=self.pruned_checkpoints,
+            )
+
+
+class SessionManager:
+    """Issues thread ids and evicts idle sessions' checkpoints.
+
+    Sessions are evicted when they have not been used for ``ttl`` seconds (by
+    ``evict_expired``), or as least recently used when a new session would exceed
+    ``max_sessions``. ``touch`` marks a session as used; long runs should touch it as they
+    make progress so they are not evicted as idle.
+
+    Args:
+        checkpointer: Checkpointer of the graph the sessions run on
+        max_sessions: Most sessions kept at once
+        ttl: Seconds a session may be idle before it is evicted
+        on_evict: Called with the thread id of each evicted session
+    """
+
+    def __init__(
+        self,
+        checkpointer: BoundedMemorySaver | SqliteCheckpointSaver,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        ttl: float = DEFAULT_SESSION_TTL,
+        on_evict: Optional[Callable[[str], None]] = None,
+    ):
+        self.checkpointer = checkpointer
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.created = 0
+        self.evicted_lru = 0
+        self.evicted_ttl = 0
+        # thread id -> last used, least recently used first
+        self._last_used: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, thread_id: str) -> bool:
+        return thread_id in self._last_used
+
+    def __len__(self) -> int:
+        return len(self._last_used)
+
+    def create(self, thread_id: Optional[str] = None) -> str:
+        """Starts a session, evicting the least recently used ones beyond ``max_sessions``.
+
+        Args:
+            thread_id: Thread id to use instead of a new one
+
+        Returns:
+            str: The session's thread id
+        """
+        thread_id = thread_id or new_thread_id()
+        with self._lock:
+            self._last_used[thread_id] = time.monotonic()
+            self._last_used.move_to_end(thread_id)
+            self.created += 1
+            evicted = []
+            while len(self._last_used) > self.max_sessions:
+                evicted.append(self._last_used.popitem(last=False)[0])
+            self.evicted_lru += len(evicted)
+        self._delete(evicted)
+        return thread_id
+
+    def restore(self, thread_ids: Iterable[str]) -> None:
+        """Tracks sessions a persistent checkpointer saved before a restart.
+
+        Without this, a saved session nobody asks for again would never be evicted. Each
+        is treated as used just now, and the least recently used go first beyond
+        ``max_sessions``.
+
+        Args:
+            thread_ids: Thread ids of the saved sessions, least recently used first
+        """
+        now = time.monotonic()
+        with self._lock:
+            for thread_id in thread_ids:
+                self._last_used.setdefault(thread_id, now)
+            evicted = []
+            while len(self._last_used) > self.max_sessions:
+                evicted.append(self._last_used.popitem(last=False)[0])
+            self.evicted_lru += len(evicted)
+        self._delete(evicted)
+
+    def touch(self, thread_id: str) -> None:
+        """Marks a session as just used."""
+        with self._lock:
+            if thread_id in self._last_used:
+                self._last_used[thread_id] = time.monotonic()
+                self._last_used.move_to_end(thread_id)
+
+    def close(self, thread_id: str) -> None:
+        """Ends a session and deletes its checkpoints."""
+        with self._lock:
+            self._last_used.pop(thread_id, None)
+        self.checkpointer.delete_thread(thread_id)
+
+    def evict_expired(self) -> list[str]:
+        """Evicts sessions idle for longer than ``ttl``.
+
+        Returns:
+            list[str]: Thread ids of the evicted sessions
+        """
+        deadline = time.monotonic() - self.ttl
+        with self._lock:
+            evicted = []
+            for thread_id, last_used in self._last_used.items():
+                if last_used > deadline:
+                    break
+                evicted.append(thread_id)
+            for thread_id in evicted:
+                del self._last_used[thread_id]
+            self.evicted_ttl += len(evicted)
+        self._delete(evicted)
+        return evicted
+
+    def _delete(self, thread_ids: list[str]) -> None:
+        for thread_id in thread_ids:
+            self.checkpointer.delete_thread(thread_id)
+            if self.on_evict is not None:
+                self.on_evict(thread_id)
+
+    def metrics(self) -> SessionMetrics:
+        return SessionMetrics(
+            sessions=len(self._last_used),
+            created=self.created,
+            evicted_lru=self.evicted_lru,
+            evicted_ttl=self.evicted_ttl,
+            checkpoints=self.checkpointer.metrics(),
+        )
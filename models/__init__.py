@@ -1,20 +1,33 @@
 """Models package for core domain entities."""
 
 from .college import College
-from .analysis_state import AnalysisState, VectorDataBaseResults
+from .analysis_state import (
+    AnalysisState,
+    VectorDataBaseResults,
+    CandidateAnalysis,
+    CandidateAnalysisBatch
+)
+from .college_filter import CollegeFilter
 from .constants import (
     SectorType,
     ProgramLevel,
+    Region,
     SECTOR_MAP,
-    PROGRAM_LEVELS
+    PROGRAM_LEVELS,
+    REGION_STATES
 )
 
 __all__ = [
     'College',
     'AnalysisState',
     'VectorDataBaseResults',
+    'CandidateAnalysis',
+    'CandidateAnalysisBatch',
+    'CollegeFilter',
     'SectorType',
     'ProgramLevel',
+    'Region',
     'SECTOR_MAP',
-    'PROGRAM_LEVELS'
+    'PROGRAM_LEVELS',
+    'REGION_STATES'
 ]
@@ -15,6 +15,19 @@ class VectorDataBaseResults(BaseModel):
     similarity_score: float = Field(description="Vector similarity score (0-1)")
 
 
+class CandidateAnalysis(BaseModel):
+    """Model for one candidate's analysis within a batched structured-output response."""
+    candidate_id: int = Field(description="Number of the candidate block this analysis refers to")
+    analysis: str = Field(description="Detailed compatibility analysis")
+
+
+class CandidateAnalysisBatch(BaseModel):
+    """Model for the structured output of a batched partner analysis request."""
+    analyses: list[CandidateAnalysis] = Field(
+        description="One compatibility analysis per candidate block, in any order"
+    )
+
+
 class AnalysisState(BaseModel):
     """Model for managing the state of the merger analysis pipeline."""
     school: str = Field(description="Name of the target institution")
@@ -0,0 +1,81 @@
+"""
+College Filter Model
+
+This module contains the typed metadata filter used to narrow vector store queries.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from .constants import Region, REGION_STATES
+
+
+class CollegeFilter(BaseModel):
+    """Typed filter over the institution metadata written at ingestion.
+
+    Every set field narrows the results; list fields match any of their values. An empty
+    list is treated as unset, since Chroma rejects an empty ``$in`` operand.
+    """
+    states: Optional[List[str]] = Field(default=None, description="State abbreviations (STABBR)")
+    regions: Optional[List[Region]] = Field(
+        default=None, description="Census regions, expanded to their states"
+    )
+    sectors: Optional[List[int]] = Field(default=None, description="IPEDS sector codes (SECTOR)")
+    controls: Optional[List[int]] = Field(
+        default=None,
+        description="Control codes (CONTROL): 1 public, 2 private nonprofit, 3 private for-profit"
+    )
+    levels: Optional[List[int]] = Field(default=None, description="Institution level codes (ICLEVEL)")
+    min_enrollment: Optional[int] = Field(default=None, description="Minimum total enrollment (EFTOTLT)")
+    max_enrollment: Optional[int] = Field(default=None, description="Maximum total enrollment (EFTOTLT)")
+    min_tuition: Optional[float] = Field(default=None, description="Minimum in-state tuition (TUITION1)")
+    max_tuition: Optional[float] = Field(default=None, description="Maximum in-state tuition (TUITION1)")
+    exclude_unitids: List[int] = Field(
+        default_factory=list, description="Institutions to leave out of the results (UNITID)"
+    )
+
+    def excluding(self, *unitids: int) -> "CollegeFilter":
+        """Return a copy of the filter that also excludes the given institutions."""
+        excluded = list(dict.fromkeys([*self.exclude_unitids, *(int(u) for u in unitids)]))
+        return self.model_copy(update={"exclude_unitids": excluded})
+
+    def to_where(self) -> Optional[Dict[str, Any]]:
+        """Compile the filter into a Chroma ``where`` expression.
+
+        Returns:
+            The where expression, or None if the filter has no conditions
+        """
+        conditions: List[Dict[str, Any]] = []
+
+        states = set(self.states or [])
+        for region in self.regions or []:
+            states.update(REGION_STATES[Region(region)])
+        if states:
+            conditions.append({"STABBR": {"$in": sorted(states)}})
+
+        for field, values in (
+            ("SECTOR", self.sectors),
+            ("CONTROL", self.controls),
+            ("ICLEVEL", self.levels),
+        ):
+            if values:
+                conditions.append({field: {"$in": list(values)}})
+
+        for field, operator, value in (
+            ("EFTOTLT", "$gte", self.min_enrollment),
+            ("EFTOTLT", "$lte", self.max_enrollment),
+            ("TUITION1", "$gte", self.min_tuition),
+            ("TUITION1", "$lte", self.max_tuition),
+        ):
+            if value is not None:
+                conditions.append({field: {operator: value}})
+
+        if self.exclude_unitids:
+            conditions.append({"UNITID": {"$nin": list(self.exclude_unitids)}})
+
+        if not conditions:
+            return None
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"$and": conditions}
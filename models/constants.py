@@ -1,7 +1,7 @@
 """Constants for the college models and analysis."""
 
 from enum import Enum
-from typing import Dict
+from typing import Dict, List
 
 
 class SectorType(str, Enum):
@@ -32,6 +32,14 @@ class ProgramLevel(str, Enum):
     OTHER_DOCTORATE = "Doctor's degree - other"
 
 
+class Region(str, Enum):
+    """Enum for U.S. Census regions used to filter institutions by location."""
+    NORTHEAST = "Northeast"
+    MIDWEST = "Midwest"
+    SOUTH = "South"
+    WEST = "West"
+
+
 SECTOR_MAP: Dict[int, str] = {
     1: SectorType.PUBLIC_4YEAR,
     2: SectorType.PRIVATE_NONPROFIT_4YEAR,
@@ -57,3 +65,16 @@ PROGRAM_LEVELS: Dict[str, str] = {
     'LEVEL18': ProgramLevel.PROFESSIONAL_DOCTORATE,
     'LEVEL19': ProgramLevel.OTHER_DOCTORATE
 }
+
+REGION_STATES: Dict[Region, List[str]] = {
+    Region.NORTHEAST: ['CT', 'ME', 'MA', 'NH', 'RI', 'VT', 'NJ', 'NY', 'PA'],
+    Region.MIDWEST: ['IL', 'IN', 'MI', 'OH', 'WI', 'IA', 'KS', 'MN', 'MO', 'NE', 'ND', 'SD'],
+    Region.SOUTH: [
+        'DE', 'DC', 'FL', 'GA', 'MD', 'NC', 'SC', 'VA', 'WV',
+        'AL', 'KY', 'MS', 'TN', 'AR', 'LA', 'OK', 'TX'
+    ],
+    Region.WEST: [
+        'AZ', 'CO', 'ID', 'MT', 'NV', 'NM', 'UT', 'WY',
+        'AK', 'CA', 'HI', 'OR', 'WA'
+    ]
+}
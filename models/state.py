@@ -4,7 +4,7 @@ from enum import Enum
 from pydantic import BaseModel, Field
 from langgraph.graph.message import add_messages
 from langgraph.graph import START, END
-from models import VectorDataBaseResults
+from models import VectorDataBaseResults, CollegeFilter
 
 
 class NodeName(str, Enum):
@@ -23,6 +23,8 @@ class State(BaseModel):
     """State definition for the school matcher graph"""
     messages: Annotated[list, add_messages] = []
     school: str
+    target_unitid: Optional[int] = None
+    college_filter: Optional[CollegeFilter] = None
     features: str = ""
     ipeds_semantic_search: list[VectorDataBaseResults] = []
     recommendations: str = ""
@@ -0,0 +1,175 @@
+"""Load test of concurrent school matcher sessions: sync threads against one event loop.
+
+The graph is built with simulated models and a simulated vector store that wait a fixed
+time per call instead of calling OpenAI or Chroma, so the test measures what each
+execution path costs per session rather than the services. Sync sessions each hold a
+thread (the batch mode path, plus the thread pool of their partner analyses); async
+sessions are tasks on one event loop. No API calls are made.
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_app.batch import arun_target, run_target
+from langchain_app.school_matcher_graph import create_school_matcher_graph
+
+# Load environment variables
+load_dotenv()
+
+
+class SimulatedChatModel(BaseChatModel):
+    """Chat model that answers with fixed text after a fixed delay."""
+
+    latency: float
+    text: str = "Simulated response."
+
+    @property
+    def _llm_type(self) -> str:
+        return "simulated"
+
+    def _result(self) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.text))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result()
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result()
+
+    def bind_tools(self, tools, **kwargs) -> "SimulatedChatModel":
+        # Never calls tools, so the graph always goes straight to feedback
+        return self
+
+
+class SimulatedVectorStore:
+    """The CollegeVectorStore methods the graph calls, answering after a fixed delay.
+
+    Like Chroma it is synchronous, so async nodes call it on worker threads.
+    """
+
+    section_collection = None
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def _match(self, unit_id: int) -> Dict[str, Any]:
+        return {
+            "id": f"doc_{unit_id}",
+            "metadata": {"UNITID": unit_id, "INSTNM": f"College {unit_id}", "CITY": "City", "STABBR": "ST"},
+            "document": f"Institution: College {unit_id}",
+            "distance": 0.1,
+        }
+
+    def resolve_institution(self, name: str) -> Optional[Dict[str, Any]]:
+        return self._match(100000)
+
+    def find_similar_colleges(self, query: str, n_results: int = 5, where=None) -> List[Dict[str, Any]]:
+        time.sleep(self.latency)
+        return [self._match(100001 + rank) for rank in range(n_results)]
+
+
+class ThreadSampler:
+    """Records the largest number of live threads while running."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self) -> "ThreadSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def run_sync(graph, targets: List[Dict[str, Any]]) -> List[float]:
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        records = list(executor.map(lambda target: run_target(graph, target), targets))
+    return [record["elapsed_seconds"] for record in records]
+
+
+def run_async(graph, targets: List[Dict[str, Any]]) -> List[float]:
+    async def run_all():
+        return await asyncio.gather(*(arun_target(graph, target) for target in targets))
+    return [record["elapsed_seconds"] for record in asyncio.run(run_all())]
+
+
+def measure(run, graph, sessions: int, label: str) -> Dict[str, float]:
+    """Run concurrent sessions and time them, with the nodes' output discarded."""
+    targets = [{"id": f"{label}-{sessions}-{n}", "school": f"Target college {n}"} for n in range(sessions)]
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    with ThreadSampler() as threads, contextlib.redirect_stdout(io.StringIO()):
+        latencies = run(graph, targets)
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    return {
+        "wall": wall,
+        "sessions_per_second": sessions / wall,
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+        "cpu_ms": cpu / sessions * 1000,
+        "threads": threads.peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", default="1,10,50,100", help="Comma-separated concurrent session counts")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per analysis LLM call")
+    parser.add_argument("--recommender-latency", type=float, default=2.0, help="Seconds per recommendation")
+    parser.add_argument("--vector-latency", type=float, default=0.005, help="Seconds per vector query")
+    args = parser.parse_args()
+
+    graph = create_school_matcher_graph(
+        SimulatedVectorStore(args.vector_latency),
+        llm=SimulatedChatModel(latency=args.llm_latency),
+        recommender_llm=SimulatedChatModel(latency=args.recommender_latency),
+    )
+    cores = os.cpu_count() or 1
+
+    print(
+        f"Simulated latency: {args.llm_latency}s per analysis, {args.recommender_latency}s per "
+        f"recommendation, {args.vector_latency}s per vector query; {cores} CPUs\n"
+    )
+    print(
+        f"{'path':<6} {'sessions':>8} {'wall s':>8} {'sess/s':>8} {'p50 s':>7} {'p95 s':>7} "
+        f"{'CPU ms/sess':>11} {'sess/s/core':>11} {'threads':>8}"
+    )
+    for sessions in [int(value) for value in args.sessions.split(",")]:
+        for label, run in (("sync", run_sync), ("async", run_async)):
+            result = measure(run, graph, sessions, label)
+            print(
+                f"{label:<6} {sessions:>8} {result['wall']:>8.2f} {result['sessions_per_second']:>8.1f} "
+                f"{result['p50']:>7.2f} {result['p95']:>7.2f} {result['cpu_ms']:>11.1f} "
+                f"{result['sessions_per_second'] / cores:>11.1f} {result['threads']:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Benchmark checkpoint size and write latency of the in-memory and SQLite checkpointers.
+
+Sessions run the school matcher graph with simulated models and a simulated vector store
+(see benchmark_async_sessions.py) through the first recommendation and a number of
+feedback rounds. The models answer with text of realistic length, so the state holds
+messages, partner analyses and recommendations about as large as real ones. Every save is
+timed, and what each checkpointer holds at the end is measured as serialized bytes. A
+full-snapshot baseline, the uncompressed size of every channel value at every step, shows
+what a checkpointer writing whole states instead of changes would store. No API calls are
+made.
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.types import Command
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_async_sessions import SimulatedChatModel, SimulatedVectorStore
+from db.checkpoint_store import SqliteCheckpointSaver
+from langchain_app.school_matcher_graph import create_graph_config, create_school_matcher_graph
+from langchain_app.sessions import BoundedMemorySaver
+from langchain_app.utils.human_feedback import EMPTY_INPUT_MSG
+
+# Load environment variables
+load_dotenv()
+
+VOCABULARY = (
+    "the institution enrollment students faculty program academic financial tuition revenue "
+    "endowment merger partner strategic alignment risk campus region graduate undergraduate "
+    "retention market mission research community college university of and to in with for "
+    "a an is are growth decline integration accreditation governance cost synergy"
+).split()
+
+
+def response_text(words: int, seed: int) -> str:
+    """Prose-like text of random vocabulary words; it compresses somewhat better than real answers."""
+    rng = random.Random(seed)
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words)) + "."
+
+
+class TimedSaves:
+    """Times a checkpointer's put and put_writes calls and sums full-snapshot sizes."""
+
+    def __init__(self, checkpointer):
+        self.put_ms: List[float] = []
+        self.put_writes_ms: List[float] = []
+        self.snapshot_bytes = 0
+        serde = JsonPlusSerializer()
+        put, put_writes = checkpointer.put, checkpointer.put_writes
+
+        def timed_put(config, checkpoint, metadata, new_versions):
+            start = time.perf_counter()
+            saved = put(config, checkpoint, metadata, new_versions)
+            self.put_ms.append((time.perf_counter() - start) * 1000)
+            self.snapshot_bytes += len(serde.dumps_typed(checkpoint)[1])
+            return saved
+
+        def timed_put_writes(config, writes, task_id, task_path=""):
+            start = time.perf_counter()
+            put_writes(config, writes, task_id, task_path)
+            self.put_writes_ms.append((time.perf_counter() - start) * 1000)
+
+        checkpointer.put = timed_put
+        checkpointer.put_writes = timed_put_writes
+
+
+def memory_saver_bytes(checkpointer: MemorySaver) -> int:
+    """Serialized bytes a MemorySaver holds, counted as BoundedMemorySaver.metrics does."""
+    size = sum(
+        len(checkpoint[1]) + len(metadata[1])
+        for namespaces in checkpointer.storage.values()
+        for saved_by_id in namespaces.values()
+        for checkpoint, metadata, _ in saved_by_id.values()
+    )
+    size += sum(len(value[1]) for writes in checkpointer.writes.values() for _, _, value, _ in writes.values())
+    size += sum(len(value[1]) for value in checkpointer.blobs.values())
+    return size
+
+
+def run_sessions(graph, sessions: int, feedback_rounds: int) -> None:
+    """Run sessions to the end with the graph's output discarded."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        for session in range(sessions):
+            config = create_graph_config()
+            graph.invoke({"messages": [], "school": f"Target college {session}"}, config=config)
+            for round_ in range(feedback_rounds):
+                graph.invoke(Command(resume=f"Feedback {round_}: weigh financial risk more"), config=config)
+            graph.invoke(Command(resume=EMPTY_INPUT_MSG), config=config)
+
+
+def measure(name: str, checkpointer, stored_bytes: Callable[[], int], args) -> Dict[str, Any]:
+    graph = create_school_matcher_graph(
+        SimulatedVectorStore(0.0),
+        llm=SimulatedChatModel(latency=0.0, text=response_text(args.analysis_words, 1)),
+        recommender_llm=SimulatedChatModel(latency=0.0, text=response_text(args.recommendation_words, 2)),
+        checkpointer=checkpointer,
+    )
+    saves = TimedSaves(checkpointer)
+    start = time.perf_counter()
+    run_sessions(graph, args.sessions, args.feedback_rounds)
+    wall = time.perf_counter() - start
+    return {
+        "name": name,
+        "checkpoints": len(saves.put_ms),
+        "stored": stored_bytes(),
+        "snapshot": saves.snapshot_bytes,
+        "put_p50": float(np.percentile(saves.put_ms, 50)),
+        "put_p95": float(np.percentile(saves.put_ms, 95)),
+        "put_writes_p50": float(np.percentile(saves.put_writes_ms, 50)),
+        "save_total": sum(saves.put_ms) + sum(saves.put_writes_ms),
+        "wall": wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=20, help="Sessions run per checkpointer")
+    parser.add_argument("--feedback-rounds", type=int, default=2, help="Feedback rounds per session")
+    parser.add_argument("--analysis-words", type=int, default=400, help="Words per simulated analysis")
+    parser.add_argument("--recommendation-words", type=int, default=1200, help="Words per simulated recommendation")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        memory = MemorySaver()
+        bounded = BoundedMemorySaver()
+        sqlite = SqliteCheckpointSaver(os.path.join(directory, "compressed.db"))
+        sqlite_raw = SqliteCheckpointSaver(os.path.join(directory, "raw.db"), serde=JsonPlusSerializer())
+        results = [
+            measure("memory", memory, lambda: memory_saver_bytes(memory), args),
+            measure("memory-bounded", bounded, lambda: bounded.metrics().bytes, args),
+            measure("sqlite", sqlite, lambda: sqlite.metrics().bytes, args),
+            measure("sqlite-uncompressed", sqlite_raw, lambda: sqlite_raw.metrics().bytes, args),
+        ]
+        # Closing checkpoints the WAL into the database file
+        sqlite.close()
+        sqlite_raw.close()
+        file_sizes = {
+            name: os.path.getsize(os.path.join(directory, f"{name}.db")) for name in ("compressed", "raw")
+        }
+
+    print(
+        f"{args.sessions} sessions, {args.feedback_rounds} feedback rounds each, "
+        f"{args.analysis_words}-word analyses, {args.recommendation_words}-word recommendations\n"
+    )
+    print(
+        f"{'checkpointer':<20} {'ckpts':>6} {'stored KB':>10} {'B/ckpt':>8} {'snapshot KB':>12} "
+        f"{'put p50 ms':>11} {'put p95 ms':>11} {'writes p50 ms':>14} {'saves s':>8} {'wall s':>7}"
+    )
+    for result in results:
+        print(
+            f"{result['name']:<20} {result['checkpoints']:>6} {result['stored'] / 1024:>10.1f} "
+            f"{result['stored'] / result['checkpoints']:>8.0f} {result['snapshot'] / 1024:>12.1f} "
+            f"{result['put_p50']:>11.3f} {result['put_p95']:>11.3f} {result['put_writes_p50']:>14.3f} "
+            f"{result['save_total'] / 1000:>8.2f} {result['wall']:>7.2f}"
+        )
+    print(
+        f"\nSQLite files: {file_sizes['compressed'] / 1024:.1f} KB compressed, "
+        f"{file_sizes['raw'] / 1024:.1f} KB uncompressed"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Benchmark cold starts and artifact size of the snapshot against the Chroma directory.
+
+Each artifact is copied the way a container image or volume would receive it, then opened
+and queried once in fresh Python processes, so interpreter startup, imports, opening and
+the first query are all measured. A float32 NumPy export of the collection is compared
+too, and is the exact search the float16 snapshot's recall is measured against. No
+embedding API calls are made: queries are stored vectors.
+
+Files read by earlier runs stay in the OS page cache, so the timings are warm-cache cold
+starts; the first run of each artifact is reported separately.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict
+
+import numpy as np
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.collection_alias import DEFAULT_COLLECTION_ALIAS, open_collection
+from db.index_snapshot import DEFAULT_SNAPSHOT_PATH, SnapshotIndex
+from db.numpy_index import NumpyCollegeIndex
+
+# Load environment variables
+load_dotenv()
+
+
+def artifact_size(path: str) -> int:
+    """Total bytes of a file or of every file under a directory."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def copy_artifact(path: str, destination: str) -> float:
+    """Copy a file or directory and time it."""
+    start = time.perf_counter()
+    if os.path.isfile(path):
+        shutil.copy2(path, destination)
+    else:
+        shutil.copytree(path, destination)
+    return time.perf_counter() - start
+
+
+# Fresh-process programs opening each artifact and running one query; each imports only
+# what its artifact needs, so import time is part of the comparison
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import numpy as np
+{imports}
+imported = time.perf_counter()
+query = np.load({query_path!r}).tolist()
+opened_at = time.perf_counter()
+index = {open}
+opened = time.perf_counter()
+{query}
+queried = time.perf_counter()
+print(json.dumps({{"import": imported - start, "open": opened - opened_at, "first_query": queried - opened}}))
+"""
+
+_PROBES = {
+    "chroma": (
+        "from db.collection_alias import open_collection",
+        "open_collection({path!r}, {collection!r})",
+        "index.query(query_embeddings=[query], n_results={k})",
+    ),
+    "numpy": (
+        "from db.numpy_index import NumpyCollegeIndex",
+        "NumpyCollegeIndex({path!r})",
+        "index.query([query], n_results={k})",
+    ),
+    "snapshot": (
+        "from db.index_snapshot import SnapshotIndex",
+        "SnapshotIndex({path!r})",
+        "index.query([query], n_results={k})",
+    ),
+}
+
+
+def cold_start(kind: str, path: str, args, query_path: str) -> Dict[str, float]:
+    """Time a fresh process importing, opening an artifact and answering one query."""
+    imports, open_call, query_call = _PROBES[kind]
+    values = {"path": path, "collection": args.collection, "k": args.k}
+    program = _PROBE.format(
+        root=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        query_path=query_path,
+        imports=imports,
+        open=open_call.format(**values),
+        query=query_call.format(**values),
+    )
+
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", program], check=True, capture_output=True, text=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings["process"] = time.perf_counter() - start
+    return timings
+
+
+def snapshot_recall(snapshot: SnapshotIndex, exact: NumpyCollegeIndex, args) -> float:
+    """Average share of the exact float32 top-k that the float16 snapshot returns."""
+    rng = np.random.default_rng(args.seed)
+    rows = rng.choice(len(exact), size=min(args.queries, len(exact)), replace=False)
+    queries = np.asarray(exact.embeddings[rows], dtype=np.float32)
+    queries += rng.normal(scale=args.noise, size=queries.shape).astype(np.float32)
+
+    expected = exact.query(queries.tolist(), n_results=args.k)
+    found = snapshot.query(queries.tolist(), n_results=args.k)
+    return float(np.mean([
+        len({hit["id"] for hit in hits} & {hit["id"] for hit in truth}) / len(truth)
+        for hits, truth in zip(found, expected)
+    ]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chroma-dir", default="./chroma_db", help="Chroma persist directory")
+    parser.add_argument(
+        "--collection", default=DEFAULT_COLLECTION_ALIAS, help="Alias of the collection to compare"
+    )
+    parser.add_argument(
+        "--snapshot", default=DEFAULT_SNAPSHOT_PATH, help="Snapshot file; exported first if it does not exist"
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per artifact")
+    parser.add_argument("--queries", type=int, default=200, help="Queries for the recall check")
+    parser.add_argument("-k", type=int, default=10, help="Results per query")
+    parser.add_argument("--noise", type=float, default=0.01, help="Query perturbation scale")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    collection = open_collection(args.chroma_dir, args.collection)
+    if not os.path.exists(args.snapshot):
+        print(f"Exporting {args.snapshot}")
+        SnapshotIndex.export(collection, args.snapshot)
+    snapshot = SnapshotIndex(args.snapshot)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # The float32 NumPy export is both the exact ground truth and a third artifact
+        exact = NumpyCollegeIndex.export(collection, os.path.join(scratch, "exact"))
+        artifacts = {
+            "chroma": args.chroma_dir,
+            "numpy": os.path.join(scratch, "exact"),
+            "snapshot": args.snapshot,
+        }
+
+        query_path = os.path.join(scratch, "query.npy")
+        np.save(query_path, np.asarray(exact.embeddings[0], dtype=np.float32))
+
+        print(
+            f"{len(snapshot)} documents, {snapshot.embeddings.shape[1]}-d, "
+            f"{args.runs} cold starts per artifact, k={args.k}\n"
+        )
+        print(
+            f"{'artifact':<10} {'size MB':>9} {'copy s':>8} {'first s':>8} "
+            f"{'process s':>10} {'import ms':>10} {'open ms':>9} {'query ms':>9}"
+        )
+        for kind, path in artifacts.items():
+            copied = os.path.join(scratch, f"copy-{kind}")
+            copy_seconds = copy_artifact(path, copied)
+
+            runs = [cold_start(kind, copied, args, query_path) for _ in range(args.runs)]
+            later = runs[1:] or runs
+            print(
+                f"{kind:<10} {artifact_size(path) / 1e6:>9.1f} {copy_seconds:>8.3f} "
+                f"{runs[0]['process']:>8.3f} "
+                f"{np.median([run['process'] for run in later]):>10.3f} "
+                f"{np.median([run['import'] for run in later]) * 1000:>10.1f} "
+                f"{np.median([run['open'] for run in later]) * 1000:>9.1f} "
+                f"{np.median([run['first_query'] for run in later]) * 1000:>9.1f}"
+            )
+
+        recall = snapshot_recall(snapshot, exact, args)
+    print(f"\nsnapshot recall@{args.k} against exact float32 search: {recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Benchmark retrieval latency and recall of the CollegeVectorStore search backends.
+
+Query vectors are sampled from the exported NumPy index and perturbed with noise, so the
+backend comparison makes no embedding API calls. Exact NumPy search is the ground truth for
+recall. When a BM25 index is available, the retrieval modes are also compared on text
+queries built from sampled institutions' names and locations; those are embedded once up
+front, outside the timings.
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.bm25_index import DEFAULT_BM25_INDEX_DIR
+from db.college_vector_store import CollegeVectorStore, RetrievalMode, SearchBackend
+from db.numpy_index import DEFAULT_NUMPY_INDEX_DIR
+
+# Load environment variables
+load_dotenv()
+
+
+def sample_query_embeddings(store: CollegeVectorStore, n_queries: int, noise: float, seed: int):
+    """Sample stored embeddings and perturb them into query vectors."""
+    rng = np.random.default_rng(seed)
+    matrix = store.numpy_index.embeddings
+    rows = rng.choice(matrix.shape[0], size=min(n_queries, matrix.shape[0]), replace=False)
+    queries = np.asarray(matrix[np.sort(rows)], dtype=np.float32)
+    queries += rng.normal(scale=noise, size=queries.shape).astype(np.float32)
+    return queries.tolist()
+
+
+def sample_text_queries(store: CollegeVectorStore, n_queries: int, seed: int):
+    """Build name and location queries for sampled institutions.
+
+    Returns:
+        Query texts and the id of the institution each one was built from
+    """
+    rng = np.random.default_rng(seed)
+    index = store.numpy_index
+    rows = rng.choice(len(index), size=min(n_queries, len(index)), replace=False)
+    texts = []
+    expected = []
+    for row in np.sort(rows):
+        metadata = index.metadatas[row]
+        texts.append(
+            f"{metadata.get('INSTNM', '')} {metadata.get('CITY', '')} {metadata.get('STABBR', '')}"
+        )
+        expected.append([index.ids[row]])
+    return texts, expected
+
+
+def time_queries(search: Callable[[list], List[str]], queries: list) -> Dict[str, object]:
+    """Run one query at a time and collect per-query latencies and result ids."""
+    latencies = []
+    ids = []
+    for query in queries:
+        start = time.perf_counter()
+        ids.append(search(query))
+        latencies.append(time.perf_counter() - start)
+    return {"latencies": np.array(latencies), "ids": ids}
+
+
+def recall_at_k(results: List[List[str]], truth: List[List[str]]) -> float:
+    """Average fraction of the exact top-k found by a backend."""
+    scores = [
+        len(set(found) & set(expected)) / len(expected)
+        for found, expected in zip(results, truth)
+        if expected
+    ]
+    return float(np.mean(scores)) if scores else 0.0
+
+
+def print_report(
+    name: str, run: Dict[str, object], truth: List[List[str]], metric: str = "recall@k"
+) -> None:
+    latencies_ms = run["latencies"] * 1000
+    print(
+        f"{name:<24} p50 {np.percentile(latencies_ms, 50):9.3f} ms   "
+        f"p95 {np.percentile(latencies_ms, 95):9.3f} ms   "
+        f"mean {latencies_ms.mean():9.3f} ms   "
+        f"{metric:<8} {recall_at_k(run['ids'], truth):.3f}"
+    )
+
+
+def benchmark_retrieval_modes(args, numpy_store: CollegeVectorStore) -> None:
+    """Compare vector, BM25 and hybrid retrieval on name and location text queries."""
+    texts, expected = sample_text_queries(numpy_store, args.text_queries, args.seed)
+    embeddings = numpy_store.embedding_function(texts)
+    queries = list(zip(texts, embeddings))
+
+    hybrid_stores = {
+        backend: CollegeVectorStore(
+            args.chroma_dir,
+            backend=backend,
+            numpy_index_dir=args.numpy_index_dir,
+            retrieval_mode=RetrievalMode.HYBRID,
+            bm25_index_dir=args.bm25_index_dir,
+        )
+        for backend in (SearchBackend.NUMPY, SearchBackend.CHROMA)
+    }
+    bm25_store = hybrid_stores[SearchBackend.NUMPY]
+    chroma_store = hybrid_stores[SearchBackend.CHROMA]
+
+    def ids(results: List[Dict[str, object]]) -> List[str]:
+        return [result["id"] for result in results]
+
+    runs = {
+        "vector (numpy)": time_queries(
+            lambda query: ids(numpy_store.query_by_embeddings([query[1]], n_results=args.k)[0]),
+            queries,
+        ),
+        "vector (chroma)": time_queries(
+            lambda query: ids(chroma_store.query_by_embeddings([query[1]], n_results=args.k)[0]),
+            queries,
+        ),
+        "bm25": time_queries(
+            lambda query: ids(bm25_store.bm25_query([query[0]], n_results=args.k)[0]),
+            queries,
+        ),
+    }
+    for backend, store in hybrid_stores.items():
+        runs[f"hybrid ({backend.value})"] = time_queries(
+            lambda query, store=store: ids(
+                store.hybrid_query([query[0]], [query[1]], n_results=args.k)[0]
+            ),
+            queries,
+        )
+
+    print(
+        f"\nRetrieval modes: {len(queries)} name and location queries, k={args.k}, "
+        f"{len(bm25_store.bm25_index.terms)} BM25 terms\n"
+    )
+    for name, run in runs.items():
+        print_report(name, run, expected, metric="hit@k")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chroma-dir", default="./chroma_db", help="Chroma persist directory")
+    parser.add_argument(
+        "--numpy-index-dir", default=DEFAULT_NUMPY_INDEX_DIR, help="Exported NumPy index"
+    )
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("-k", type=int, default=10, help="Results per query")
+    parser.add_argument("--noise", type=float, default=0.01, help="Query perturbation scale")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument(
+        "--bm25-index-dir",
+        default=DEFAULT_BM25_INDEX_DIR,
+        help="BM25 index; the retrieval mode comparison is skipped if it does not exist",
+    )
+    parser.add_argument(
+        "--text-queries", type=int, default=100, help="Number of text queries per retrieval mode"
+    )
+    args = parser.parse_args()
+
+    chroma_store = CollegeVectorStore(args.chroma_dir)
+    numpy_store = CollegeVectorStore(
+        args.chroma_dir, backend=SearchBackend.NUMPY, numpy_index_dir=args.numpy_index_dir
+    )
+    queries = sample_query_embeddings(numpy_store, args.queries, args.noise, args.seed)
+
+    def searcher(store: CollegeVectorStore) -> Callable[[list], List[str]]:
+        return lambda query: [
+            result["id"] for result in store.query_by_embeddings([query], n_results=args.k)[0]
+        ]
+
+    runs = {
+        "numpy (exact)": time_queries(searcher(numpy_store), queries),
+        "chroma (hnsw)": time_queries(searcher(chroma_store), queries),
+    }
+    truth = runs["numpy (exact)"]["ids"]
+
+    print(f"{len(queries)} queries, k={args.k}, {len(numpy_store.numpy_index)} documents\n")
+    for name, run in runs.items():
+        print_report(name, run, truth)
+
+    # One vectorized call for the whole query set
+    start = time.perf_counter()
+    numpy_store.query_by_embeddings(queries, n_results=args.k)
+    batch_elapsed = time.perf_counter() - start
+    print(
+        f"\nnumpy batched: {batch_elapsed * 1000:.3f} ms total, "
+        f"{batch_elapsed / len(queries) * 1e6:.1f} us per query"
+    )
+
+    if os.path.exists(args.bm25_index_dir):
+        benchmark_retrieval_modes(args, numpy_store)
+
+
+if __name__ == "__main__":
+    main()
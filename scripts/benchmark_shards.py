@@ -0,0 +1,136 @@
+"""Benchmark index build and query scaling of sharded Chroma collections.
+
+Documents come from the exported NumPy index, replicated ``--copies`` times with a little
+noise to stand in for several IPEDS years, or are random vectors with ``--synthetic``.
+For each shard count the collection is written by one process per shard, then queried one
+query at a time with fan-out across the shards. Exact NumPy search is the ground truth for
+recall. No embedding API calls are made.
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.numpy_index import DEFAULT_NUMPY_INDEX_DIR, NumpyCollegeIndex
+from db.sharding import ShardedCollection, ShardedWriter
+
+# Load environment variables
+load_dotenv()
+
+BENCHMARK_COLLECTION = "shard_benchmark"
+
+
+def load_documents(args) -> Dict[str, Any]:
+    """Get ids, texts, metadatas and embeddings for the benchmark collection."""
+    rng = np.random.default_rng(args.seed)
+    if args.synthetic:
+        embeddings = rng.normal(size=(args.synthetic, args.dim)).astype(np.float32)
+        base_ids = [f"doc_{100000 + row}" for row in range(args.synthetic)]
+        base_texts = [f"Institution {row}" for row in range(args.synthetic)]
+        base_metadatas = [{"UNITID": 100000 + row} for row in range(args.synthetic)]
+    else:
+        index = NumpyCollegeIndex(args.numpy_index_dir)
+        embeddings = np.asarray(index.embeddings, dtype=np.float32)
+        base_ids, base_texts, base_metadatas = index.ids, index.documents, index.metadatas
+
+    # Each copy stands in for another year of the same institutions
+    copies = [embeddings]
+    for _ in range(1, args.copies):
+        copies.append(embeddings + rng.normal(scale=args.noise, size=embeddings.shape).astype(np.float32))
+    return {
+        "ids": [f"{doc_id}_{copy}" for copy in range(args.copies) for doc_id in base_ids],
+        "texts": [text for _ in range(args.copies) for text in base_texts],
+        "metadatas": [{**metadata, "COPY": copy} for copy in range(args.copies) for metadata in base_metadatas],
+        "embeddings": np.concatenate(copies),
+    }
+
+
+def exact_top_k(embeddings: np.ndarray, queries: np.ndarray, ids: List[str], k: int) -> List[List[str]]:
+    """Exact squared L2 nearest neighbors, Chroma's default space."""
+    squared_norms = np.einsum("ij,ij->i", embeddings, embeddings)
+    truth = []
+    for query in queries:
+        distances = squared_norms - 2.0 * embeddings @ query
+        top = np.argpartition(distances, k - 1)[:k]
+        truth.append([ids[row] for row in top[np.argsort(distances[top])]])
+    return truth
+
+
+def build(documents: Dict[str, Any], directory: str, shard_count: int, batch_size: int) -> float:
+    """Write the documents into a fresh sharded collection and time it, including process startup."""
+    shutil.rmtree(directory, ignore_errors=True)
+    start = time.perf_counter()
+    with ShardedWriter(directory, BENCHMARK_COLLECTION, shard_count, recreate=True) as writer:
+        for offset in range(0, len(documents["ids"]), batch_size):
+            end = offset + batch_size
+            writer.write(
+                documents["texts"][offset:end],
+                documents["ids"][offset:end],
+                documents["metadatas"][offset:end],
+                documents["embeddings"][offset:end],
+            )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--numpy-index-dir", default=DEFAULT_NUMPY_INDEX_DIR, help="Exported NumPy index to copy documents from"
+    )
+    parser.add_argument("--synthetic", type=int, default=0, help="Use this many random documents instead")
+    parser.add_argument("--dim", type=int, default=1536, help="Dimension of synthetic embeddings")
+    parser.add_argument("--copies", type=int, default=3, help="Copies of each document, e.g. IPEDS years")
+    parser.add_argument("--shards", default="1,2,4", help="Comma-separated shard counts to compare")
+    parser.add_argument("--output-dir", default="./shard_benchmark", help="Scratch Chroma directory")
+    parser.add_argument("--batch-size", type=int, default=500, help="Documents per write")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("-k", type=int, default=10, help="Results per query")
+    parser.add_argument("--noise", type=float, default=0.01, help="Copy and query perturbation scale")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    documents = load_documents(args)
+    embeddings = documents["embeddings"]
+    rng = np.random.default_rng(args.seed)
+    rows = rng.choice(len(embeddings), size=min(args.queries, len(embeddings)), replace=False)
+    queries = embeddings[rows] + rng.normal(scale=args.noise, size=(len(rows), embeddings.shape[1])).astype(np.float32)
+    truth = exact_top_k(embeddings, queries, documents["ids"], args.k)
+
+    print(
+        f"{len(embeddings)} documents ({args.copies} copies), {embeddings.shape[1]}-d, "
+        f"{len(queries)} queries, k={args.k}, {os.cpu_count()} CPUs\n"
+    )
+    print(f"{'shards':>6}  {'build s':>9}  {'docs/s':>8}  {'p50 ms':>8}  {'p95 ms':>8}  {'recall@k':>8}")
+    for shard_count in [int(value) for value in args.shards.split(",")]:
+        # Chroma caches clients by path within a process, so every run gets its own directory
+        directory = os.path.join(args.output_dir, f"shards-{shard_count}")
+        build_seconds = build(documents, directory, shard_count, args.batch_size)
+        collection = ShardedCollection.open(directory, BENCHMARK_COLLECTION, shard_count=shard_count)
+
+        latencies = []
+        recalls = []
+        for query, expected in zip(queries.tolist(), truth):
+            start = time.perf_counter()
+            found = collection.query(query_embeddings=[query], n_results=args.k, include=["distances"])["ids"][0]
+            latencies.append(time.perf_counter() - start)
+            recalls.append(len(set(found) & set(expected)) / len(expected))
+
+        latencies_ms = np.array(latencies) * 1000
+        print(
+            f"{shard_count:>6}  {build_seconds:>9.2f}  {len(embeddings) / build_seconds:>8.0f}  "
+            f"{np.percentile(latencies_ms, 50):>8.3f}  {np.percentile(latencies_ms, 95):>8.3f}  "
+            f"{np.mean(recalls):>8.3f}"
+        )
+
+    shutil.rmtree(args.output_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Build the BM25 keyword index over the documents in the ipeds_colleges Chroma collection.
+
+The index is written to a directory named after the build the alias points at, inside
+--output-dir, where CollegeVectorStore looks for it.
+"""
+import argparse
+import os
+import sys
+import time
+
+from chromadb.utils import embedding_functions
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.bm25_index import BM25Index, DEFAULT_BM25_INDEX_DIR, build_index_dir
+from db.collection_alias import DEFAULT_COLLECTION_ALIAS, open_target, resolve_alias
+
+# Load environment variables
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chroma-dir", default="./chroma_db", help="Chroma persist directory")
+    parser.add_argument(
+        "--collection", default=DEFAULT_COLLECTION_ALIAS, help="Alias of the collection to index"
+    )
+    parser.add_argument(
+        "--output-dir", default=DEFAULT_BM25_INDEX_DIR, help="Directory for the BM25 index"
+    )
+    args = parser.parse_args()
+
+    openai_ef = embedding_functions.OpenAIEmbeddingFunction(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        model_name="text-embedding-ada-002"
+    )
+    # The alias resolves to the active build, read through all of its shards if sharded
+    target = resolve_alias(args.chroma_dir, args.collection)
+    collection = open_target(args.chroma_dir, target, embedding_function=openai_ef, create=False)
+    index_dir = build_index_dir(args.output_dir, target.collection)
+
+    start_time = time.time()
+    index = BM25Index.from_collection(collection, index_dir)
+    elapsed_time = time.time() - start_time
+
+    print(
+        f"Indexed {len(index)} documents with {len(index.terms)} terms "
+        f"to {index_dir} in {elapsed_time:.2f} seconds"
+    )
+
+
+if __name__ == "__main__":
+    main()
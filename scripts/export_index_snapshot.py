@@ -0,0 +1,47 @@
+"""Export the ipeds_colleges Chroma collection into a single read-only snapshot file."""
+import argparse
+import os
+import sys
+import time
+
+from chromadb.utils import embedding_functions
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.collection_alias import DEFAULT_COLLECTION_ALIAS, open_collection
+from db.index_snapshot import DEFAULT_SNAPSHOT_PATH, SnapshotIndex
+
+# Load environment variables
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chroma-dir", default="./chroma_db", help="Chroma persist directory")
+    parser.add_argument(
+        "--collection", default=DEFAULT_COLLECTION_ALIAS, help="Alias of the collection to export"
+    )
+    parser.add_argument("--output", default=DEFAULT_SNAPSHOT_PATH, help="Snapshot file to write")
+    args = parser.parse_args()
+
+    openai_ef = embedding_functions.OpenAIEmbeddingFunction(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        model_name="text-embedding-ada-002"
+    )
+    # The alias resolves to the active build, read through all of its shards if sharded
+    collection = open_collection(args.chroma_dir, args.collection, embedding_function=openai_ef)
+
+    start_time = time.time()
+    snapshot = SnapshotIndex.export(collection, args.output)
+    elapsed_time = time.time() - start_time
+
+    print(
+        f"Exported {len(snapshot)} documents with {snapshot.embeddings.shape[1]}-d float16 embeddings "
+        f"({snapshot.space} space) to {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB) "
+        f"in {elapsed_time:.2f} seconds"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Export the ipeds_colleges Chroma collection into a memory-mapped NumPy search index."""
+import argparse
+import os
+import sys
+import time
+
+from chromadb.utils import embedding_functions
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.numpy_index import NumpyCollegeIndex, DEFAULT_NUMPY_INDEX_DIR
+from db.collection_alias import DEFAULT_COLLECTION_ALIAS, open_collection
+
+# Load environment variables
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chroma-dir", default="./chroma_db", help="Chroma persist directory")
+    parser.add_argument(
+        "--collection", default=DEFAULT_COLLECTION_ALIAS, help="Alias of the collection to export"
+    )
+    parser.add_argument(
+        "--output-dir", default=DEFAULT_NUMPY_INDEX_DIR, help="Directory for the exported index"
+    )
+    args = parser.parse_args()
+
+    openai_ef = embedding_functions.OpenAIEmbeddingFunction(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        model_name="text-embedding-ada-002"
+    )
+    # The alias resolves to the active build, read through all of its shards if sharded
+    collection = open_collection(args.chroma_dir, args.collection, embedding_function=openai_ef)
+
+    start_time = time.time()
+    index = NumpyCollegeIndex.export(collection, args.output_dir)
+    elapsed_time = time.time() - start_time
+
+    print(
+        f"Exported {len(index)} documents with {index.embeddings.shape[1]}-d embeddings "
+        f"({index.space} space) to {args.output_dir} in {elapsed_time:.2f} seconds"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,56 @@
+import argparse
 import subprocess
 import csv
-import io
 import chromadb
 from chromadb.utils import embedding_functions
 import pandas as pd
 from tqdm import tqdm
 import os
+import resource
 import sys
 import time
 import concurrent.futures
 from functools import partial
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.bm25_index import BM25Index, build_index_dir, drop_build_index
+from db.embedding_pipeline import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_REQUESTS_PER_MINUTE,
+    DEFAULT_TOKENS_PER_MINUTE,
+    EmbeddingPipeline,
+)
+from db.ipeds_tables import IPEDSTableCache, stream_mdb_export
+from db.collection_alias import (
+    DEFAULT_COLLECTION_ALIAS,
+    DEFAULT_MIN_COUNT_RATIO,
+    CollectionTarget,
+    activate,
+    drop_stale_versions,
+    open_target,
+    resolve_alias,
+    section_target,
+    validate_build,
+    versioned_name,
+)
+from db.sharding import ShardedWriter
+from db.ipeds_documents import (
+    DEFAULT_SHARD_SIZE,
+    ROW_FILTERS,
+    TABLE_SCHEMAS,
+    WRITE_BATCH_SIZE,
+    IncrementalSync,
+    build_documents_in_parallel,
+    build_institution_documents,
+    join_tables,
+    render_document_shard,
+    render_sectioned_shard,
+    split_sections,
+    with_content_hashes,
+)
+
 # Load environment variables
 load_dotenv()
 
@@ -26,15 +65,20 @@ def get_tables_mdb(mdb_path):
         print("Error: mdb-tools not found. Install with: brew install mdbtools")
         return []
 
-def get_table_data_mdb(mdb_path, table_name):
-    """Get data from specified table using mdb-export"""
+def get_table_data_mdb(mdb_path, table_name, table_cache=None, schema=None):
+    """Get data from specified table using mdb-export, or from the Parquet cache if given.
+    With a TableSchema only its rows and columns are kept, in compact dtypes"""
     try:
-        result = subprocess.run(['mdb-export', mdb_path, table_name],
-                              capture_output=True,
-                              text=True)
-        # Convert the CSV output to DataFrame
-        df = pd.read_csv(io.StringIO(result.stdout))
-        print(f"Successfully loaded {table_name} with {len(df)} rows")
+        if table_cache is not None:
+            cached = os.path.exists(table_cache.path(table_name))
+            df = table_cache.load(table_name, schema=schema)
+            source = "Parquet cache" if cached else "mdb-export (now cached)"
+        else:
+            # Parse the CSV straight from the mdb-export pipe
+            df = stream_mdb_export(mdb_path, table_name, schema=schema)
+            source = "mdb-export"
+        memory_mb = df.memory_usage(deep=True).sum() / 1024 ** 2
+        print(f"Successfully loaded {table_name} with {len(df)} rows ({memory_mb:.1f} MB) from {source}")
         return df
     except subprocess.CalledProcessError as e:
         print(f"Error executing mdb-export for {table_name}: {e}")
@@ -382,11 +426,88 @@ def process_institution_batch(batch_df, table_data):
             
     return texts, ids, metadatas
 
+def build_legacy_shard(data, start, end):
+    """Build rows start:end of hd_df with the per-row builder"""
+    hd_df, table_data = data
+    return process_institution_batch(hd_df.iloc[start:end], table_data)
+
+def report_stage(stage, count, unit, seconds, workers=1):
+    """Print a pipeline stage's throughput; worker seconds are summed across processes"""
+    rate = count / seconds if seconds > 0 else float("inf")
+    if workers > 1:
+        print(f"{stage}: {count} {unit} in {seconds:.2f} worker-seconds ({rate:.0f} {unit}/s per worker)")
+    else:
+        print(f"{stage}: {count} {unit} in {seconds:.2f} seconds ({rate:.0f} {unit}/s)")
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB; ru_maxrss is bytes on macOS, KB on Linux"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+TABLE_CACHE_DIR = "/Users/anthonytiburcio/Documents/GitHub/schoolmatch_v1/ipeds_cache"
+
+# Document builders selectable with --builder
+BUILDERS = {
+    "columnar": build_institution_documents,
+    "legacy": process_institution_batch,
+}
+
+def verify_documents(hd_df, table_data, documents, builder):
+    """Check that the other builder produces byte-identical texts, ids and metadata"""
+    other = "legacy" if builder == "columnar" else "columnar"
+    verify_start = time.time()
+    expected = BUILDERS[other](hd_df, table_data)
+    print(f"Built {len(expected[0])} documents with the {other} builder in {time.time() - verify_start:.2f} seconds")
+    
+    # repr distinguishes value types (1 vs 1.0) and metadata key order
+    for name, actual_values, expected_values in zip(("texts", "ids", "metadatas"), documents, expected):
+        differing = abs(len(actual_values) - len(expected_values)) + sum(
+            repr(actual) != repr(wanted) for actual, wanted in zip(actual_values, expected_values)
+        )
+        if differing:
+            print(f"Mismatch: {differing} {name} differ between the {builder} and {other} builders")
+            return False
+    
+    print(f"Verified: the {builder} and {other} builders produce identical documents")
+    return True
+
 def main():
     """Main function with optimizations for speed"""
+    parser = argparse.ArgumentParser(description="Load IPEDS tables into the Chroma vector database")
+    parser.add_argument("--builder", choices=sorted(BUILDERS), default="columnar",
+                        help="How institution documents are built (default: columnar)")
+    parser.add_argument("--verify", action="store_true",
+                        help="Also build with the other builder and stop if the documents differ")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only embed new or changed documents and delete removed ones, keyed by content hash")
+    parser.add_argument("--table-cache-dir", default=TABLE_CACHE_DIR,
+                        help="Directory of Parquet copies of the Access tables")
+    parser.add_argument("--no-table-cache", action="store_true",
+                        help="Always export tables with mdb-export and do not cache them")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes building documents (default: one per CPU)")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE,
+                        help=f"Institutions per worker task (default: {DEFAULT_SHARD_SIZE})")
+    parser.add_argument("--embed-concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Embedding requests in flight (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--tokens-per-minute", type=int, default=DEFAULT_TOKENS_PER_MINUTE,
+                        help=f"Embedding token rate limit (default: {DEFAULT_TOKENS_PER_MINUTE})")
+    parser.add_argument("--requests-per-minute", type=int, default=DEFAULT_REQUESTS_PER_MINUTE,
+                        help=f"Embedding request rate limit (default: {DEFAULT_REQUESTS_PER_MINUTE})")
+    parser.add_argument("--index-shards", type=int, default=1,
+                        help="Chroma shard collections, partitioned by UNITID hash and written by one process each (default: 1)")
+    parser.add_argument("--min-count-ratio", type=float, default=DEFAULT_MIN_COUNT_RATIO,
+                        help=f"Smallest share of the active collection's documents a new build needs to be activated (default: {DEFAULT_MIN_COUNT_RATIO})")
+    parser.add_argument("--sections", action="store_true",
+                        help="Also store one vector per document section in a collection linked to the build")
+    args = parser.parse_args()
+    if args.sections and args.builder == "legacy":
+        parser.error("--sections needs the columnar builder")
+    
     # Configuration
     ACCESS_DB_PATH = "/Users/anthonytiburcio/Documents/GitHub/schoolmatch_v1/db/ipeds_data/IPEDS202324.accdb"
     CHROMA_PERSIST_DIR = "/Users/anthonytiburcio/Documents/GitHub/schoolmatch_v1/chroma_db"
+    BM25_INDEX_DIR = "/Users/anthonytiburcio/Documents/GitHub/schoolmatch_v1/bm25_index"
     
     # Tables to extract (add or remove as needed)
     TABLES = [
@@ -407,9 +528,6 @@ def main():
     print(f"Starting data processing at {time.strftime('%H:%M:%S')}")
     
     try:
-        # Get user confirmation before recreating collection
-        recreate = input("Do you want to recreate the collection? This will delete existing data. (y/n): ")
-        
         # Initialize ChromaDB client with OpenAI embedding function
         # Notice: Using the embedding function directly from ChromaDB instead of langchain
         openai_ef = embedding_functions.OpenAIEmbeddingFunction(
@@ -420,36 +538,54 @@ def main():
         # Initialize ChromaDB persistent client
         chroma_client = chromadb.PersistentClient(path=CHROMA_PERSIST_DIR)
         
-        # Handle collection management
-        collection_name = "ipeds_colleges"
+        # Handle collection management. Readers use the collection the alias points at
+        collection_alias = DEFAULT_COLLECTION_ALIAS
+        active = resolve_alias(CHROMA_PERSIST_DIR, collection_alias)
         collection = None
-        
-        try:
-            # Try to get existing collection
-            collection = chroma_client.get_collection(
-                name=collection_name,
-                embedding_function=openai_ef
-            )
-            print("Found existing collection")
-            
-            # Check if we should recreate
-            if recreate.lower() == 'y':
-                chroma_client.delete_collection(name=collection_name)
-                print("Deleted existing collection")
-                # Create new collection
+        shard_writer = None
+        section_collection = None
+        
+        if args.incremental:
+            # Incremental runs update the active collection in place
+            if args.index_shards != active.shard_count:
+                print(f"The active collection has {active.shard_count} shard(s); rebuild it to use {args.index_shards}")
+                return
+            target = active
+            collection = open_target(CHROMA_PERSIST_DIR, target, openai_ef)
+            print(f"Updating collection {target.collection} in place")
+        else:
+            # Every other run builds a new version next to the active one, so queries keep
+            # being served until the new version is validated and the alias moves to it
+            target = CollectionTarget(versioned_name(collection_alias), args.index_shards)
+            if target.shard_count > 1:
+                # Each shard is written by its own process into its own persist directory
+                shard_writer = ShardedWriter(CHROMA_PERSIST_DIR, target.collection, target.shard_count)
+                print(f"Building {target.collection} in {target.shard_count} shard collections")
+            else:
                 collection = chroma_client.create_collection(
-                    name=collection_name,
+                    name=target.collection,
                     embedding_function=openai_ef
                 )
-                print("Created new collection")
-        except Exception as e:
-            # Collection doesn't exist, create a new one
-            print(f"No existing collection found: {e}")
-            collection = chroma_client.create_collection(
-                name=collection_name,
-                embedding_function=openai_ef
-            )
-            print("Created new collection")
+                print(f"Building {target.collection}")
+        
+        # Section vectors go to a collection next to the build, sharded the same way
+        sections = section_target(target) if args.sections else None
+        if sections is not None:
+            if args.incremental:
+                section_collection = open_target(CHROMA_PERSIST_DIR, sections, openai_ef)
+            elif shard_writer is None:
+                section_collection = chroma_client.create_collection(
+                    name=sections.collection,
+                    embedding_function=openai_ef
+                )
+            # A sharded build writes them through its shard writer, which owns the shard directories
+            print(f"Storing section vectors in {sections.collection}")
+        
+        try:
+            previous_count = open_target(CHROMA_PERSIST_DIR, active, create=False).count()
+        except Exception:
+            # No active collection yet
+            previous_count = 0
         
         # Ask for sample mode for faster testing
         sample_mode = input("Do you want to run in sample mode with only 100 institutions? (y/n): ")
@@ -458,10 +594,24 @@ def main():
         print("Loading data from tables...")
         table_data = {}
         
+        # Tables are cached as Parquet per version of the .accdb file
+        table_cache = None
+        if not args.no_table_cache:
+            table_cache = IPEDSTableCache(ACCESS_DB_PATH, args.table_cache_dir)
+            for stale in table_cache.purge_stale():
+                print(f"Removed stale table cache {stale}")
+        
+        # The columnar builder only loads the rows and columns in its table schemas; the
+        # legacy builder and verification need full tables
+        def table_schema(table):
+            if args.builder == "legacy" or args.verify:
+                return None
+            return TABLE_SCHEMAS.get(table)
+        
         # OPTIMIZATION: Load tables concurrently
         # First create a function to load a table
         def load_table(table):
-            df = get_table_data_mdb(ACCESS_DB_PATH, table)
+            df = get_table_data_mdb(ACCESS_DB_PATH, table, table_cache, table_schema(table))
             if df is not None:
                 # Index on UNITID if present
                 if 'UNITID' in df.columns:
@@ -472,20 +622,24 @@ def main():
             return table, None
         
         # Load tables concurrently with ThreadPoolExecutor
+        load_start = time.time()
         with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(TABLES), 4)) as executor:
             results = list(executor.map(load_table, TABLES))
+        report_stage("Load", sum(len(df) for _, df in results if df is not None), "rows", time.time() - load_start)
+        if table_cache is not None:
+            print(f"Table cache: {table_cache.hits} hits, {table_cache.misses} misses in {table_cache.directory}")
+        print(f"Peak RSS after loading tables: {peak_rss_mb():.0f} MB")
             
         # Process results
         for table, df in results:
             if df is not None:
                 table_data[table] = df
             
-        # Special handling for EF2023A
-        if "EF2023A" in table_data and isinstance(table_data["EF2023A"], pd.DataFrame):
-            # For EF2023A, filter to specific rows
-            ef2023a_df = table_data["EF2023A"]
-            ef2023a_df = ef2023a_df[(ef2023a_df['EFALEVEL'] == 1) & (ef2023a_df['LINE'] == 29)]
-            table_data["EF2023A"] = ef2023a_df
+        # Special handling for EF2023A: keep the rows in ROW_FILTERS. Tables loaded with
+        # their schema were already filtered while streaming
+        for table in ROW_FILTERS:
+            if table in table_data and table_schema(table) is None:
+                table_data[table] = TABLE_SCHEMAS[table].filter_rows(table_data[table])
             
         if "HD2023" not in table_data or table_data["HD2023"] is None:
             print("Error: HD2023 table is required but couldn't be loaded")
@@ -501,45 +655,196 @@ def main():
         else:
             print(f"Processing all {len(hd_df)} institutions")
         
-        # OPTIMIZATION: Use larger batch sizes for processing
-        batch_size = 500  # Increased from 250 
-        total_processed = 0
-        num_batches = (len(hd_df) + batch_size - 1) // batch_size
+        # Shard the institutions across worker processes that share the tables through fork
+        if args.builder == "legacy":
+            build_shard, shard_data, total_rows = build_legacy_shard, (hd_df, table_data), len(hd_df)
+        else:
+            join_start = time.time()
+            shard_data = join_tables(hd_df, table_data)
+            total_rows = len(shard_data[0])
+            report_stage("Join", total_rows, "institutions", time.time() - join_start)
+            build_shard = render_sectioned_shard if args.sections else render_document_shard
+        
+        batches = build_documents_in_parallel(
+            build_shard, shard_data, total_rows, workers=args.workers, shard_size=args.shard_size
+        )
+        print(f"Building documents with the {args.builder} builder on {args.workers} worker(s)")
+        
+        pipeline_start = time.time()
+        if args.verify:
+            # Nothing is written until both builders agree
+            batches = list(batches)
+            documents = tuple(
+                [item for (batch, _) in batches for item in batch[part]] for part in range(3)
+            )
+            if args.sections:
+                # Sections are not built by the legacy builder
+                documents = split_sections(*documents)[0]
+            if not verify_documents(hd_df, table_data, documents, args.builder):
+                print("Verification failed; nothing was written to the vector database")
+                return
         
-        print(f"Using batch size of {batch_size}")
+        total_processed = 0
+        sections_processed = 0
+        progress = {"built": 0, "sections_built": 0, "build_seconds": 0.0}
+        write_seconds = 0.0
+        
+        # Incremental runs diff each shard against the stored content hashes
+        sync = IncrementalSync(collection) if args.incremental else None
+        if sync is not None:
+            print(f"Incremental mode: comparing against {len(sync.existing)} stored documents")
+        section_sync = IncrementalSync(section_collection) if args.incremental and args.sections else None
+        
+        def keep_pending(part_sync, texts, ids, metadatas):
+            if part_sync is None:
+                return texts, ids, metadatas
+            pending = part_sync.diff(ids, metadatas)
+            return (
+                [texts[position] for position in pending],
+                [ids[position] for position in pending],
+                [metadatas[position] for position in pending],
+            )
         
-        # Process in batches
-        for i in tqdm(range(0, len(hd_df), batch_size), desc="Processing institution batches", total=num_batches):
-            batch_df = hd_df.iloc[i:i + batch_size]
+        def shards_to_embed():
+            """Hash each built shard and keep only the documents that need embedding"""
+            for (texts, ids, metadatas), shard_seconds in batches:
+                progress["build_seconds"] += shard_seconds
+                metadatas = with_content_hashes(texts, metadatas)
+                # Sections follow the institution documents of their shard and are diffed
+                # against the section collection
+                documents, section_documents = split_sections(texts, ids, metadatas)
+                progress["built"] += len(documents[0])
+                progress["sections_built"] += len(section_documents[0])
+                documents = keep_pending(sync, *documents)
+                section_documents = keep_pending(section_sync, *section_documents)
+                yield tuple(part + section_part for part, section_part in zip(documents, section_documents))
+        
+        def write_documents(destination_target, destination, destination_sync, texts, ids, metadatas, embeddings):
+            """Write documents with their precomputed embeddings; returns how many were stored now"""
+            if not ids:
+                return 0
             
-            # Process the batch
-            texts, ids, metadatas = process_institution_batch(batch_df, table_data)
+            if shard_writer is not None:
+                # Queued for the shard writer processes; counted when they finish
+                shard_writer.write(texts, ids, metadatas, embeddings, name=destination_target.collection)
+                return 0
             
-            if not texts:  # Skip if no valid texts
-                continue
-                
-            # OPTIMIZATION: Add to ChromaDB in larger chunks
-            sub_batch_size = 200  # Increased from 50
-            for j in range(0, len(texts), sub_batch_size):
-                end_idx = min(j + sub_batch_size, len(texts))
-                
-                # Only add if we have valid data
-                if end_idx > j:
-                    try:
-                        # Add batch directly to collection
-                        collection.add(
-                            documents=texts[j:end_idx],
-                            metadatas=metadatas[j:end_idx],
-                            ids=ids[j:end_idx]
-                        )
-                        total_processed += end_idx - j
-                    except Exception as sub_e:
-                        print(f"Error adding sub-batch: {str(sub_e)}")
-                        # Continue with next sub-batch
-                        continue
+            if destination_sync is not None:
+                try:
+                    return destination_sync.upsert(texts, ids, metadatas, embeddings)
+                except Exception as sync_e:
+                    print(f"Error writing shard: {str(sync_e)}")
+                    return 0
+            
+            written = 0
+            for j in range(0, len(texts), WRITE_BATCH_SIZE):
+                end_idx = min(j + WRITE_BATCH_SIZE, len(texts))
+                try:
+                    # Add batch with its precomputed embeddings; Chroma makes no API call
+                    destination.add(
+                        documents=texts[j:end_idx],
+                        embeddings=embeddings[j:end_idx],
+                        metadatas=metadatas[j:end_idx],
+                        ids=ids[j:end_idx]
+                    )
+                    written += end_idx - j
+                except Exception as sub_e:
+                    print(f"Error adding sub-batch: {str(sub_e)}")
+                    # Continue with next sub-batch
+                    continue
+            return written
+        
+        # OPTIMIZATION: Embed shards concurrently ahead of the writer, so each shard is
+        # written with precomputed vectors while the next ones are still being embedded
+        embedder = EmbeddingPipeline(
+            openai_ef,
+            concurrency=args.embed_concurrency,
+            tokens_per_minute=args.tokens_per_minute,
+            requests_per_minute=args.requests_per_minute,
+        )
+        
+        for texts, ids, metadatas, embeddings in tqdm(embedder.run(shards_to_embed()), desc="Writing document shards"):
+            write_start = time.time()
+            documents, section_documents = split_sections(texts, ids, metadatas, embeddings)
+            total_processed += write_documents(target, collection, sync, *documents)
+            sections_processed += write_documents(sections, section_collection, section_sync, *section_documents)
+            write_seconds += time.time() - write_start
+        
+        if shard_writer is not None:
+            write_start = time.time()
+            total_processed = shard_writer.close()
+            write_seconds += time.time() - write_start
+            collection = open_target(CHROMA_PERSIST_DIR, target, openai_ef)
+            if sections is not None:
+                sections_processed = shard_writer.written[sections.collection]
+                section_collection = open_target(CHROMA_PERSIST_DIR, sections, openai_ef)
+        
+        built = progress["built"]
+        stats = embedder.stats
+        print(
+            f"Embedded {stats['documents']} documents ({stats['tokens']} tokens) in {stats['requests']} requests "
+            f"with {stats['retries']} retries; {stats['truncated']} truncated, {stats['failed']} failed, "
+            f"{stats['throttled_seconds']:.1f}s waiting on rate limits"
+        )
+        
+        if sync is not None:
+            if sample_mode.lower() == 'y':
+                print("Sample mode: keeping stored documents that are not in the sample")
+            else:
+                sync.remove_missing()
+            counts = sync.counts
+            print(
+                f"Incremental update: {counts['new']} new, {counts['changed']} changed, "
+                f"{counts['unchanged']} unchanged, {counts['removed']} removed"
+            )
+            print(f"Embeddings saved: {counts['unchanged']} of {built} documents were not re-embedded")
+        if section_sync is not None:
+            if sample_mode.lower() != 'y':
+                section_sync.remove_missing()
+            counts = section_sync.counts
+            print(
+                f"Incremental section update: {counts['new']} new, {counts['changed']} changed, "
+                f"{counts['unchanged']} unchanged, {counts['removed']} removed"
+            )
+        
+        report_stage("Build", built, "documents", progress["build_seconds"], workers=args.workers)
+        report_stage("Write", total_processed, "documents", write_seconds)
+        report_stage("Build + write", total_processed, "documents", time.time() - pipeline_start)
                 
         print(f"\nProcessed {total_processed} institutions and stored them in vector database")
+        if sections is not None:
+            print(f"Stored {sections_processed} section vectors in {sections.collection}")
+        
+        if target != active:
+            # Only a complete build replaces the active collection
+            problems = validate_build(collection, built, previous_count, args.min_count_ratio)
+            if section_collection is not None:
+                # Section counts are only checked against this build, not the previous one
+                problems += [
+                    f"sections: {problem}"
+                    for problem in validate_build(section_collection, progress["sections_built"], 0, args.min_count_ratio)
+                ]
+            if problems:
+                print(f"Not activating {target.collection}: " + "; ".join(problems))
+                print(f"The alias still points at {active.collection}")
+                return
+        
+        # Build the keyword index once over everything now in the collection, into a directory
+        # of its own so it switches, rolls back and is dropped together with the collection
+        bm25_start = time.time()
+        bm25_index = BM25Index.from_collection(collection, build_index_dir(BM25_INDEX_DIR, target.collection))
+        print(f"Built BM25 index over {len(bm25_index)} documents in {time.time() - bm25_start:.2f} seconds")
+        
+        if target != active:
+            activate(CHROMA_PERSIST_DIR, collection_alias, target, collection.count())
+            print(f"Alias {collection_alias} now points at {target.collection} (was {active.collection})")
+            for dropped in drop_stale_versions(CHROMA_PERSIST_DIR, collection_alias):
+                print(f"Dropped old collection {dropped}")
+                if drop_build_index(BM25_INDEX_DIR, dropped):
+                    print(f"Dropped BM25 index of {dropped}")
+        
         elapsed_time = time.time() - start_time
+        print(f"Peak RSS: {peak_rss_mb():.0f} MB")
         print(f"Total processing time: {elapsed_time:.2f} seconds ({elapsed_time/60:.2f} minutes)")
         
         # Display a sample query
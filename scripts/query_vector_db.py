@@ -1,10 +1,14 @@
-import chromadb
 from chromadb.utils import embedding_functions
 import os
+import sys
 from dotenv import load_dotenv
 import json
 from pprint import pprint
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.collection_alias import DEFAULT_COLLECTION_ALIAS, open_collection
+
 # Load environment variables
 load_dotenv()
 
@@ -15,12 +19,10 @@ def main():
         model_name="text-embedding-ada-002"
     )
     
-    # Initialize Chroma client with absolute path
-    chroma_client = chromadb.PersistentClient(path="/Users/anthonytiburcio/Documents/GitHub/schoolmatch_v1/chroma_db")
-    
-    # Get the collection
-    collection = chroma_client.get_collection(
-        name="ipeds_colleges",
+    # Get the collection the alias points at, in the Chroma directory with absolute path
+    collection = open_collection(
+        "/Users/anthonytiburcio/Documents/GitHub/schoolmatch_v1/chroma_db",
+        DEFAULT_COLLECTION_ALIAS,
         embedding_function=openai_ef
     )
     
@@ -15,6 +15,7 @@ setup(
     entry_points={
         "console_scripts": [
             "schoolmatch=langchain_app.cli:main",
+            "schoolmatch-api=langchain_app.api:main",
         ]
     },
 )